@@ -229,8 +229,8 @@ _dock_io = [
         # Control.
         Subsignal("rst",   Pins("CARD1:123")),
         Subsignal("bl",    Pins("CARD1:186")),
-        Subsignal("sda",   Pins("CARD1: 95")),
-        Subsignal("scl",   Pins("CARD1: 97")),
+        Subsignal("sda",   Pins("CARD1:95")),
+        Subsignal("scl",   Pins("CARD1:97")),
         Subsignal("int",   Pins("CARD1:125")),
 
         # Video.
@@ -265,6 +265,9 @@ class Platform(GowinPlatform):
         self.toolchain.options["use_done_as_gpio"]  = 1
         self.toolchain.options["rw_check_on_ram"]   = 1
 
+    def has_resource(self, name):
+        return any(resource[0] == name for resource in self.constraint_manager.available)
+
     def create_programmer(self, kit="openfpgaloader"):
         # return OpenFPGALoader(cable="ft2232")
         return OpenFPGALoader(cable="ft232")
@@ -0,0 +1,155 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Content-addressed cache of built bitstreams.
+
+Sources are generated as usual (Verilog, constraints, toolchain project, memory init files) but
+the toolchain only runs when their hash is not in the cache: entries hold the bitstreams and the
+csr.csv of a build and are keyed on the SHA-256 of:
+- every file generated in the gateware directory, without the date in the Verilog header and with
+  absolute paths reduced to file names (so checkouts in different directories share entries),
+- the contents of the external sources (CPU Verilog...),
+- the device, toolchain and toolchain options.
+
+Build times would make every build unique: timestamped lines of the generated file headers and
+the Verilog hierarchy comment (whose ordering is not stable) are left out of the hash, the BIOS
+is compiled with SOURCE_DATE_EPOCH=0 (unless set) to fix its __DATE__/__TIME__ and the SoC
+identifier should not include the build time.
+
+The toolchain version is not part of the key: use --no-cache (or clear the cache) after updating
+it. Entries are evicted least recently used first when the cache grows over its size limit.
+"""
+
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+
+# Helpers ------------------------------------------------------------------------------------------
+
+# Parts of the generated files that change between identical builds: timestamped comment lines and
+# the hierarchy comment of the Verilog (its ordering is not stable).
+_TIMESTAMP = re.compile(rb"^//.*\d{4}-\d\d-\d\d \d\d:\d\d:\d\d.*$", re.MULTILINE)
+_HIERARCHY = re.compile(rb"^// Hierarchy\n//-*\n\n/\*.*?^\*/$", re.MULTILINE | re.DOTALL)
+
+def _size(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+def _bitstreams(builder):
+    """Bitstream files a build may produce (SRAM/flash), with the name they are cached under."""
+    files = {
+        builder.get_bitstream_filename(mode="sram"),
+        builder.get_bitstream_filename(mode="flash"),
+        builder.get_bitstream_filename(mode="flash", ext=".fs"),
+    }
+    return {os.path.basename(f): f for f in files}
+
+# Bitstream Cache ----------------------------------------------------------------------------------
+
+class BitstreamCache:
+    def __init__(self, path, max_size=2*1024**3):
+        self.path     = os.path.expanduser(path)
+        self.max_size = max_size
+        os.makedirs(self.path, exist_ok=True)
+
+    def key(self, builder, toolchain_args=None):
+        platform = builder.soc.platform
+        gateware = os.path.abspath(builder.gateware_dir)
+        outputs  = set(_bitstreams(builder).values())
+        sources  = [os.path.abspath(f) for f, *_ in platform.sources]
+        h = hashlib.sha256()
+        h.update(repr((platform.devicename, platform.device, type(platform.toolchain).__name__,
+            sorted((toolchain_args or {}).items()))).encode())
+        for source in sorted(sources, key=os.path.basename):
+            if not source.startswith(gateware + os.sep):
+                h.update(os.path.basename(source).encode())
+                with open(source, "rb") as f:
+                    h.update(hashlib.sha256(f.read()).digest())
+        for name in sorted(os.listdir(gateware)):
+            path = os.path.join(gateware, name)
+            if not os.path.isfile(path) or path in outputs:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            data = re.sub(_TIMESTAMP, b"", data)
+            data = re.sub(_HIERARCHY, b"", data)
+            for source in [gateware + os.sep] + sources:
+                data = data.replace(os.path.dirname(source).encode() + os.sep.encode(), b"")
+            h.update(name.encode())
+            h.update(hashlib.sha256(data).digest())
+        return h.hexdigest()
+
+    def lookup(self, key):
+        """Path of the entry of `key` (marked as used) or None."""
+        entry = os.path.join(self.path, key)
+        if not os.path.isdir(entry):
+            return None
+        os.utime(entry)
+        return entry
+
+    def store(self, key, files):
+        """Add an entry holding `files` ({cached name: path}, missing files are skipped)."""
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.path)
+        os.chmod(tmp, 0o755)
+        for name, path in files.items():
+            if os.path.exists(path):
+                shutil.copyfile(path, os.path.join(tmp, name))
+        entry = os.path.join(self.path, key)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.rename(tmp, entry)
+        self.evict(keep=key)
+
+    def restore(self, key, files):
+        """Copy the files of the entry of `key` back to `files` ({cached name: path})."""
+        entry = self.lookup(key)
+        if entry is None:
+            return False
+        for name, path in files.items():
+            if os.path.exists(os.path.join(entry, name)):
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                shutil.copyfile(os.path.join(entry, name), path)
+        return True
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits in `max_size`."""
+        entries = []
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            if os.path.isdir(path) and not name.startswith("."):
+                entries.append((os.path.getmtime(path), _size(path), name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_size:
+                break
+            if name != keep:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+                total -= size
+
+    def build(self, builder, run=True, **kwargs):
+        """`builder.build(**kwargs)`, running the toolchain only on cache misses (and when `run`).
+        Returns (vns, hit), bitstreams and csr.csv are restored from the cache on hits."""
+        if not builder.compile_gateware:
+            return builder.build(**kwargs), False
+        os.environ.setdefault("SOURCE_DATE_EPOCH", "0")
+        vns   = builder.build(run=False, **kwargs)
+        key   = self.key(builder, kwargs)
+        files = _bitstreams(builder)
+        if builder.csr_csv is not None:
+            files["csr.csv"] = builder.csr_csv
+        if self.restore(key, files):
+            print(f"Bitstream cache hit ({key[:16]}), skipping the toolchain.")
+            return vns, True
+        if run:
+            toolchain = builder.soc.platform.toolchain
+            cwd = os.getcwd()
+            os.chdir(builder.gateware_dir)
+            try:
+                toolchain.run_script(toolchain.build_script())
+            finally:
+                os.chdir(cwd)
+            self.store(key, files)
+        return vns, False
@@ -0,0 +1,245 @@
+// This file is Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+// License: BSD
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include <generated/csr.h>
+#include <generated/mem.h>
+#include <generated/soc.h>
+#include <libbase/crc.h>
+#include <libbase/uart.h>
+#include <system.h>
+
+#include "awg.h"
+
+#ifdef CSR_AWG_BASE
+
+/* Modes / waveforms, see gateware/awg.py. */
+#define MODE_MEMORY 0
+#define MODE_DDS 1
+
+#define DAC_CODES (1 << 14)
+
+/* Binary upload frames, see awg_upload(). */
+#define UPLOAD_MAGIC 0x42475741 /* "AWGB" */
+#define UPLOAD_BLOCK_BYTES 4096
+
+static const char *const functions[] = {"SIN", "SQU", "RAMP", "TRI", "ARB"};
+#define FUNC_ARB 4
+
+static unsigned int function = 0;
+static unsigned long frequency = 1000;
+static int output = 0;
+
+static unsigned int control(void) {
+  unsigned int mode = function == FUNC_ARB ? MODE_MEMORY : MODE_DDS;
+
+  return (mode << CSR_AWG_CONTROL_MODE_OFFSET) |
+         ((function & 3) << CSR_AWG_CONTROL_WAVEFORM_OFFSET);
+}
+
+/* Restart the output (mode changes only apply on start). */
+static void restart(void) {
+  awg_control_write(control() | (1 << CSR_AWG_CONTROL_STOP_OFFSET));
+  if (output) {
+    /* Samples written by the CPU/Etherbone may still sit in the L2 cache. */
+    flush_l2_cache();
+    awg_control_write(control() | (1 << CSR_AWG_CONTROL_START_OFFSET));
+  }
+}
+
+/* DDS phase increment: frequency / sys_clk * 2^32. */
+static void set_frequency(unsigned long hz) {
+  frequency = hz;
+  awg_frequency_write(((unsigned long long)hz << 32) / CONFIG_CLOCK_FREQUENCY);
+}
+
+void awg_init(void) {
+  awg_base_write(AWG_BUFFER_BASE);
+  awg_loop_start_write(AWG_BUFFER_BASE);
+  awg_loop_end_write(AWG_BUFFER_BASE + AWG_BUFFER_LENGTH);
+  awg_repeat_write(0);
+  set_frequency(frequency);
+  awg_control_write(control());
+}
+
+/*-----------------------------------------------------------------------*/
+/* Output                                                                */
+/*-----------------------------------------------------------------------*/
+
+int awg_set_output(const char *state) {
+  if (strcmp(state, "ON") == 0 || strcmp(state, "1") == 0)
+    output = 1;
+  else if (strcmp(state, "OFF") == 0 || strcmp(state, "0") == 0)
+    output = 0;
+  else
+    return -1;
+  restart();
+  return 0;
+}
+
+/* "ON" while playing (an ARB waveform with a finite number of cycles ends
+ * by itself). */
+const char *awg_output(void) {
+  return (awg_status_read() >> CSR_AWG_STATUS_PLAYING_OFFSET) & 1 ? "ON"
+                                                                  : "OFF";
+}
+
+/*-----------------------------------------------------------------------*/
+/* Upload                                                                */
+/*-----------------------------------------------------------------------*/
+
+static unsigned int read_u32(void) {
+  unsigned int value = 0;
+  int i;
+
+  for (i = 0; i < 4; i++)
+    value |= (unsigned int)(unsigned char)uart_read() << (8 * i);
+  return value;
+}
+
+/* Binary upload into the AWG buffer, bypassing the line parser. Frames are
+ * a header (magic, byte offset, length, CRC32 of the payload: little endian
+ * u32) followed by the payload, written in place. Each frame is answered with
+ * "ACK <offset>" or "NAK <offset>" (CRC mismatch: the host resends it), so the
+ * host can keep several frames in flight. A zero length frame ends the upload
+ * ("END <bytes>"), an invalid header aborts it ("ERR"). */
+void awg_upload(void) {
+  unsigned char *buf = (unsigned char *)(MAIN_RAM_BASE + AWG_BUFFER_BASE);
+  unsigned int magic, offset, length, crc, i;
+  unsigned long total = 0;
+
+  for (;;) {
+    magic = read_u32();
+    offset = read_u32();
+    length = read_u32();
+    crc = read_u32();
+    if (magic != UPLOAD_MAGIC || length > UPLOAD_BLOCK_BYTES ||
+        offset > AWG_BUFFER_LENGTH || length > AWG_BUFFER_LENGTH - offset) {
+      printf("ERR\n");
+      break;
+    }
+    if (length == 0) {
+      printf("END %lu\n", total);
+      break;
+    }
+    for (i = 0; i < length; i++)
+      buf[offset + i] = uart_read();
+    if (crc32(buf + offset, length) == crc) {
+      total += length;
+      printf("ACK %u\n", offset);
+    } else
+      printf("NAK %u\n", offset);
+  }
+  flush_cpu_dcache();
+  flush_l2_cache();
+}
+
+/*-----------------------------------------------------------------------*/
+/* Configuration                                                         */
+/*-----------------------------------------------------------------------*/
+
+/* Byte offset in the AWG buffer, word aligned. */
+static int buffer_offset(const char *arg, unsigned long *offset) {
+  char *end;
+
+  *offset = strtoul(arg, &end, 0);
+  if (end == arg || *offset > AWG_BUFFER_LENGTH ||
+      *offset % AWG_WORD_BYTES != 0)
+    return -1;
+  return 0;
+}
+
+static int arb_command(const char *cmd, const char *arg) {
+  unsigned long start, end;
+  char *sep;
+
+  if (strcmp(cmd, "STAR") == 0) {
+    if (buffer_offset(arg, &start) != 0 || start == AWG_BUFFER_LENGTH)
+      return -1;
+    awg_base_write(AWG_BUFFER_BASE + start);
+  } else if (strcmp(cmd, "LOOP") == 0) {
+    /* <start>,<end> */
+    if ((sep = strchr(arg, ',')) == NULL)
+      return -1;
+    if (buffer_offset(arg, &start) != 0 || buffer_offset(sep + 1, &end) != 0 ||
+        end <= start)
+      return -1;
+    awg_loop_start_write(AWG_BUFFER_BASE + start);
+    awg_loop_end_write(AWG_BUFFER_BASE + end);
+  } else if (strcmp(cmd, "NCYC") == 0)
+    /* 0: forever. */
+    awg_repeat_write(strtoul(arg, NULL, 0));
+  else if (strcmp(cmd, "NCYCQ") == 0)
+    printf("%lu\n", (unsigned long)awg_repeat_read());
+  else if (strcmp(cmd, "UNDQ") == 0)
+    printf("%u\n",
+           (unsigned int)(awg_status_read() >> CSR_AWG_STATUS_UNDERFLOW_OFFSET) & 1);
+  else if (strcmp(cmd, "UPL") == 0)
+    awg_upload();
+  else
+    return -1;
+  return 0;
+}
+
+/* ":SOUR:" commands (cmd without the prefix, arg its argument), -1 on error:
+ *   FUNC SIN|SQU|RAMP|TRI|ARB / FUNCQ
+ *   FREQ <Hz> / FREQQ, PHAS <degrees>
+ *   AMPL <peak-to-peak DAC codes> / AMPLQ, OFFS <DAC code> / OFFSQ
+ *   ARB:STAR <byte offset> / ARB:LOOP <start>,<end> (byte offsets in the AWG
+ *   buffer, multiples of AWG_WORD_BYTES) / ARB:NCYC <n> (0: forever) /
+ *   ARB:NCYCQ / ARB:UNDQ (underflow) / ARB:UPL (binary upload) */
+int awg_command(const char *cmd, const char *arg) {
+  unsigned long value;
+  unsigned int i;
+
+  if (strcmp(cmd, "FUNC") == 0) {
+    for (i = 0; i < sizeof(functions) / sizeof(functions[0]); i++)
+      if (strcmp(arg, functions[i]) == 0)
+        break;
+    if (i == sizeof(functions) / sizeof(functions[0]))
+      return -1;
+    function = i;
+    restart();
+  } else if (strcmp(cmd, "FUNCQ") == 0)
+    printf("%s\n", functions[function]);
+  else if (strcmp(cmd, "FREQ") == 0) {
+    value = strtoul(arg, NULL, 0);
+    if (value >= CONFIG_CLOCK_FREQUENCY / 2)
+      return -1;
+    set_frequency(value);
+  } else if (strcmp(cmd, "FREQQ") == 0)
+    printf("%lu\n", frequency);
+  else if (strcmp(cmd, "PHAS") == 0)
+    awg_phase_write(((unsigned long long)(strtoul(arg, NULL, 0) % 360) << 32) /
+                    360);
+  else if (strcmp(cmd, "AMPL") == 0) {
+    if ((value = strtoul(arg, NULL, 0)) > DAC_CODES)
+      return -1;
+    awg_amplitude_write(value);
+  } else if (strcmp(cmd, "AMPLQ") == 0)
+    printf("%lu\n", (unsigned long)awg_amplitude_read());
+  else if (strcmp(cmd, "OFFS") == 0) {
+    if ((value = strtoul(arg, NULL, 0)) >= DAC_CODES)
+      return -1;
+    awg_offset_write(value);
+  } else if (strcmp(cmd, "OFFSQ") == 0)
+    printf("%lu\n", (unsigned long)awg_offset_read());
+  else if (strncmp(cmd, "ARB:", 4) == 0)
+    return arb_command(cmd + 4, arg);
+  else
+    return -1;
+  return 0;
+}
+
+#else
+
+void awg_init(void) {}
+int awg_command(const char *cmd, const char *arg) { return -1; }
+int awg_set_output(const char *state) { return -1; }
+void awg_upload(void) {}
+const char *awg_output(void) { return "OFF"; }
+
+#endif /* CSR_AWG_BASE */
@@ -0,0 +1,13 @@
+#ifndef __AWG_H
+#define __AWG_H
+
+/* AWG (gateware/awg.py) helpers. */
+
+void awg_init(void);
+int awg_command(const char *cmd, const char *arg);
+void awg_upload(void);
+
+int awg_set_output(const char *state);
+const char *awg_output(void);
+
+#endif /* __AWG_H */
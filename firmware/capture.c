@@ -0,0 +1,209 @@
+// This file is Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+// License: BSD
+
+#include <stdio.h>
+#include <string.h>
+
+#include <generated/csr.h>
+#include <generated/mem.h>
+#include <generated/soc.h>
+#include <libbase/uart.h>
+#include <system.h>
+
+#include "capture.h"
+#include "streamer.h"
+
+#define RECORD_BYTES (CAPTURE_SAMPLE_WIDTH / 8)
+
+static unsigned int points = 2000;
+static unsigned int segments = 1;
+static unsigned int selected;
+
+/*-----------------------------------------------------------------------*/
+/* Control                                                               */
+/*-----------------------------------------------------------------------*/
+
+void capture_init(void) {
+  capture_base_write(CAPTURE_BUFFER_BASE);
+  capture_length_write(CAPTURE_BUFFER_LENGTH);
+  capture_set_points(points);
+}
+
+void capture_arm(void) {
+  capture_control_write(1 << CSR_CAPTURE_CONTROL_ARM_OFFSET);
+}
+
+void capture_force(void) {
+  capture_control_write(1 << CSR_CAPTURE_CONTROL_FORCE_OFFSET);
+}
+
+void capture_stop(void) {
+  capture_control_write(1 << CSR_CAPTURE_CONTROL_STOP_OFFSET);
+}
+
+/* Rigol-style trigger status: WAIT (armed), TD (triggered), STOP. */
+const char *capture_state(void) {
+  unsigned int status = capture_status_read();
+
+  if (status & (1 << CSR_CAPTURE_STATUS_ARMED_OFFSET))
+    return (status & (1 << CSR_CAPTURE_STATUS_TRIGGERED_OFFSET)) ? "TD"
+                                                                 : "WAIT";
+  return "STOP";
+}
+
+/* Records fitting in one segment (the whole buffer when not segmented). */
+static unsigned int capture_capacity(void) {
+  if (segments > 1)
+    return capture_segment_length_read() / RECORD_BYTES;
+  return capture_length_read() / RECORD_BYTES;
+}
+
+/* Records written to the selected segment since it was armed. */
+static unsigned int capture_count(void) {
+  if (segments > 1) {
+    capture_segment_select_write(selected);
+    return capture_segment_count_read();
+  }
+  return capture_count_read();
+}
+
+unsigned int capture_points(void) { return points; }
+
+/* Records kept around the trigger, split evenly before/after it. */
+int capture_set_points(unsigned int n) {
+  if (n < 2 || n > capture_capacity())
+    return -1;
+  points = n;
+  capture_pre_write(n / 2);
+  capture_post_write(n - n / 2);
+  return 0;
+}
+
+/* Records available in the buffer for the last capture (selected segment). */
+unsigned int capture_stored(void) {
+  unsigned int capacity = capture_capacity();
+  unsigned int count = capture_count();
+
+  return count < capacity ? count : capacity;
+}
+
+/* Position of the trigger record in the stored records of the selected
+ * segment (WAV:DATA? block), -1 if not triggered or no longer stored. */
+int capture_trigger_position(void) {
+  unsigned int index, count, stored;
+
+  if (segments > 1) {
+    if (selected >= capture_segment_read())
+      return -1;
+    capture_segment_select_write(selected);
+    index = capture_segment_trigger_index_read();
+  } else {
+    if (!(capture_status_read() & (1 << CSR_CAPTURE_STATUS_TRIGGERED_OFFSET)))
+      return -1;
+    index = capture_trigger_index_read();
+  }
+  count = capture_count();
+  stored = capture_stored();
+  if (index >= count || index < count - stored)
+    return -1;
+  return index - (count - stored);
+}
+
+/*-----------------------------------------------------------------------*/
+/* Segments                                                              */
+/*-----------------------------------------------------------------------*/
+
+unsigned int capture_segments(void) { return segments; }
+
+/* Split the buffer in n segments (1: single capture), each one must still
+ * hold the requested points. */
+int capture_set_segments(unsigned int n) {
+  unsigned int length;
+
+  if (n < 1 || n > CAPTURE_MAX_SEGMENTS)
+    return -1;
+  length = (capture_length_read() / n) & ~(CAPTURE_WORD_BYTES - 1);
+  if (points > length / RECORD_BYTES)
+    return -1;
+  segments = n;
+  selected = 0;
+  capture_segment_length_write(length);
+  capture_segments_write(n);
+  return 0;
+}
+
+/* Segments filled by the last capture. */
+unsigned int capture_segments_filled(void) {
+  return segments > 1 ? capture_segment_read() : 1;
+}
+
+unsigned int capture_selected_segment(void) { return selected; }
+
+int capture_select_segment(unsigned int n) {
+  if (n >= segments)
+    return -1;
+  selected = n;
+  return 0;
+}
+
+/* Trigger time of the selected segment relative to the first one, in
+ * seconds (printed without floating point). */
+void capture_print_segment_time(void) {
+  unsigned long long t0, t;
+
+  capture_segment_select_write(0);
+  t0 = capture_segment_timestamp_read();
+  capture_segment_select_write(selected);
+  t = capture_segment_timestamp_read() - t0;
+  printf("%lu.%09lu\n", (unsigned long)(t / CONFIG_CLOCK_FREQUENCY),
+         (unsigned long)((t % CONFIG_CLOCK_FREQUENCY) * 1000000000ULL /
+                         CONFIG_CLOCK_FREQUENCY));
+}
+
+/*-----------------------------------------------------------------------*/
+/* Readout                                                               */
+/*-----------------------------------------------------------------------*/
+
+/* IEEE-488.2 definite length block (#<n><len><bytes>\n) of len bytes of the
+ * circular buffer buf (size bytes), starting at byte first. The bytes are sent
+ * by the streamer DMA when present (the block is finished once
+ * streamer_busy() is cleared), else by the CPU straight to the UART: printf
+ * would expand '\n'. */
+void capture_write_block(const unsigned char *buf, unsigned int size,
+                         unsigned int first, unsigned int len) {
+  unsigned int i;
+  char digits[12];
+
+  snprintf(digits, sizeof(digits), "%u", len);
+  uart_write('#');
+  uart_write('0' + strlen(digits));
+  for (i = 0; digits[i]; i++)
+    uart_write(digits[i]);
+
+  if (streamer_start((unsigned long)buf - MAIN_RAM_BASE, size, first, len) == 0)
+    return;
+
+  /* Buffers are written by DMA behind the L2 cache. */
+  flush_l2_cache();
+  for (i = first; i < size && len; i++, len--)
+    uart_write(buf[i]);
+  for (i = 0; len; i++, len--)
+    uart_write(buf[i]);
+  uart_write('\n');
+}
+
+/* Stored records of the selected segment, oldest first. */
+void capture_send_block(void) {
+  const unsigned char *buf;
+  unsigned int capacity, stored, first;
+
+  capacity = capture_capacity();
+  stored = capture_stored();
+  first = capacity ? ((capture_count() - stored) % capacity) * RECORD_BYTES : 0;
+  buf = (const unsigned char *)(MAIN_RAM_BASE + capture_base_read());
+  if (segments > 1)
+    buf += selected * capture_segment_length_read();
+
+  capture_write_block(buf, capacity * RECORD_BYTES, first,
+                      stored * RECORD_BYTES);
+}
@@ -0,0 +1,28 @@
+#ifndef __CAPTURE_H
+#define __CAPTURE_H
+
+/* Logic capture (gateware/capture.py) helpers. */
+
+void capture_init(void);
+void capture_arm(void);
+void capture_force(void);
+void capture_stop(void);
+const char *capture_state(void);
+
+unsigned int capture_points(void);
+int capture_set_points(unsigned int points);
+unsigned int capture_stored(void);
+int capture_trigger_position(void);
+
+unsigned int capture_segments(void);
+int capture_set_segments(unsigned int n);
+unsigned int capture_segments_filled(void);
+unsigned int capture_selected_segment(void);
+int capture_select_segment(unsigned int n);
+void capture_print_segment_time(void);
+
+void capture_write_block(const unsigned char *buf, unsigned int size,
+                         unsigned int first, unsigned int len);
+void capture_send_block(void);
+
+#endif /* __CAPTURE_H */
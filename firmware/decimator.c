@@ -0,0 +1,90 @@
+// This file is Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+// License: BSD
+
+#include <stdio.h>
+#include <string.h>
+
+#include <generated/csr.h>
+#include <generated/soc.h>
+
+#include "decimator.h"
+
+#define MAX_RATIO (1 << 20)
+#define MAX_CLOCK_DIVIDER 0xffff
+
+static unsigned int ratio = 1;
+static int peak = 0;
+static unsigned int clock_divider = 1;
+
+void decimator_init(void) {
+  decimator_ratio_write(ratio);
+  decimator_peak_write(peak);
+  sample_clock_divider_write(clock_divider);
+}
+
+int decimator_set_ratio(unsigned int r) {
+  if (r < 1 || r > MAX_RATIO)
+    return -1;
+  ratio = r;
+  decimator_ratio_write(ratio);
+  return 0;
+}
+
+unsigned int decimator_ratio(void) { return ratio; }
+
+/* Acquisition clock cycles per sample (gateware/acqclock.py). */
+int decimator_set_clock_divider(unsigned int d) {
+  if (d < 1 || d > MAX_CLOCK_DIVIDER)
+    return -1;
+  clock_divider = d;
+  sample_clock_divider_write(clock_divider);
+  return 0;
+}
+
+unsigned int decimator_clock_divider(void) { return clock_divider; }
+
+/* NORM: one sample per bin, PEAK: two samples per bin keeping transitions. */
+int decimator_set_type(const char *type) {
+  if (strcmp(type, "NORM") == 0)
+    peak = 0;
+  else if (strcmp(type, "PEAK") == 0)
+    peak = 1;
+  else
+    return -1;
+  decimator_peak_write(peak);
+  return 0;
+}
+
+const char *decimator_type(void) { return peak ? "PEAK" : "NORM"; }
+
+/* Points per bin: peak-detect only applies when decimating. */
+static unsigned int points_per_bin(void) {
+  return (peak && ratio > 1) ? 2 : 1;
+}
+
+/* Stored points per second (samples are taken every clock_divider cycles of
+ * the acquisition clock, the ratio counts samples of LOGIC_SAMPLES_PER_CYCLE
+ * points, decimated bins keep that many points). */
+unsigned int decimator_sample_rate(void) {
+  return (unsigned long long)ACQ_CLOCK_FREQUENCY * LOGIC_SAMPLES_PER_CYCLE *
+         points_per_bin() / ((unsigned long long)ratio * clock_divider);
+}
+
+/* Seconds between stored points, formatted for the preamble without floating
+ * point (picosecond resolution, divided in two 10^6 steps so ratio *
+ * clock_divider * 10^12 does not overflow). */
+const char *decimator_xincrement(void) {
+  static char buf[24];
+  unsigned long long cycles, rate, us, ps, frac;
+
+  cycles = (unsigned long long)ratio * clock_divider;
+  rate = (unsigned long long)ACQ_CLOCK_FREQUENCY * LOGIC_SAMPLES_PER_CYCLE *
+         points_per_bin();
+  us = cycles * 1000000ULL / rate;
+  ps = us * 1000000ULL + (cycles * 1000000ULL % rate) * 1000000ULL / rate;
+  frac = ps % 1000000000000ULL;
+  snprintf(buf, sizeof(buf), "%lu.%06lu%06lu",
+           (unsigned long)(ps / 1000000000000ULL),
+           (unsigned long)(frac / 1000000), (unsigned long)(frac % 1000000));
+  return buf;
+}
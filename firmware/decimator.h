@@ -0,0 +1,18 @@
+#ifndef __DECIMATOR_H
+#define __DECIMATOR_H
+
+/* Decimator (gateware/decimate.py) helpers. */
+
+void decimator_init(void);
+
+int decimator_set_ratio(unsigned int ratio);
+unsigned int decimator_ratio(void);
+int decimator_set_clock_divider(unsigned int divider);
+unsigned int decimator_clock_divider(void);
+int decimator_set_type(const char *type);
+const char *decimator_type(void);
+
+unsigned int decimator_sample_rate(void);
+const char *decimator_xincrement(void);
+
+#endif /* __DECIMATOR_H */
@@ -0,0 +1,228 @@
+// This file is Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+// License: BSD
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include <generated/csr.h>
+#include <generated/mem.h>
+#include <generated/soc.h>
+#include <hw/common.h>
+
+#include "capture.h"
+#include "decoder.h"
+#include "trigger.h"
+
+#define RECORD_BYTES (EVENTS_RECORD_WIDTH / 8)
+
+/* Event kinds, see gateware/decode.py. */
+#define EVENT_DATA 0
+
+/* Per instance CSR addresses. */
+static const unsigned long uart_rx[] = {
+    CSR_DECODERS_UART0_RX_ADDR,
+#ifdef CSR_DECODERS_UART1_RX_ADDR
+    CSR_DECODERS_UART1_RX_ADDR,
+#endif
+};
+static const unsigned long uart_divider[] = {
+    CSR_DECODERS_UART0_DIVIDER_ADDR,
+#ifdef CSR_DECODERS_UART1_DIVIDER_ADDR
+    CSR_DECODERS_UART1_DIVIDER_ADDR,
+#endif
+};
+
+struct spi_pins {
+  const char *name;
+  unsigned long addr;
+};
+static const struct spi_pins spi_pins[] = {
+    {"CLK", CSR_DECODERS_SPI0_CLK_ADDR},
+    {"MOSI", CSR_DECODERS_SPI0_MOSI_ADDR},
+    {"MISO", CSR_DECODERS_SPI0_MISO_ADDR},
+    {"CS", CSR_DECODERS_SPI0_CS_ADDR},
+};
+static unsigned int spi_control;
+static unsigned int i2c_control;
+
+/*-----------------------------------------------------------------------*/
+/* Event buffer                                                          */
+/*-----------------------------------------------------------------------*/
+
+void decoder_init(void) {
+  events_base_write(EVENTS_BUFFER_BASE);
+  events_length_write(EVENTS_BUFFER_LENGTH);
+  /* No trigger: events are stored until stopped. */
+  events_pre_write(0);
+}
+
+void decoder_run(void) {
+  events_control_write(1 << CSR_EVENTS_CONTROL_ARM_OFFSET);
+}
+
+void decoder_stop(void) {
+  events_control_write(1 << CSR_EVENTS_CONTROL_STOP_OFFSET);
+}
+
+unsigned int decoder_stored(void) {
+  unsigned int capacity = events_length_read() / RECORD_BYTES;
+  unsigned int count = events_count_read();
+
+  return count < capacity ? count : capacity;
+}
+
+/* Stored events, oldest first (all-zeros records are padding). */
+void decoder_send_block(void) {
+  unsigned int capacity, stored, first;
+
+  capacity = events_length_read() / RECORD_BYTES;
+  stored = decoder_stored();
+  first = capacity ? ((events_count_read() - stored) % capacity) * RECORD_BYTES
+                   : 0;
+  capture_write_block(
+      (const unsigned char *)(MAIN_RAM_BASE + events_base_read()),
+      capacity * RECORD_BYTES, first, stored * RECORD_BYTES);
+}
+
+/*-----------------------------------------------------------------------*/
+/* Configuration                                                         */
+/*-----------------------------------------------------------------------*/
+
+/* Decoder index in event records from "UART<n>", "SPI<n>" or "IIC<n>". */
+static int decoder_index(const char *name) {
+  unsigned int n;
+
+  if (sscanf(name, "UART%u", &n) == 1 && n < DECODER_UARTS)
+    return n;
+  if (sscanf(name, "SPI%u", &n) == 1 && n < DECODER_SPIS)
+    return DECODER_UARTS + n;
+  if (sscanf(name, "IIC%u", &n) == 1 && n < DECODER_I2CS)
+    return DECODER_UARTS + DECODER_SPIS + n;
+  return -1;
+}
+
+static int uart_command(unsigned int n, const char *field, const char *arg) {
+  unsigned long baud;
+  int channel;
+
+  if (n >= DECODER_UARTS)
+    return -1;
+  if (strcmp(field, "RX") == 0) {
+    if ((channel = logic_channel(arg)) < 0)
+      return -1;
+    csr_write_simple(channel, uart_rx[n]);
+  } else if (strcmp(field, "BAUD") == 0) {
+    /* 0 disables the decoder. */
+    baud = strtoul(arg, NULL, 0);
+    csr_write_simple(baud ? CONFIG_CLOCK_FREQUENCY / baud : 0, uart_divider[n]);
+  } else
+    return -1;
+  return 0;
+}
+
+static int spi_command(unsigned int n, const char *field, const char *arg) {
+  unsigned int i, mode;
+  int channel;
+
+  if (n >= DECODER_SPIS)
+    return -1;
+  for (i = 0; i < sizeof(spi_pins) / sizeof(spi_pins[0]); i++)
+    if (strcmp(field, spi_pins[i].name) == 0) {
+      if ((channel = logic_channel(arg)) < 0)
+        return -1;
+      csr_write_simple(channel, spi_pins[i].addr);
+      return 0;
+    }
+  if (strcmp(field, "MODE") == 0) {
+    mode = strtoul(arg, NULL, 0);
+    if (mode > 3)
+      return -1;
+    spi_control &= ~((1 << CSR_DECODERS_SPI0_CONTROL_CPOL_OFFSET) |
+                     (1 << CSR_DECODERS_SPI0_CONTROL_CPHA_OFFSET));
+    spi_control |= ((mode >> 1) << CSR_DECODERS_SPI0_CONTROL_CPOL_OFFSET) |
+                   ((mode & 1) << CSR_DECODERS_SPI0_CONTROL_CPHA_OFFSET);
+  } else if (strcmp(field, "LSB") == 0) {
+    spi_control &= ~(1 << CSR_DECODERS_SPI0_CONTROL_LSB_FIRST_OFFSET);
+    spi_control |= (atoi(arg) != 0) << CSR_DECODERS_SPI0_CONTROL_LSB_FIRST_OFFSET;
+  } else if (strcmp(field, "ENAB") == 0) {
+    spi_control &= ~(1 << CSR_DECODERS_SPI0_CONTROL_ENABLE_OFFSET);
+    spi_control |= (atoi(arg) != 0) << CSR_DECODERS_SPI0_CONTROL_ENABLE_OFFSET;
+  } else
+    return -1;
+  decoders_spi0_control_write(spi_control);
+  return 0;
+}
+
+static int i2c_command(unsigned int n, const char *field, const char *arg) {
+  int channel;
+
+  if (n >= DECODER_I2CS)
+    return -1;
+  if (strcmp(field, "CLK") == 0 || strcmp(field, "DATA") == 0) {
+    if ((channel = logic_channel(arg)) < 0)
+      return -1;
+    if (field[0] == 'C')
+      decoders_i2c0_scl_write(channel);
+    else
+      decoders_i2c0_sda_write(channel);
+  } else if (strcmp(field, "ENAB") == 0) {
+    i2c_control = (atoi(arg) != 0) << CSR_DECODERS_I2C0_CONTROL_ENABLE_OFFSET;
+    decoders_i2c0_control_write(i2c_control);
+  } else
+    return -1;
+  return 0;
+}
+
+/* ":DEC:" commands (cmd without the prefix, arg its argument), -1 on error:
+ *   UART<n>:RX D<k> / UART<n>:BAUD <baud>
+ *   SPI<n>:CLK|MOSI|MISO|CS D<k> / SPI<n>:MODE <0-3> / SPI<n>:LSB|ENAB <0|1>
+ *   IIC<n>:CLK|DATA D<k> / IIC<n>:ENAB <0|1>
+ *   RUN / STOP / COUNQ / DATAQ / OVERQ */
+int decoder_command(const char *cmd, const char *arg) {
+  char field[8];
+  unsigned int n;
+
+  if (strcmp(cmd, "RUN") == 0)
+    decoder_run();
+  else if (strcmp(cmd, "STOP") == 0)
+    decoder_stop();
+  else if (strcmp(cmd, "COUNQ") == 0)
+    printf("%u\n", decoder_stored());
+  else if (strcmp(cmd, "DATAQ") == 0)
+    decoder_send_block();
+  else if (strcmp(cmd, "OVERQ") == 0)
+    printf("%u\n", (unsigned int)decoders_overflow_read());
+  else if (sscanf(cmd, "UART%u:%7s", &n, field) == 2)
+    return uart_command(n, field, arg);
+  else if (sscanf(cmd, "SPI%u:%7s", &n, field) == 2)
+    return spi_command(n, field, arg);
+  else if (sscanf(cmd, "IIC%u:%7s", &n, field) == 2)
+    return i2c_command(n, field, arg);
+  else
+    return -1;
+  return 0;
+}
+
+/*-----------------------------------------------------------------------*/
+/* Trigger                                                               */
+/*-----------------------------------------------------------------------*/
+
+/* Trigger the logic capture on a byte decoded by decoder ("OFF" disables). */
+int decoder_set_trigger(const char *decoder, const char *value) {
+  int index;
+
+  if (strcmp(decoder, "OFF") == 0) {
+    decoders_trigger_control_write(0);
+    return 0;
+  }
+  if ((index = decoder_index(decoder)) < 0)
+    return -1;
+  decoders_trigger_value_write(strtoul(value, NULL, 0));
+  decoders_trigger_mask_write(0xff);
+  decoders_trigger_control_write(
+      (1 << CSR_DECODERS_TRIGGER_CONTROL_ENABLE_OFFSET) |
+      (index << CSR_DECODERS_TRIGGER_CONTROL_DECODER_OFFSET) |
+      (EVENT_DATA << CSR_DECODERS_TRIGGER_CONTROL_KIND_OFFSET));
+  return 0;
+}
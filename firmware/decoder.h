@@ -0,0 +1,16 @@
+#ifndef __DECODER_H
+#define __DECODER_H
+
+/* Protocol decoders (gateware/decode.py) and event buffer helpers. */
+
+void decoder_init(void);
+int decoder_command(const char *cmd, const char *arg);
+
+void decoder_run(void);
+void decoder_stop(void);
+unsigned int decoder_stored(void);
+void decoder_send_block(void);
+
+int decoder_set_trigger(const char *decoder, const char *value);
+
+#endif /* __DECODER_H */
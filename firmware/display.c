@@ -0,0 +1,82 @@
+// This file is Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+// License: BSD
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include <generated/csr.h>
+#include <generated/soc.h>
+
+#include "display.h"
+
+#ifdef CSR_RASTER_BASE
+
+#define INTENSITY_MAX ((1 << RASTER_INTENSITY_BITS) - 1)
+
+/* Persistence in ms (0: infinite), for queries. */
+static unsigned long persistence;
+
+static void set_bit(unsigned int offset, int value) {
+  unsigned int control = raster_control_read();
+
+  control &= ~(1 << CSR_RASTER_CONTROL_CLEAR_OFFSET);
+
+  if (value)
+    control |= 1 << offset;
+  else
+    control &= ~(1 << offset);
+  raster_control_write(control);
+}
+
+static void set_persistence(unsigned long ms) {
+  /* Time for a full intensity pixel to fade out. */
+  persistence = ms;
+  raster_decay_write(
+      ((unsigned long long)ms * (CONFIG_CLOCK_FREQUENCY / 1000)) /
+      INTENSITY_MAX);
+}
+
+void display_init(void) {
+  raster_control_write((1 << CSR_RASTER_CONTROL_ENABLE_OFFSET) |
+                       (1 << CSR_RASTER_CONTROL_AUTO_OFFSET) |
+                       (1 << CSR_RASTER_CONTROL_CLEAR_OFFSET));
+  set_persistence(200);
+}
+
+/* ":DISP" commands (cmd without the prefix, arg its argument), -1 on error:
+ *   :ENAB <0|1> / :AUTO <0|1> (sweep without trigger)
+ *   :PERS <ms> (fade out time, 0: infinite)
+ *   and their queries (:ENABQ...)
+ *   :CLE (clear) / :COUNQ (sweeps drawn since reset) */
+int display_command(const char *cmd, const char *arg) {
+  if (strcmp(cmd, ":ENAB") == 0)
+    set_bit(CSR_RASTER_CONTROL_ENABLE_OFFSET, atoi(arg));
+  else if (strcmp(cmd, ":ENABQ") == 0)
+    printf("%u\n",
+           (raster_control_read() >> CSR_RASTER_CONTROL_ENABLE_OFFSET) & 1);
+  else if (strcmp(cmd, ":AUTO") == 0)
+    set_bit(CSR_RASTER_CONTROL_AUTO_OFFSET, atoi(arg));
+  else if (strcmp(cmd, ":AUTOQ") == 0)
+    printf("%u\n",
+           (raster_control_read() >> CSR_RASTER_CONTROL_AUTO_OFFSET) & 1);
+  else if (strcmp(cmd, ":PERS") == 0)
+    set_persistence(strtoul(arg, NULL, 0));
+  else if (strcmp(cmd, ":PERSQ") == 0)
+    printf("%lu\n", persistence);
+  else if (strcmp(cmd, ":CLE") == 0)
+    raster_control_write(raster_control_read() |
+                         (1 << CSR_RASTER_CONTROL_CLEAR_OFFSET));
+  else if (strcmp(cmd, ":COUNQ") == 0)
+    printf("%lu\n", (unsigned long)raster_count_read());
+  else
+    return -1;
+  return 0;
+}
+
+#else
+
+void display_init(void) {}
+int display_command(const char *cmd, const char *arg) { return -1; }
+
+#endif /* CSR_RASTER_BASE */
@@ -0,0 +1,9 @@
+#ifndef __DISPLAY_H
+#define __DISPLAY_H
+
+/* Waveform display (gateware/raster.py) helpers. */
+
+void display_init(void);
+int display_command(const char *cmd, const char *arg);
+
+#endif /* __DISPLAY_H */
@@ -0,0 +1,170 @@
+// This file is Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+// License: BSD
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include <generated/csr.h>
+#include <generated/soc.h>
+#include <hw/common.h>
+
+#include "fgen.h"
+
+#ifdef CSR_FGEN_BASE
+
+/* Per output CSR addresses, outputs are numbered after their fGen pin. */
+struct fgen_out {
+  unsigned int pin;
+  unsigned long frequency;
+  unsigned long duty;
+  unsigned long phase;
+};
+#define FGEN_OUT(n)                                                            \
+  {                                                                            \
+    n, CSR_FGEN_OUT##n##_FREQUENCY_ADDR, CSR_FGEN_OUT##n##_DUTY_ADDR,          \
+        CSR_FGEN_OUT##n##_PHASE_ADDR                                           \
+  }
+static const struct fgen_out outs[] = {
+#ifdef CSR_FGEN_OUT0_FREQUENCY_ADDR
+    FGEN_OUT(0),
+#endif
+#ifdef CSR_FGEN_OUT1_FREQUENCY_ADDR
+    FGEN_OUT(1),
+#endif
+#ifdef CSR_FGEN_OUT2_FREQUENCY_ADDR
+    FGEN_OUT(2),
+#endif
+#ifdef CSR_FGEN_OUT3_FREQUENCY_ADDR
+    FGEN_OUT(3),
+#endif
+#ifdef CSR_FGEN_OUT4_FREQUENCY_ADDR
+    FGEN_OUT(4),
+#endif
+#ifdef CSR_FGEN_OUT5_FREQUENCY_ADDR
+    FGEN_OUT(5),
+#endif
+#ifdef CSR_FGEN_OUT6_FREQUENCY_ADDR
+    FGEN_OUT(6),
+#endif
+#ifdef CSR_FGEN_OUT7_FREQUENCY_ADDR
+    FGEN_OUT(7),
+#endif
+#ifdef CSR_FGEN_OUT8_FREQUENCY_ADDR
+    FGEN_OUT(8),
+#endif
+#ifdef CSR_FGEN_OUT9_FREQUENCY_ADDR
+    FGEN_OUT(9),
+#endif
+#ifdef CSR_FGEN_OUT10_FREQUENCY_ADDR
+    FGEN_OUT(10),
+#endif
+};
+#define NOUTS (sizeof(outs) / sizeof(outs[0]))
+
+/* Requested settings, for queries. */
+static unsigned long frequency[NOUTS];
+static unsigned int duty[NOUTS];
+static unsigned int phase[NOUTS];
+
+static const struct fgen_out *find(unsigned int pin, unsigned int *index) {
+  unsigned int i;
+
+  for (i = 0; i < NOUTS; i++)
+    if (outs[i].pin == pin) {
+      *index = i;
+      return &outs[i];
+    }
+  return NULL;
+}
+
+void fgen_init(void) {
+  unsigned int i;
+
+  fgen_control_write(1 << CSR_FGEN_CONTROL_STOP_OFFSET);
+  fgen_enable_write(0);
+  for (i = 0; i < NOUTS; i++) {
+    frequency[i] = 1000;
+    duty[i] = 50;
+    phase[i] = 0;
+    csr_write_simple(((unsigned long long)frequency[i] << 32) /
+                         CONFIG_CLOCK_FREQUENCY,
+                     outs[i].frequency);
+    csr_write_simple(1UL << 31, outs[i].duty);
+    csr_write_simple(0, outs[i].phase);
+  }
+}
+
+static int out_command(unsigned int pin, const char *field, const char *arg) {
+  const struct fgen_out *out;
+  unsigned long value;
+  unsigned int i;
+
+  if ((out = find(pin, &i)) == NULL)
+    return -1;
+  if (strcmp(field, "FREQ") == 0) {
+    /* Hz, up to sys_clk / 2. */
+    value = strtoul(arg, NULL, 0);
+    if (value > CONFIG_CLOCK_FREQUENCY / 2)
+      return -1;
+    frequency[i] = value;
+    csr_write_simple(((unsigned long long)value << 32) / CONFIG_CLOCK_FREQUENCY,
+                     out->frequency);
+  } else if (strcmp(field, "FREQQ") == 0)
+    printf("%lu\n", frequency[i]);
+  else if (strcmp(field, "DUTY") == 0) {
+    /* Percent, 100 keeps the output high. */
+    value = strtoul(arg, NULL, 0);
+    if (value > 100)
+      return -1;
+    duty[i] = value;
+    csr_write_simple(value == 100 ? 0xffffffff
+                                  : ((unsigned long long)value << 32) / 100,
+                     out->duty);
+  } else if (strcmp(field, "DUTYQ") == 0)
+    printf("%u\n", duty[i]);
+  else if (strcmp(field, "PHAS") == 0) {
+    /* Degrees, applied relative to the common start. */
+    phase[i] = strtoul(arg, NULL, 0) % 360;
+    csr_write_simple(((unsigned long long)phase[i] << 32) / 360, out->phase);
+  } else if (strcmp(field, "PHASQ") == 0)
+    printf("%u\n", phase[i]);
+  else if (strcmp(field, "ENAB") == 0) {
+    if (atoi(arg))
+      fgen_enable_write(fgen_enable_read() | (1 << pin));
+    else
+      fgen_enable_write(fgen_enable_read() & ~(1 << pin));
+  } else if (strcmp(field, "ENABQ") == 0)
+    printf("%u\n", (unsigned int)(fgen_enable_read() >> pin) & 1);
+  else
+    return -1;
+  return 0;
+}
+
+/* ":FGEN" commands (cmd without the prefix, arg its argument), -1 on error:
+ *   <n>:FREQ <Hz> / <n>:DUTY <percent> / <n>:PHAS <degrees> / <n>:ENAB <0|1>
+ *   and their queries (<n>:FREQQ...), n being the fGen pin
+ *   :STAR (start enabled outputs in phase) / :STOP / :STATQ */
+int fgen_command(const char *cmd, const char *arg) {
+  char field[8];
+  unsigned int pin;
+
+  if (strcmp(cmd, ":STAR") == 0)
+    fgen_control_write(1 << CSR_FGEN_CONTROL_START_OFFSET);
+  else if (strcmp(cmd, ":STOP") == 0)
+    fgen_control_write(1 << CSR_FGEN_CONTROL_STOP_OFFSET);
+  else if (strcmp(cmd, ":STATQ") == 0)
+    printf("%s\n", fgen_running_read() ? "RUN" : "STOP");
+  else if (sscanf(cmd, "%u:%7s", &pin, field) == 2)
+    return out_command(pin, field, arg);
+  else
+    return -1;
+  return 0;
+}
+
+#else
+
+void fgen_init(void) {}
+int fgen_command(const char *cmd, const char *arg) { return -1; }
+
+#endif /* CSR_FGEN_BASE */
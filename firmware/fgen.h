@@ -0,0 +1,9 @@
+#ifndef __FGEN_H
+#define __FGEN_H
+
+/* Frequency generator (gateware/nco.py) helpers. */
+
+void fgen_init(void);
+int fgen_command(const char *cmd, const char *arg);
+
+#endif /* __FGEN_H */
@@ -10,6 +10,18 @@
 #include <libbase/console.h>
 #include <libbase/uart.h>
 
+#include "awg.h"
+#include "capture.h"
+#include "decimator.h"
+#include "decoder.h"
+#include "display.h"
+#include "fgen.h"
+#include "measure.h"
+#include "perf.h"
+#include "scpi.h"
+#include "streamer.h"
+#include "trigger.h"
+
 /*-----------------------------------------------------------------------*/
 /* Uart                                                                  */
 /*-----------------------------------------------------------------------*/
@@ -19,7 +31,9 @@ static char *readstr(void) {
   static char s[64];
   static int ptr = 0;
 
-  if (readchar_nonblock()) {
+  /* RX is interrupt driven (libbase ring buffer), only complete lines are
+   * handled here. */
+  while (readchar_nonblock()) {
     c[0] = getchar();
     c[1] = 0;
     switch (c[0]) {
@@ -51,21 +65,6 @@ static char *readstr(void) {
   return NULL;
 }
 
-static char *get_token(char **str) {
-  char *c, *d;
-
-  c = (char *)strchr(*str, ' ');
-  if (c == NULL) {
-    d = *str;
-    *str = *str + strlen(*str);
-    return d;
-  }
-  *c = 0;
-  d = *str;
-  *str = c + 1;
-  return d;
-}
-
 static void prompt(void) { printf("\e[92;1mSadScope\e[0m> "); }
 
 /*-----------------------------------------------------------------------*/
@@ -94,10 +93,23 @@ static void help(void) {
 /* Commands                                                              */
 /*-----------------------------------------------------------------------*/
 
-static void reboot_cmd(void) { ctrl_reset_write(1); }
+static int help_cmd(struct scpi_request *req) {
+  help();
+  return 0;
+}
+
+static int reboot_cmd(struct scpi_request *req) {
+  ctrl_reset_write(1);
+  return 0;
+}
+
+static int clear_cmd(struct scpi_request *req) {
+  printf("\e[1;1H\e[2J");
+  return 0;
+}
 
 #ifdef CSR_LEDS_BASE
-static void led_cmd(void) {
+static int led_cmd(struct scpi_request *req) {
   int i;
   printf("Led demo...\n");
 
@@ -124,128 +136,408 @@ static void led_cmd(void) {
     leds_out_write(0xaa);
     busy_wait(200);
   }
+  return 0;
 }
 #endif
 
 extern void donut(void);
 
-static void donut_cmd(void) {
+static int donut_cmd(struct scpi_request *req) {
   printf("Donut demo...\n");
   donut();
+  return 0;
 }
 
 extern void helloc(void);
 
-static void helloc_cmd(void) {
+static int helloc_cmd(struct scpi_request *req) {
   printf("Hello C demo...\n");
   helloc();
+  return 0;
 }
 
 #ifdef WITH_CXX
 extern void hellocpp(void);
 
-static void hellocpp_cmd(void) {
+static int hellocpp_cmd(struct scpi_request *req) {
   printf("Hello C++ demo...\n");
   hellocpp();
+  return 0;
 }
 #endif
 
 /*-----------------------------------------------------------------------*/
-/* Console service / Main                                                */
+/* SCPI commands                                                         */
 /*-----------------------------------------------------------------------*/
 
-static void console_service(void) {
-  char *str;
-  char *token;
-  int pos;
-  int lev;
-
-  str = readstr();
+static int idn_cmd(struct scpi_request *req) {
+  printf("SD,SadOscilloscope,0,0.01-0.0-0.0\n");
+  return 0;
+}
 
-  /* Channel Number */
-  int CHAN;
-  /* Channel Name */
-  char CHAN_Name[10];
+static int chan_disp_query(struct scpi_request *req) {
+  printf("1\n"); // FIXME: Dynamically send
+  return 0;
+}
 
-  if (str == NULL)
-    return;
-  token = get_token(&str);
-  if (strcmp(token, "WAV:DATAQ") == 0)
-    for (int i = 0; i < 2000; i++) {
-      printf("%d", i & 0xF);
-      busy_wait(1);
-      printf("\n");
-    }
-  else if (strcmp(token, "help") == 0)
-    help();
+/* Waveform source, blocks always hold all the channels. */
+static int wav_source = 0;
 
-  else if (strcmp(token, "reboot") == 0)
-    reboot_cmd();
+static int wav_sour_cmd(struct scpi_request *req) {
+  int channel = logic_channel(scpi_arg(req, 0));
 
-  else if (strcmp(token, "*IDN?") == 0)
-    printf("SD,SadOscilloscope,0,0.01-0.0-0.0\n");
+  if (channel < 0)
+    return -1;
+  wav_source = channel;
+  return 0;
+}
 
-  else if (sscanf(token, ":ch%i:DISPQ%n", &CHAN, &pos) == 1 &&
-           pos == strlen(token))
-    printf("1\n"); // FIXME: Dynamically send
+static int wav_sour_query(struct scpi_request *req) {
+  printf("D%d\n", wav_source);
+  return 0;
+}
 
-  else if (sscanf(token, "WAV:SOUR %s%n", CHAN_Name, &pos) == 1 &&
-           pos == strlen(token))
-    ; // FIXME: Select Source!
+static int wav_data_query(struct scpi_request *req) {
+  capture_send_block();
+  return 0;
+}
 
-  else if (strcmp(token, "WAV:PREQ") == 0)
-    /* printf("%d,%d,%zu,%d,%f,%f,%f,%f,%f,%f\n", */
-    printf("0,2,1000,1,1e-6,-3.e-03,0,1.0,0,0");
+static int wav_pre_query(struct scpi_request *req) {
+  /* printf("%d,%d,%zu,%d,%f,%f,%f,%f,%f,%f\n", */
+  printf("0,2,%u,1,%s,0,%d,1.0,0,0\n", capture_stored(),
+         decimator_xincrement(), capture_trigger_position());
   /* 0,            // unused */
   /* 0,            // unused */
   /* (size_t)1000, // npoints, */
   /* 1             // unused3, */
-  /* 1e-6,         // sec_per_sample, */
-  /* 0.0,          // xorigin, */
-  /* 0.0,          // xreference, */
+  /* 1e-6,         // sec_per_sample (decimation ratio / sys_clk), */
+  /* 0.0,          // xorigin (times relative to the first record), */
+  /* -1,           // xreference: trigger record in WAV:DATA? (-1: none), */
   /* 1.0,          // yincrement, */
   /* 0.0,          // yorigin, */
   /* 122.0         // yreference); */
   /* ); // FIXME: Dynamically send */
+  return 0;
+}
+
+static int wav_segm_cmd(struct scpi_request *req) {
+  return capture_select_segment(strtoul(scpi_arg(req, 0), NULL, 0));
+}
+
+static int wav_segm_query(struct scpi_request *req) {
+  printf("%u\n", capture_selected_segment());
+  return 0;
+}
 
-  else if (strcmp(token, ":TRIG:MODEQ") == 0)
-    printf("EDGE\n"); // FIXME: Dynamically send
+static int wav_segm_count_query(struct scpi_request *req) {
+  printf("%u\n", capture_segments_filled());
+  return 0;
+}
 
-  else if (strcmp(token, ":TRIG:STATQ") == 0)
-    printf("RUN\n"); // FIXME: Dynamically send
+static int wav_segm_time_query(struct scpi_request *req) {
+  capture_print_segment_time();
+  return 0;
+}
 
-  else if (strcmp(token, ":TRIG:EDGE:SOURQ") == 0)
-    printf("CHAN1\n"); // FIXME: Dynamically send
+/* Acquisition. */
 
-  else if (sscanf(token, "TRIG:EDGE:LEV  %d", &lev) == 1) {
-    /* leds_out_write((int)lev); */
-    printf("LEVVV\n");
+static int sing_cmd(struct scpi_request *req) {
+  capture_arm();
+  return 0;
+}
 
-  } else if (strcmp(token, ":TRIG:EDGE:SLOPEQ") == 0)
-    printf("POS\n"); // FIXME: Dynamically send
+static int stop_cmd(struct scpi_request *req) {
+  capture_stop();
+  return 0;
+}
 
-  else if (strcmp(token, ":TRIG:EDGE:LEVQ") == 0)
-    printf("0\n"); // FIXME: Dynamically send
+static int tfor_cmd(struct scpi_request *req) {
+  capture_force();
+  return 0;
+}
 
-  else if (strcmp(token, "clear") == 0)
-    printf("\e[1;1H\e[2J");
+static int acq_mdep_cmd(struct scpi_request *req) {
+  return capture_set_points(strtoul(scpi_arg(req, 0), NULL, 0));
+}
 
-#ifdef CSR_LEDS_BASE
-  else if (strcmp(token, "led") == 0)
-    led_cmd();
-#endif
-  else if (strcmp(token, "donut") == 0)
-    donut_cmd();
+static int acq_mdep_query(struct scpi_request *req) {
+  printf("%u\n", capture_points());
+  return 0;
+}
+
+static int acq_dec_cmd(struct scpi_request *req) {
+  return decimator_set_ratio(strtoul(scpi_arg(req, 0), NULL, 0));
+}
+
+static int acq_dec_query(struct scpi_request *req) {
+  printf("%u\n", decimator_ratio());
+  return 0;
+}
+
+static int acq_clkd_cmd(struct scpi_request *req) {
+  return decimator_set_clock_divider(strtoul(scpi_arg(req, 0), NULL, 0));
+}
+
+static int acq_clkd_query(struct scpi_request *req) {
+  printf("%u\n", decimator_clock_divider());
+  return 0;
+}
+
+static int acq_type_cmd(struct scpi_request *req) {
+  return decimator_set_type(scpi_arg(req, 0));
+}
+
+static int acq_type_query(struct scpi_request *req) {
+  printf("%s\n", decimator_type());
+  return 0;
+}
+
+static int acq_srat_query(struct scpi_request *req) {
+  printf("%u\n", decimator_sample_rate());
+  return 0;
+}
+
+static int acq_segm_cmd(struct scpi_request *req) {
+  return capture_set_segments(strtoul(scpi_arg(req, 0), NULL, 0));
+}
+
+static int acq_segm_query(struct scpi_request *req) {
+  printf("%u\n", capture_segments());
+  return 0;
+}
+
+/* Trigger. */
+
+static int trig_mode_cmd(struct scpi_request *req) {
+  return trigger_set_mode(scpi_arg(req, 0));
+}
+
+static int trig_mode_query(struct scpi_request *req) {
+  printf("%s\n", trigger_mode());
+  return 0;
+}
+
+static int trig_stat_query(struct scpi_request *req) {
+  printf("%s\n", capture_state());
+  return 0;
+}
+
+static int trig_dec_cmd(struct scpi_request *req) {
+  return decoder_set_trigger(scpi_arg(req, 0), scpi_arg(req, 1));
+}
+
+static int trig_edge_sour_cmd(struct scpi_request *req) {
+  return trigger_set_source(scpi_arg(req, 0));
+}
+
+static int trig_edge_sour_query(struct scpi_request *req) {
+  printf("D%d\n", trigger_source());
+  return 0;
+}
+
+static int trig_edge_lev_cmd(struct scpi_request *req) {
+  trigger_set_level(atoi(scpi_arg(req, 0)));
+  return 0;
+}
+
+static int trig_edge_lev_query(struct scpi_request *req) {
+  printf("%d\n", trigger_level());
+  return 0;
+}
+
+static int trig_edge_slope_cmd(struct scpi_request *req) {
+  return trigger_set_slope(scpi_arg(req, 0));
+}
+
+static int trig_edge_slope_query(struct scpi_request *req) {
+  printf("%s\n", trigger_slope());
+  return 0;
+}
+
+static int trig_patt_cmd(struct scpi_request *req) {
+  return trigger_set_pattern(scpi_arg(req, 0));
+}
+
+static int trig_patt_query(struct scpi_request *req) {
+  printf("%s\n", trigger_pattern());
+  return 0;
+}
+
+static int trig_hold_cmd(struct scpi_request *req) {
+  trigger_set_holdoff(strtoul(scpi_arg(req, 0), NULL, 0));
+  return 0;
+}
+
+static int trig_hold_query(struct scpi_request *req) {
+  printf("%u\n", trigger_holdoff());
+  return 0;
+}
+
+/* Subsystems (their own command parsing, req->rest is the header after the
+ * prefix). */
+
+static int dec_cmd(struct scpi_request *req) {
+  return *req->rest == ':' ? decoder_command(req->rest + 1, scpi_arg(req, 0))
+                           : -1;
+}
+
+static int sour_cmd(struct scpi_request *req) {
+  return *req->rest == ':' ? awg_command(req->rest + 1, scpi_arg(req, 0)) : -1;
+}
+
+static int fgen_cmd(struct scpi_request *req) {
+  return fgen_command(req->rest, scpi_arg(req, 0));
+}
+
+static int disp_cmd(struct scpi_request *req) {
+  return display_command(req->rest, scpi_arg(req, 0));
+}
+
+static int outp_cmd(struct scpi_request *req) {
+  return awg_set_output(scpi_arg(req, 0));
+}
+
+static int outp_query(struct scpi_request *req) {
+  printf("%s\n", awg_output());
+  return 0;
+}
+
+/* Measurements (reciprocal counters, no capture needed). */
+
+static int meas_freq_query(struct scpi_request *req) {
+  return meas_print(MEAS_FREQ, scpi_arg(req, 0));
+}
+
+static int meas_per_query(struct scpi_request *req) {
+  return meas_print(MEAS_PER, scpi_arg(req, 0));
+}
+
+static int meas_pwid_query(struct scpi_request *req) {
+  return meas_print(MEAS_PWID, scpi_arg(req, 0));
+}
+
+static int meas_duty_query(struct scpi_request *req) {
+  return meas_print(MEAS_DUTY, scpi_arg(req, 0));
+}
+
+static int meas_edge_query(struct scpi_request *req) {
+  return meas_print(MEAS_EDGE, scpi_arg(req, 0));
+}
+
+static int meas_all_query(struct scpi_request *req) {
+  return meas_print_all(scpi_arg(req, 0));
+}
+
+static int meas_gate_cmd(struct scpi_request *req) {
+  return meas_set_gate(strtoul(scpi_arg(req, 0), NULL, 0));
+}
 
-  else if (strcmp(token, "helloc") == 0)
-    helloc_cmd();
+static int meas_gate_query(struct scpi_request *req) {
+  printf("%u\n", meas_gate_ms());
+  return 0;
+}
+
+/* System. */
 
+static int syst_stat_query(struct scpi_request *req) { return perf_print(); }
+
+static int syst_stat_names_query(struct scpi_request *req) {
+  perf_print_names();
+  return 0;
+}
+
+static int syst_stat_clear_cmd(struct scpi_request *req) {
+  return perf_clear();
+}
+
+static const struct scpi_command commands[] = {
+    /* Header, handler, minimum arguments, prefix. */
+    {"*IDNQ", idn_cmd},
+    {":CH#:DISPQ", chan_disp_query},
+
+    {"WAV:SOUR", wav_sour_cmd, 1},
+    {"WAV:SOURQ", wav_sour_query},
+    {"WAV:DATAQ", wav_data_query},
+    {"WAV:PREQ", wav_pre_query},
+    {"WAV:SEGM", wav_segm_cmd, 1},
+    {"WAV:SEGMQ", wav_segm_query},
+    {"WAV:SEGM:COUNQ", wav_segm_count_query},
+    {"WAV:SEGM:TIMQ", wav_segm_time_query},
+
+    {":SING", sing_cmd},
+    {":STOP", stop_cmd},
+    {":TFOR", tfor_cmd},
+    {":ACQ:MDEP", acq_mdep_cmd, 1},
+    {":ACQ:MDEPQ", acq_mdep_query},
+    {":ACQ:DEC", acq_dec_cmd, 1},
+    {":ACQ:DECQ", acq_dec_query},
+    {":ACQ:CLKD", acq_clkd_cmd, 1},
+    {":ACQ:CLKDQ", acq_clkd_query},
+    {":ACQ:TYPE", acq_type_cmd, 1},
+    {":ACQ:TYPEQ", acq_type_query},
+    {":ACQ:SRATQ", acq_srat_query},
+    {":ACQ:SEGM", acq_segm_cmd, 1},
+    {":ACQ:SEGMQ", acq_segm_query},
+
+    {":TRIG:MODE", trig_mode_cmd, 1},
+    {":TRIG:MODEQ", trig_mode_query},
+    {":TRIG:STATQ", trig_stat_query},
+    {":TRIG:DEC", trig_dec_cmd, 1},
+    {":TRIG:EDGE:SOUR", trig_edge_sour_cmd, 1},
+    {":TRIG:EDGE:SOURQ", trig_edge_sour_query},
+    {":TRIG:EDGE:LEV", trig_edge_lev_cmd, 1},
+    {":TRIG:EDGE:LEVQ", trig_edge_lev_query},
+    {":TRIG:EDGE:SLOPE", trig_edge_slope_cmd, 1},
+    {":TRIG:EDGE:SLOPEQ", trig_edge_slope_query},
+    {":TRIG:PATT:PATT", trig_patt_cmd, 1},
+    {":TRIG:PATT:PATTQ", trig_patt_query},
+    {":TRIG:HOLD", trig_hold_cmd, 1},
+    {":TRIG:HOLDQ", trig_hold_query},
+
+    {":DEC", dec_cmd, 0, 1},
+    {":SOUR", sour_cmd, 0, 1},
+    {":FGEN", fgen_cmd, 0, 1},
+    {":DISP", disp_cmd, 0, 1},
+    {":OUTP", outp_cmd, 1},
+    {":OUTPQ", outp_query},
+
+    {":MEAS:FREQQ", meas_freq_query, 1},
+    {":MEAS:PERQ", meas_per_query, 1},
+    {":MEAS:PWIDQ", meas_pwid_query, 1},
+    {":MEAS:DUTYQ", meas_duty_query, 1},
+    {":MEAS:EDGEQ", meas_edge_query, 1},
+    {":MEAS:ALLQ", meas_all_query, 1},
+    {":MEAS:GATE", meas_gate_cmd, 1},
+    {":MEAS:GATEQ", meas_gate_query},
+
+    {":SYST:STATQ", syst_stat_query},
+    {":SYST:STAT:NAMQ", syst_stat_names_query},
+    {":SYST:STAT:CLE", syst_stat_clear_cmd},
+
+    {"HELP", help_cmd},
+    {"REBOOT", reboot_cmd},
+    {"CLEAR", clear_cmd},
+#ifdef CSR_LEDS_BASE
+    {"LED", led_cmd},
+#endif
+    {"DONUT", donut_cmd},
+    {"HELLOC", helloc_cmd},
 #ifdef WITH_CXX
-  else if (strcmp(token, "hellocpp") == 0)
-    hellocpp_cmd();
+    {"HELLOCPP", hellocpp_cmd},
 #endif
+};
 
-  else
+/*-----------------------------------------------------------------------*/
+/* Console service / Main                                                */
+/*-----------------------------------------------------------------------*/
+
+static void console_service(void) {
+  char *str;
+
+  str = readstr();
+  if (str == NULL)
+    return;
+  if (scpi_execute(str) != 0)
     printf("Error!\n");
   /* prompt(); */
 }
@@ -256,12 +548,25 @@ int main(void) {
   irq_setie(1);
 #endif
   uart_init();
+  capture_init();
+  trigger_init();
+  decimator_init();
+  decoder_init();
+  awg_init();
+  fgen_init();
+  meas_init();
+  display_init();
+  streamer_init();
+  scpi_init(commands, sizeof(commands) / sizeof(commands[0]));
 
   /* help(); */
   /* prompt(); */
 
   while (1) {
-    console_service();
+    /* Commands wait in the RX ring while a block is streamed. */
+    streamer_service();
+    if (!streamer_busy())
+      console_service();
   }
 
   return 0;
@@ -0,0 +1,167 @@
+// This file is Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+// License: BSD
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include <generated/csr.h>
+#include <generated/soc.h>
+
+#include "measure.h"
+#include "trigger.h"
+
+#ifdef CSR_MEAS_BASE
+
+#define CYCLES_PER_MS (CONFIG_CLOCK_FREQUENCY / 1000)
+/* Answer when the value can not be measured (less than two rising edges in the
+ * gate), as other instruments do. */
+#define INVALID "9.9E37"
+
+static unsigned int gate_ms = 100;
+
+struct meas_result {
+  unsigned long edges;
+  unsigned long span;
+  unsigned long high;
+  unsigned long gate;
+};
+
+void meas_init(void) { meas_gate_write(CYCLES_PER_MS * gate_ms); }
+
+/* Gate time in ms, up to 2^32 - 1 cycles. */
+int meas_set_gate(unsigned int ms) {
+  if (ms < 1 || ms > 0xffffffffUL / CYCLES_PER_MS)
+    return -1;
+  gate_ms = ms;
+  meas_gate_write(CYCLES_PER_MS * gate_ms);
+  return 0;
+}
+
+unsigned int meas_gate_ms(void) { return gate_ms; }
+
+/* Logic channel (see logic_channel) or "FGEN<pin>" (function generator
+ * output): counter channel. */
+static int meas_channel(const char *name) {
+  char *end;
+  long n;
+
+  if (strncmp(name, "FGEN", 4) != 0)
+    return logic_channel(name);
+  n = strtol(name + 4, &end, 10);
+  if (end == name + 4 || *end || n < 0 || n >= 16)
+    return -1;
+  return MEAS_FGEN_CHANNEL + n;
+}
+
+/* Results of the last gate, read again if a gate ended during the reads. */
+static void meas_read(unsigned int channel, struct meas_result *r) {
+  unsigned long gates;
+
+  meas_select_write(channel);
+  do {
+    gates = meas_gates_read();
+    r->edges = meas_edges_read();
+    r->span = meas_span_read();
+    r->high = meas_high_read();
+    r->gate = meas_gate_read();
+  } while (meas_gates_read() != gates);
+}
+
+/* Seconds with ns resolution (printf has no 64-bit conversions). */
+static void print_ns(unsigned long long ns) {
+  printf("%lu.%09lu", (unsigned long)(ns / 1000000000ULL),
+         (unsigned long)(ns % 1000000000ULL));
+}
+
+/* Period in ns: span / (edges - 1) cycles. */
+static unsigned long long period_ns(const struct meas_result *r) {
+  return (unsigned long long)r->span * 1000000000ULL /
+         ((unsigned long long)(r->edges - 1) * CONFIG_CLOCK_FREQUENCY);
+}
+
+/* Duty cycle in ppm: high cycles over the gate. */
+static unsigned long duty_ppm(const struct meas_result *r) {
+  return (unsigned long long)r->high * 1000000ULL / r->gate;
+}
+
+static void print_quantity(int quantity, const struct meas_result *r) {
+  unsigned long long cycles;
+  unsigned long ppm;
+  int valid = r->edges >= 2 && r->span != 0;
+
+  switch (quantity) {
+  case MEAS_FREQ:
+    /* Hz with mHz resolution: (edges - 1) periods over span cycles. */
+    if (!valid) {
+      printf(INVALID);
+      break;
+    }
+    cycles = (unsigned long long)(r->edges - 1) * CONFIG_CLOCK_FREQUENCY;
+    printf("%lu.%03lu", (unsigned long)(cycles / r->span),
+           (unsigned long)(cycles % r->span * 1000 / r->span));
+    break;
+  case MEAS_PER:
+    if (valid)
+      print_ns(period_ns(r));
+    else
+      printf(INVALID);
+    break;
+  case MEAS_PWID:
+    /* High time: period * duty cycle. */
+    if (valid)
+      print_ns(period_ns(r) * duty_ppm(r) / 1000000);
+    else
+      printf(INVALID);
+    break;
+  case MEAS_DUTY:
+    /* Percent. */
+    ppm = duty_ppm(r);
+    printf("%lu.%04lu", ppm / 10000, ppm % 10000);
+    break;
+  case MEAS_EDGE:
+    /* Rising edges during the gate. */
+    printf("%lu", r->edges);
+    break;
+  }
+}
+
+int meas_print(int quantity, const char *source) {
+  struct meas_result r;
+  int channel = meas_channel(source);
+
+  if (channel < 0)
+    return -1;
+  meas_read(channel, &r);
+  print_quantity(quantity, &r);
+  putchar('\n');
+  return 0;
+}
+
+/* All the quantities of one gate, comma separated, for polling scripts. */
+int meas_print_all(const char *source) {
+  struct meas_result r;
+  int channel = meas_channel(source);
+  int quantity;
+
+  if (channel < 0)
+    return -1;
+  meas_read(channel, &r);
+  for (quantity = MEAS_FREQ; quantity <= MEAS_EDGE; quantity++) {
+    if (quantity != MEAS_FREQ)
+      putchar(',');
+    print_quantity(quantity, &r);
+  }
+  putchar('\n');
+  return 0;
+}
+
+#else
+
+void meas_init(void) {}
+int meas_set_gate(unsigned int ms) { return -1; }
+unsigned int meas_gate_ms(void) { return 0; }
+int meas_print(int quantity, const char *source) { return -1; }
+int meas_print_all(const char *source) { return -1; }
+
+#endif /* CSR_MEAS_BASE */
@@ -0,0 +1,16 @@
+#ifndef __MEASURE_H
+#define __MEASURE_H
+
+/* Reciprocal counters (gateware/measure.py) helpers. */
+
+enum meas_quantity { MEAS_FREQ, MEAS_PER, MEAS_PWID, MEAS_DUTY, MEAS_EDGE };
+
+void meas_init(void);
+
+int meas_set_gate(unsigned int ms);
+unsigned int meas_gate_ms(void);
+
+int meas_print(int quantity, const char *source);
+int meas_print_all(const char *source);
+
+#endif /* __MEASURE_H */
@@ -0,0 +1,55 @@
+// This file is Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+// License: BSD
+
+#include <stdio.h>
+
+#include <generated/csr.h>
+#include <generated/soc.h>
+
+#include "perf.h"
+
+#ifdef CSR_PERF_BASE
+
+/* Comma separated counter names, in :SYST:STAT? order. */
+void perf_print_names(void) {
+  const char *c;
+
+  for (c = PERF_COUNTER_NAMES; *c; c++)
+    putchar(*c == ' ' ? ',' : *c);
+  putchar('\n');
+}
+
+/* Snapshot of all the counters, comma separated (printf has no 64-bit
+ * conversions). */
+int perf_print(void) {
+  unsigned long long value;
+  unsigned int i;
+
+  perf_control_write(1 << CSR_PERF_CONTROL_SNAPSHOT_OFFSET);
+  for (i = 0; i < PERF_COUNTERS; i++) {
+    perf_select_write(i);
+    value = perf_value_read();
+    if (i)
+      putchar(',');
+    if (value >= 1000000000ULL)
+      printf("%lu%09lu", (unsigned long)(value / 1000000000ULL),
+             (unsigned long)(value % 1000000000ULL));
+    else
+      printf("%lu", (unsigned long)value);
+  }
+  putchar('\n');
+  return 0;
+}
+
+int perf_clear(void) {
+  perf_control_write(1 << CSR_PERF_CONTROL_CLEAR_OFFSET);
+  return 0;
+}
+
+#else
+
+void perf_print_names(void) { putchar('\n'); }
+int perf_print(void) { return -1; }
+int perf_clear(void) { return -1; }
+
+#endif /* CSR_PERF_BASE */
@@ -0,0 +1,10 @@
+#ifndef __PERF_H
+#define __PERF_H
+
+/* Performance counters (gateware/perf.py) helpers. */
+
+void perf_print_names(void);
+int perf_print(void);
+int perf_clear(void);
+
+#endif /* __PERF_H */
@@ -0,0 +1,134 @@
+// This file is Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+// License: BSD
+
+#include <stdlib.h>
+#include <string.h>
+
+#include "scpi.h"
+
+/* Open addressing hash table of command indexes + 1 (0: empty slot), kept at
+ * most half full so probes stay short. */
+#define HASH_SIZE 256
+static unsigned char slots[HASH_SIZE];
+static const struct scpi_command *table;
+
+/* FNV-1a. */
+static unsigned int hash(const char *s, unsigned int len) {
+  unsigned int h = 2166136261u;
+
+  while (len--)
+    h = (h ^ (unsigned char)*s++) * 16777619u;
+  return h;
+}
+
+static const struct scpi_command *lookup(const char *key, unsigned int len) {
+  unsigned int i = hash(key, len);
+  const struct scpi_command *cmd;
+
+  for (; slots[i % HASH_SIZE]; i++) {
+    cmd = &table[slots[i % HASH_SIZE] - 1];
+    if (strncmp(cmd->header, key, len) == 0 && cmd->header[len] == 0)
+      return cmd;
+  }
+  return NULL;
+}
+
+void scpi_init(const struct scpi_command *commands, unsigned int count) {
+  unsigned int i, j;
+
+  if (count > HASH_SIZE / 2)
+    count = HASH_SIZE / 2;
+  table = commands;
+  memset(slots, 0, sizeof(slots));
+  for (i = 0; i < count; i++) {
+    j = hash(commands[i].header, strlen(commands[i].header));
+    while (slots[j % HASH_SIZE])
+      j++;
+    slots[j % HASH_SIZE] = i + 1;
+  }
+}
+
+const char *scpi_arg(const struct scpi_request *req, int i) {
+  return i < req->argc ? req->argv[i] : "";
+}
+
+static int is_letter(char c) { return c >= 'A' && c <= 'Z'; }
+
+/* Split line in header and arguments (separated by spaces, "quoted" arguments
+ * may contain spaces), header in upper case with "?" turned into Q. */
+static char *split(char *line, struct scpi_request *req) {
+  char *header, *p = line;
+
+  while (*p == ' ' || *p == '\t')
+    p++;
+  header = p;
+  for (; *p && *p != ' ' && *p != '\t'; p++) {
+    if (*p >= 'a' && *p <= 'z')
+      *p -= 'a' - 'A';
+    else if (*p == '?')
+      *p = 'Q';
+  }
+  req->argc = 0;
+  while (*p) {
+    *p++ = 0;
+    while (*p == ' ' || *p == '\t')
+      p++;
+    if (*p == 0 || req->argc == SCPI_MAX_ARGS)
+      break;
+    if (*p == '"') {
+      req->argv[req->argc++] = ++p;
+      while (*p && *p != '"')
+        p++;
+    } else {
+      req->argv[req->argc++] = p;
+      while (*p && *p != ' ' && *p != '\t')
+        p++;
+    }
+  }
+  return header;
+}
+
+/* Execute a command line, -1 on unknown command, missing arguments or error. */
+int scpi_execute(char *line) {
+  struct scpi_request req;
+  const struct scpi_command *cmd;
+  char key[SCPI_MAX_HEADER];
+  char *header;
+  unsigned int i, n, len;
+
+  header = split(line, &req);
+  if (*header == 0)
+    return 0;
+  if (strlen(header) >= SCPI_MAX_HEADER)
+    return -1;
+
+  /* Key: numeric suffixes replaced by '#'. */
+  memset(req.suffix, 0, sizeof(req.suffix));
+  for (i = 0, n = 0, len = 0; header[i]; len++) {
+    if (i > 0 && is_letter(header[i - 1]) && header[i] >= '0' &&
+        header[i] <= '9') {
+      if (n < SCPI_MAX_SUFFIXES)
+        req.suffix[n++] = strtoul(&header[i], NULL, 10);
+      while (header[i] >= '0' && header[i] <= '9')
+        i++;
+      key[len] = '#';
+    } else
+      key[len] = header[i++];
+  }
+
+  /* Full header, or subsystem prefix (first node without its suffix). */
+  req.rest = header + strlen(header);
+  cmd = lookup(key, len);
+  if (cmd == NULL) {
+    for (len = (*header == ':' || *header == '*'); is_letter(header[len]);
+         len++)
+      ;
+    cmd = lookup(header, len);
+    if (cmd == NULL || !cmd->prefix)
+      return -1;
+    req.rest = header + len;
+  }
+  if (req.argc < cmd->args)
+    return -1;
+  return cmd->handler(&req);
+}
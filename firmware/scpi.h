@@ -0,0 +1,37 @@
+#ifndef __SCPI_H
+#define __SCPI_H
+
+/* SCPI command parser: headers are looked up in a hash table, in constant time
+ * whatever the number of commands. */
+
+#define SCPI_MAX_HEADER 32
+#define SCPI_MAX_ARGS 4
+#define SCPI_MAX_SUFFIXES 2
+
+struct scpi_request {
+  /* Prefix commands: rest of the header after the prefix. */
+  const char *rest;
+  /* Numeric suffixes of the header (":CH2:DISP?": 2). */
+  unsigned int suffix[SCPI_MAX_SUFFIXES];
+  int argc;
+  char *argv[SCPI_MAX_ARGS];
+};
+
+struct scpi_command {
+  /* Upper case, queries end with Q ("?" is accepted for Q), numeric suffixes
+   * are written "#" (":CH#:DISPQ"). */
+  const char *header;
+  /* Returns -1 on error. */
+  int (*handler)(struct scpi_request *req);
+  /* Minimum number of arguments. */
+  int args;
+  /* Also handles headers starting with header (subsystem commands, ":SOUR"
+   * handles ":SOUR:FREQ" with rest ":FREQ"). */
+  int prefix;
+};
+
+void scpi_init(const struct scpi_command *commands, unsigned int count);
+int scpi_execute(char *line);
+const char *scpi_arg(const struct scpi_request *req, int i);
+
+#endif /* __SCPI_H */
@@ -0,0 +1,72 @@
+// This file is Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+// License: BSD
+
+#include <generated/csr.h>
+#include <generated/soc.h>
+#include <irq.h>
+#include <libbase/uart.h>
+
+#include "streamer.h"
+
+#ifdef CSR_STREAMER_BASE
+
+/* Block in flight / set by the IRQ once its last byte has been sent. */
+static int busy;
+static volatile int done;
+
+static void streamer_isr(void) {
+  streamer_ev_pending_write(streamer_ev_pending_read());
+  done = 1;
+}
+
+void streamer_init(void) {
+  streamer_ev_pending_write(streamer_ev_pending_read());
+  streamer_ev_enable_write(1);
+  irq_attach(STREAMER_INTERRUPT, streamer_isr);
+  irq_setmask(irq_getmask() | (1 << STREAMER_INTERRUPT));
+}
+
+/* Stream len bytes of the circular buffer at base (bytes from the start of the
+ * DRAM, size bytes) from byte first to the UART, -1 if they can not be. The
+ * block ends with '\n' (sent by streamer_service()), nothing else must be
+ * written to the UART until streamer_busy() is cleared. */
+int streamer_start(unsigned long base, unsigned int size, unsigned int first,
+                   unsigned int len) {
+  if (busy || len == 0)
+    return -1;
+
+  /* Bytes already written (block header) go out first. */
+  uart_sync();
+  while (!uart_txempty_read())
+    ;
+
+  busy = 1;
+  done = 0;
+  streamer_base_write(base);
+  streamer_size_write(size);
+  streamer_first_write(first);
+  streamer_length_write(len);
+  streamer_control_write(1 << CSR_STREAMER_CONTROL_START_OFFSET);
+  return 0;
+}
+
+int streamer_busy(void) { return busy; }
+
+void streamer_service(void) {
+  if (busy && done) {
+    busy = 0;
+    uart_write('\n');
+  }
+}
+
+#else
+
+void streamer_init(void) {}
+int streamer_start(unsigned long base, unsigned int size, unsigned int first,
+                   unsigned int len) {
+  return -1;
+}
+int streamer_busy(void) { return 0; }
+void streamer_service(void) {}
+
+#endif /* CSR_STREAMER_BASE */
@@ -0,0 +1,12 @@
+#ifndef __STREAMER_H
+#define __STREAMER_H
+
+/* Capture streamer (gateware/streamer.py) helpers. */
+
+void streamer_init(void);
+int streamer_start(unsigned long base, unsigned int size, unsigned int first,
+                   unsigned int len);
+int streamer_busy(void);
+void streamer_service(void);
+
+#endif /* __STREAMER_H */
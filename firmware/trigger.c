@@ -0,0 +1,138 @@
+// This file is Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+// License: BSD
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include <generated/csr.h>
+
+#include "trigger.h"
+
+#define CHANNELS 16
+
+enum { MODE_EDGE, MODE_PATTERN, MODE_QUALIFIED };
+enum { SLOPE_POS, SLOPE_NEG, SLOPE_RFAL };
+
+static const char *const modes[] = {"EDGE", "PATT", "QUAL"};
+static const char *const slopes[] = {"POS", "NEG", "RFAL"};
+
+static int mode = MODE_EDGE;
+static int source = 2;
+static int slope = SLOPE_POS;
+/* Logic inputs use the fixed LVCMOS33 threshold, the level is only kept for
+ * front-ends that set/read it. */
+static int level = 0;
+static char pattern[CHANNELS + 1] = "XXXXXXXXXXXXXXXX";
+static unsigned int holdoff = 0;
+
+static int lookup(const char *const *names, int n, const char *name) {
+  int i;
+
+  for (i = 0; i < n; i++)
+    if (strcmp(names[i], name) == 0)
+      return i;
+  return -1;
+}
+
+static void trigger_apply(void) {
+  unsigned int mask = 0, value = 0;
+  int i;
+
+  for (i = 0; i < CHANNELS; i++) {
+    if (pattern[i] != 'X')
+      mask |= 1 << i;
+    if (pattern[i] == 'H')
+      value |= 1 << i;
+  }
+  trigger_control_write(0);
+  trigger_rising_write(slope != SLOPE_NEG ? 1 << source : 0);
+  trigger_falling_write(slope != SLOPE_POS ? 1 << source : 0);
+  trigger_mask_write(mask);
+  trigger_value_write(value);
+  trigger_holdoff_write(holdoff);
+  trigger_control_write((1 << CSR_TRIGGER_CONTROL_ENABLE_OFFSET) |
+                        (mode << CSR_TRIGGER_CONTROL_MODE_OFFSET));
+}
+
+void trigger_init(void) { trigger_apply(); }
+
+int trigger_set_mode(const char *name) {
+  int m = lookup(modes, 3, name);
+
+  if (m < 0)
+    return -1;
+  mode = m;
+  trigger_apply();
+  return 0;
+}
+
+const char *trigger_mode(void) { return modes[mode]; }
+
+/* Logic channel number from "D<n>", "CH<n>" or "CHAN<n>", -1 if invalid. */
+int logic_channel(const char *name) {
+  char *end;
+  long n;
+
+  if (strncmp(name, "CHAN", 4) == 0)
+    name += 4;
+  else if (strncmp(name, "CH", 2) == 0)
+    name += 2;
+  else if (name[0] == 'D')
+    name += 1;
+  n = strtol(name, &end, 10);
+  if (end == name || *end || n < 0 || n >= CHANNELS)
+    return -1;
+  return n;
+}
+
+int trigger_set_source(const char *name) {
+  int n = logic_channel(name);
+
+  if (n < 0)
+    return -1;
+  source = n;
+  trigger_apply();
+  return 0;
+}
+
+int trigger_source(void) { return source; }
+
+int trigger_set_slope(const char *name) {
+  int s = lookup(slopes, 3, name);
+
+  if (s < 0)
+    return -1;
+  slope = s;
+  trigger_apply();
+  return 0;
+}
+
+const char *trigger_slope(void) { return slopes[slope]; }
+
+void trigger_set_level(int l) { level = l; }
+
+int trigger_level(void) { return level; }
+
+/* One H/L/X character per channel, channel 0 first. */
+int trigger_set_pattern(const char *p) {
+  int i;
+
+  if (strlen(p) != CHANNELS)
+    return -1;
+  for (i = 0; i < CHANNELS; i++)
+    if (p[i] != 'H' && p[i] != 'L' && p[i] != 'X')
+      return -1;
+  strcpy(pattern, p);
+  trigger_apply();
+  return 0;
+}
+
+const char *trigger_pattern(void) { return pattern; }
+
+void trigger_set_holdoff(unsigned int cycles) {
+  holdoff = cycles;
+  trigger_apply();
+}
+
+unsigned int trigger_holdoff(void) { return holdoff; }
@@ -0,0 +1,22 @@
+#ifndef __TRIGGER_H
+#define __TRIGGER_H
+
+/* Logic trigger (gateware/trigger.py) helpers. */
+
+void trigger_init(void);
+int logic_channel(const char *name);
+
+int trigger_set_mode(const char *mode);
+const char *trigger_mode(void);
+int trigger_set_source(const char *source);
+int trigger_source(void);
+int trigger_set_slope(const char *slope);
+const char *trigger_slope(void);
+void trigger_set_level(int level);
+int trigger_level(void);
+int trigger_set_pattern(const char *pattern);
+const char *trigger_pattern(void);
+void trigger_set_holdoff(unsigned int cycles);
+unsigned int trigger_holdoff(void);
+
+#endif /* __TRIGGER_H */
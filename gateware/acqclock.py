@@ -0,0 +1,77 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+from migen.genlib.cdc import MultiReg, GrayCounter, GrayDecoder
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import *
+
+# Sample Clock -------------------------------------------------------------------------------------
+
+class SampleClock(LiteXModule):
+    """Runtime-switchable divider of the acquisition clock.
+
+    `data` (in the `cd` domain) is sampled once every `divider` cycles (0/1: every cycle), each
+    sample is a `source` beat and stays on `source.data` until the next one, so downstream logic
+    can either count beats (decimator, encoder) or watch the held value (trigger).
+
+    The source is not back-pressured (as the capture path). `divider` is a CSR of the bus domain
+    resynchronized to `cd`: a change takes effect within a few cycles, at the end of the current
+    sample period.
+    """
+    def __init__(self, data_width=16, cd="sys", divider_width=16):
+        self.data   = Signal(data_width)
+        self.source = source = stream.Endpoint([("data", data_width)])
+
+        self._divider = CSRStorage(divider_width, reset=1, description="Acquisition clock cycles per sample (0/1: every cycle).")
+
+        # # #
+
+        divider = Signal(divider_width, reset=1)
+        count   = Signal(divider_width)
+        self.specials += MultiReg(self._divider.storage, divider, odomain=cd, reset=1)
+        sync = getattr(self.sync, cd)
+        sync += [
+            source.valid.eq(0),
+            count.eq(count + 1),
+            If(count >= (divider - 1),
+                count.eq(0),
+                source.valid.eq(1),
+                source.data.eq(self.data),
+            )
+        ]
+
+# Event Synchronizer -------------------------------------------------------------------------------
+
+class EventSynchronizer(LiteXModule):
+    """Strobes of `cd_from` counted in `cd_to` (ex records dropped in the acquisition domain, for
+    the performance counters).
+
+    `o` is the number of `i` strobes seen since the previous `cd_to` cycle: a Gray coded counter is
+    resynchronized, so none is lost as long as less than `2**width` arrive between two `cd_to`
+    cycles (unlike a pulse synchronizer).
+    """
+    def __init__(self, cd_from, cd_to="sys", width=8):
+        self.i = Signal()
+        self.o = Signal(width)
+
+        # # #
+
+        self.counter = counter = ClockDomainsRenamer(cd_from)(GrayCounter(width))
+        self.decoder = decoder = ClockDomainsRenamer(cd_to)(GrayDecoder(width))
+        gray = Signal(width)
+        last = Signal(width)
+        self.specials += MultiReg(counter.q, gray, odomain=cd_to)
+        self.comb += [
+            counter.ce.eq(self.i),
+            decoder.i.eq(gray),
+            self.o.eq(decoder.o - last),
+        ]
+        sync = getattr(self.sync, cd_to)
+        sync += last.eq(decoder.o)
@@ -0,0 +1,228 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from math import sin, pi
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import *
+
+from litedram.frontend.dma import LiteDRAMDMAReader
+
+# AWG ----------------------------------------------------------------------------------------------
+
+AWG_MODE_MEMORY = 0
+AWG_MODE_DDS    = 1
+
+AWG_WAVEFORM_SINE     = 0
+AWG_WAVEFORM_SQUARE   = 1
+AWG_WAVEFORM_RAMP     = 2
+AWG_WAVEFORM_TRIANGLE = 3
+
+class AWG(LiteXModule):
+    """Arbitrary waveform generator feeding the DAC one sample per cycle.
+
+    - Memory mode: 16-bit samples (DAC code in the LSBs) are streamed from DRAM by a DMA reader,
+      from `base` to `loop_end` then `repeat` - 1 more times (0: forever) from `loop_start` to
+      `loop_end` (byte offsets from the start of the DRAM, multiples of the DRAM word). Playback
+      starts once the read FIFO is half full, `underflow` flags samples that were late.
+    - DDS mode: a 32-bit phase accumulator (`frequency` added each cycle, `phase` offset) drives
+      a sine table, square, ramp or triangle, scaled by `amplitude` (1.0 = 2**`data_width`) around
+      `offset`.
+
+    `data` holds `idle` while stopped. Playback starts on `start` (control pulse or `sync_start`
+    input, to start several generators together).
+    """
+    def __init__(self, port, data_width=14, fifo_depth=512, sine_depth=1024):
+        self.data       = Signal(data_width)
+        self.sync_start = Signal()
+
+        self._control = CSRStorage(fields=[
+            CSRField("start",    size=1, offset=0, pulse=True, description="Start playback."),
+            CSRField("stop",     size=1, offset=1, pulse=True, description="Stop playback."),
+            CSRField("mode",     size=1, offset=2, values=[
+                ("``0b0``", "Memory (DRAM samples)."),
+                ("``0b1``", "DDS."),
+            ]),
+            CSRField("waveform", size=2, offset=3, values=[
+                ("``0b00``", "Sine."),
+                ("``0b01``", "Square."),
+                ("``0b10``", "Ramp."),
+                ("``0b11``", "Triangle."),
+            ]),
+        ])
+        self._base       = CSRStorage(32, description="First sample (bytes from DRAM start).")
+        self._loop_start = CSRStorage(32, description="Loop start (bytes from DRAM start).")
+        self._loop_end   = CSRStorage(32, description="Loop end, excluded (bytes from DRAM start).")
+        self._repeat     = CSRStorage(32, description="Loops to play (0: forever).")
+        self._frequency  = CSRStorage(32, description="DDS phase increment (2**32 = sys clk).")
+        self._phase      = CSRStorage(32, description="DDS phase offset (2**32 = 360°).")
+        self._amplitude  = CSRStorage(data_width + 1, reset=2**data_width,
+            description="DDS amplitude (2**data_width: full scale).")
+        self._offset     = CSRStorage(data_width, reset=2**(data_width - 1),
+            description="DDS offset (DAC code).")
+        self._idle       = CSRStorage(data_width, reset=2**(data_width - 1),
+            description="DAC code while stopped.")
+        self._status     = CSRStatus(fields=[
+            CSRField("playing",   size=1, offset=0, description="Playback in progress."),
+            CSRField("underflow", size=1, offset=1, description="DRAM was too slow."),
+        ])
+        self._loops = CSRStatus(32, description="Loops fetched from DRAM since start.")
+
+        # # #
+
+        wbytes   = port.data_width//8
+        control  = self._control.fields
+        start    = Signal()
+        stop     = control.stop
+        self.comb += start.eq(control.start | self.sync_start)
+
+        playing   = Signal()
+        underflow = Signal()
+        self.comb += [
+            self._status.fields.playing.eq(playing),
+            self._status.fields.underflow.eq(underflow),
+        ]
+
+        # DRAM reader: address generation with looping.
+        self.dma = dma = LiteDRAMDMAReader(port, fifo_depth=fifo_depth, fifo_buffered=True)
+        address     = Signal(port.address_width)
+        loop_start  = Signal(port.address_width)
+        loop_end    = Signal(port.address_width)
+        fetching    = Signal()
+        loops       = self._loops.status
+        outstanding = Signal(max=fifo_depth + 1)
+        self.comb += [
+            loop_start.eq(self._loop_start.storage[log2_int(wbytes):]),
+            loop_end.eq(self._loop_end.storage[log2_int(wbytes):]),
+            dma.sink.valid.eq(fetching),
+            dma.sink.address.eq(address),
+        ]
+        self.sync += [
+            If(start & (control.mode == AWG_MODE_MEMORY),
+                address.eq(self._base.storage[log2_int(wbytes):]),
+                loops.eq(0),
+                fetching.eq(1),
+            ).Elif(stop,
+                fetching.eq(0),
+            ).Elif(dma.sink.valid & dma.sink.ready,
+                address.eq(address + 1),
+                If(address == (loop_end - 1),
+                    address.eq(loop_start),
+                    loops.eq(loops + 1),
+                    If((self._repeat.storage != 0) & ((loops + 1) >= self._repeat.storage),
+                        fetching.eq(0)
+                    )
+                )
+            ),
+            outstanding.eq(outstanding
+                + (dma.sink.valid & dma.sink.ready)
+                - (dma.source.valid & dma.source.ready)),
+        ]
+
+        # DRAM words -> samples (first sample in the LSBs).
+        self.converter = converter = stream.Converter(port.data_width, 16)
+        self.comb += dma.source.connect(converter.sink)
+
+        # DDS.
+        phase = Signal(32)
+        self.sync += If(start, phase.eq(0)).Else(phase.eq(phase + self._frequency.storage))
+        dds_phase = Signal(32)
+        self.comb += dds_phase.eq(phase + self._phase.storage)
+
+        sine = Memory(data_width, sine_depth, init=[
+            int(round((2**(data_width - 1) - 1)*sin(2*pi*i/sine_depth) + 2**(data_width - 1)))
+            for i in range(sine_depth)])
+        sine_port = sine.get_port()
+        self.specials += sine, sine_port
+
+        # Stage 1: waveform.
+        wave = Signal(data_width)
+        msb  = dds_phase[-1]
+        self.comb += sine_port.adr.eq(dds_phase[32 - log2_int(sine_depth):])
+        shape = Signal(2)
+        self.sync += [
+            shape.eq(control.waveform),
+            Case(control.waveform, {
+                AWG_WAVEFORM_SQUARE   : wave.eq(Replicate(~msb, data_width)),
+                AWG_WAVEFORM_RAMP     : wave.eq(dds_phase[32 - data_width:]),
+                AWG_WAVEFORM_TRIANGLE : wave.eq(Mux(msb,
+                    ~dds_phase[31 - data_width:31], dds_phase[31 - data_width:31])),
+                "default"             : wave.eq(0),
+            })
+        ]
+        # Stage 2: amplitude, around mid-scale.
+        centered = Signal((data_width + 1, True))
+        scaled   = Signal((2*data_width + 2, True))
+        self.comb += centered.eq(
+            Mux(shape == AWG_WAVEFORM_SINE, sine_port.dat_r, wave) - 2**(data_width - 1))
+        self.sync += scaled.eq(centered*self._amplitude.storage)
+        # Stage 3: offset and clipping.
+        level = Signal((2*data_width + 2, True))
+        dds   = Signal(data_width)
+        self.comb += level.eq((scaled >> data_width) + self._offset.storage)
+        self.sync += [
+            If(level < 0,
+                dds.eq(0)
+            ).Elif(level > (2**data_width - 1),
+                dds.eq(2**data_width - 1)
+            ).Else(
+                dds.eq(level)
+            )
+        ]
+
+        # Control FSM / output.
+        self.fsm = fsm = FSM(reset_state="IDLE")
+        fsm.act("IDLE",
+            converter.source.ready.eq(1),
+            NextValue(self.data, self._idle.storage),
+            If(start,
+                NextValue(underflow, 0),
+                If(control.mode == AWG_MODE_DDS,
+                    NextState("DDS")
+                ).Else(
+                    NextState("PREFILL")
+                )
+            )
+        )
+        fsm.act("PREFILL",
+            playing.eq(1),
+            If(stop,
+                NextState("FLUSH")
+            ).Elif(converter.source.valid & ((outstanding >= fifo_depth//2) | ~fetching),
+                NextState("PLAY")
+            )
+        )
+        fsm.act("PLAY",
+            playing.eq(1),
+            converter.source.ready.eq(1),
+            If(converter.source.valid,
+                NextValue(self.data, converter.source.data[:data_width]),
+            ).Elif(fetching | (outstanding != 0),
+                NextValue(underflow, 1),
+            ),
+            If(stop | (~fetching & (outstanding == 0) & ~converter.source.valid),
+                NextState("FLUSH")
+            )
+        )
+        # Discard words still requested from DRAM.
+        fsm.act("FLUSH",
+            converter.source.ready.eq(1),
+            NextValue(self.data, self._idle.storage),
+            If(~fetching & (outstanding == 0) & ~converter.source.valid,
+                NextState("IDLE")
+            )
+        )
+        fsm.act("DDS",
+            playing.eq(1),
+            NextValue(self.data, dds),
+            If(stop,
+                NextState("IDLE")
+            )
+        )
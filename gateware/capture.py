@@ -0,0 +1,298 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import *
+
+from litedram.frontend.dma import LiteDRAMDMAWriter
+
+# Logic Capture ------------------------------------------------------------------------------------
+
+class LogicCapture(LiteXModule):
+    """Deep-memory logic capture into a circular DRAM buffer.
+
+    Samples presented on `sink` are packed into DRAM words, buffered in a FIFO and written by a
+    LiteDRAM DMA writer into a circular buffer of `length` bytes starting at `base` (both byte
+    offsets from the start of the DRAM). Once armed, at least `pre` samples are stored before
+    `trigger` is accepted, then `post` samples are stored after it and the capture stops.
+
+    Sample `i` of a capture (counted from arm) lives at buffer index `i % (length*8//data_width)`;
+    `count` reports the number of samples stored and `trigger_index` the index of the trigger
+    sample, which is all the firmware needs to unwrap the buffer. The trigger sample is the one
+    presented on `sink` with the `trigger` strobe (or the next one stored), so the strobe must be
+    aligned with the sample stream (see `TriggerMarker`). The last DRAM word of a capture
+    may be completed with all-zeros padding samples (counted in `count`).
+
+    Segmented mode (`segments` > 1): the buffer is split in `segments` circular buffers of
+    `segment_length` bytes. Each trigger fills one segment (`pre` + `post` samples) and the capture
+    re-arms on the next segment in hardware, until all segments are filled or `stop` is requested.
+    The sample count, trigger index and 64-bit timestamp (sys clk cycles, free-running) of each
+    filled segment are recorded in a table read through `segment_select`. `max_segments` = 1
+    removes the segmentation logic.
+
+    `stored`, `dropped`, `trigger_accepted` and `dead` strobe for the performance counters: sample
+    stored, sample lost (FIFO full), trigger accepted, and cycles spent flushing/re-arming between
+    segments while armed (samples presented then are not stored).
+    """
+    def __init__(self, port, data_width=16, fifo_depth=512, default_base=0, default_length=0,
+        max_segments=1024):
+        self.sink    = sink = stream.Endpoint([("data", data_width)])
+        self.trigger = Signal() # External trigger strobe.
+
+        self.stored           = Signal()
+        self.dropped          = Signal()
+        self.trigger_accepted = Signal()
+        self.dead             = Signal()
+
+        self._control = CSRStorage(fields=[
+            CSRField("arm",   size=1, offset=0, pulse=True, description="Arm a new capture."),
+            CSRField("force", size=1, offset=1, pulse=True, description="Force a trigger."),
+            CSRField("stop",  size=1, offset=2, pulse=True, description="Abort the current capture."),
+        ])
+        self._base   = CSRStorage(32, reset=default_base,   description="Buffer base (bytes from DRAM start, word aligned).")
+        self._length = CSRStorage(32, reset=default_length, description="Buffer length (bytes, multiple of the DRAM word).")
+        self._pre    = CSRStorage(32, description="Samples to store before accepting a trigger.")
+        self._post   = CSRStorage(32, description="Samples to store after the trigger.")
+        self._status = CSRStatus(fields=[
+            CSRField("armed",     size=1, offset=0, description="Capture in progress."),
+            CSRField("triggered", size=1, offset=1, description="Trigger seen."),
+            CSRField("done",      size=1, offset=2, description="Capture complete and flushed to DRAM."),
+            CSRField("wrapped",   size=1, offset=3, description="Buffer wrapped at least once."),
+            CSRField("overflow",  size=1, offset=4, description="Samples were dropped (FIFO full)."),
+        ])
+        self._count         = CSRStatus(32, description="Samples stored since arm (segment start).")
+        self._trigger_index = CSRStatus(32, description="Sample index of the trigger.")
+
+        self.max_segments = max_segments
+        if max_segments > 1:
+            self._segments       = CSRStorage(bits_for(max_segments), reset=1, description="Number of segments (<= 1: single capture).")
+            self._segment_length = CSRStorage(32, description="Segment length (bytes, multiple of the DRAM word).")
+            self._segment        = CSRStatus(bits_for(max_segments), description="Segments filled.")
+            self._segment_select        = CSRStorage(bits_for(max_segments - 1), description="Segment reported below.")
+            self._segment_timestamp     = CSRStatus(64, description="Timestamp of the selected segment trigger.")
+            self._segment_count         = CSRStatus(32, description="Samples stored in the selected segment.")
+            self._segment_trigger_index = CSRStatus(32, description="Trigger sample index in the selected segment.")
+
+        # # #
+
+        wbytes = port.data_width//8
+        ratio  = port.data_width//data_width
+        assert port.data_width % data_width == 0
+
+        # Status.
+        armed     = Signal()
+        triggered = Signal()
+        done      = Signal()
+        wrapped   = Signal()
+        overflow  = Signal()
+        self.comb += [
+            self._status.fields.armed.eq(armed),
+            self._status.fields.triggered.eq(triggered),
+            self._status.fields.done.eq(done),
+            self._status.fields.wrapped.eq(wrapped),
+            self._status.fields.overflow.eq(overflow),
+        ]
+
+        # Parameters.
+        base           = Signal(port.address_width)
+        nwords         = Signal(port.address_width)
+        segmented      = Signal()
+        segment        = Signal(bits_for(max_segments))
+        segment_nwords = Signal(port.address_width)
+        last_segment   = Signal(reset=1)
+        self.comb += [
+            base.eq(self._base.storage[log2_int(wbytes):]),
+            If(segmented,
+                nwords.eq(segment_nwords),
+            ).Else(
+                nwords.eq(self._length.storage[log2_int(wbytes):]),
+            )
+        ]
+        if max_segments > 1:
+            self.comb += [
+                segmented.eq(self._segments.storage > 1),
+                segment_nwords.eq(self._segment_length.storage[log2_int(wbytes):]),
+                last_segment.eq(~segmented | (segment >= (self._segments.storage - 1))),
+                self._segment.status.eq(segment),
+            ]
+
+        # Sample packing and buffering.
+        self.converter = converter = stream.Converter(data_width, port.data_width)
+        self.fifo      = fifo      = stream.SyncFIFO([("address", port.address_width),
+            ("data", port.data_width)], fifo_depth, buffered=True)
+
+        # Circular addressing. Addresses are computed when words enter the FIFO so the segment can
+        # change while the previous one is still being written to DRAM.
+        segment_base = Signal(port.address_width)
+        offset       = Signal(port.address_width)
+        next_segment = Signal()
+        self.comb += [
+            converter.source.connect(fifo.sink, omit={"address"}),
+            fifo.sink.address.eq(base + segment_base + offset),
+        ]
+        self.sync += [
+            If(self._control.fields.arm,
+                offset.eq(0),
+                segment_base.eq(0),
+            ).Elif(next_segment,
+                offset.eq(0),
+                segment_base.eq(segment_base + nwords),
+            ).Elif(fifo.sink.valid & fifo.sink.ready,
+                offset.eq(offset + 1),
+                If(offset == (nwords - 1),
+                    offset.eq(0),
+                    wrapped.eq(1),
+                )
+            ),
+            If(self._control.fields.arm,
+                wrapped.eq(0),
+            ),
+        ]
+
+        # DMA.
+        self.dma = dma = LiteDRAMDMAWriter(port, fifo_depth=16)
+        self.comb += fifo.source.connect(dma.sink)
+
+        # Sample acceptance. The source can't be back-pressured: samples presented while the
+        # FIFO is full are lost and flagged.
+        capturing = Signal()
+        padding   = Signal()
+        accepted  = Signal()
+        count     = self._count.status
+        self.comb += [
+            sink.ready.eq(1),
+            converter.sink.valid.eq((sink.valid | padding) & capturing),
+            If(sink.valid,
+                converter.sink.data.eq(sink.data),
+            ),
+            accepted.eq(converter.sink.valid & converter.sink.ready),
+            self.stored.eq(sink.valid & capturing & converter.sink.ready),
+            self.dropped.eq(sink.valid & capturing & ~converter.sink.ready),
+        ]
+        self.sync += [
+            If(self._control.fields.arm,
+                count.eq(0),
+                overflow.eq(0),
+            ).Elif(next_segment,
+                count.eq(0),
+            ).Else(
+                If(accepted,
+                    count.eq(count + 1),
+                ),
+                If(sink.valid & capturing & ~converter.sink.ready,
+                    overflow.eq(1),
+                )
+            )
+        ]
+
+        # Segment table.
+        timestamp       = Signal(64)
+        segment_trigger = Signal(64)
+        segment_done    = Signal()
+        if max_segments > 1:
+            self.sync += timestamp.eq(timestamp + 1)
+            self.table = table = Memory(64 + 32 + 32, max_segments)
+            table_wr = table.get_port(write_capable=True)
+            table_rd = table.get_port(has_re=False)
+            self.specials += table, table_wr, table_rd
+            self.comb += [
+                table_wr.we.eq(segment_done),
+                table_wr.adr.eq(segment),
+                table_wr.dat_w.eq(Cat(segment_trigger, self._trigger_index.status, count)),
+                table_rd.adr.eq(self._segment_select.storage),
+                Cat(self._segment_timestamp.status,
+                    self._segment_trigger_index.status,
+                    self._segment_count.status).eq(table_rd.dat_r),
+            ]
+
+        # Control FSM.
+        trigger    = Signal()
+        stopping   = Signal()
+        post_count = Signal(32)
+        aligned    = Signal()
+        drained    = Signal()
+        self.comb += [
+            trigger.eq(self.trigger | self._control.fields.force),
+            aligned.eq(count[:log2_int(ratio)] == 0 if ratio > 1 else 1),
+            drained.eq(~converter.source.valid & ~fifo.source.valid & ~dma.fifo.source.valid),
+        ]
+        self.fsm = fsm = FSM(reset_state="IDLE")
+        fsm.act("IDLE",
+            If(self._control.fields.arm,
+                NextValue(triggered, 0),
+                NextValue(done, 0),
+                NextValue(stopping, 0),
+                NextValue(segment, 0),
+                NextState("PRE-TRIGGER")
+            )
+        )
+        fsm.act("PRE-TRIGGER",
+            capturing.eq(1),
+            armed.eq(1),
+            If(self._control.fields.stop,
+                NextValue(stopping, 1),
+                NextState("FLUSH")
+            ).Elif(trigger & (count >= self._pre.storage),
+                self.trigger_accepted.eq(1),
+                NextValue(self._trigger_index.status, count),
+                NextValue(segment_trigger, timestamp),
+                NextValue(triggered, 1),
+                NextValue(post_count, 0),
+                NextState("POST-TRIGGER")
+            )
+        )
+        fsm.act("POST-TRIGGER",
+            capturing.eq(1),
+            armed.eq(1),
+            If(accepted,
+                NextValue(post_count, post_count + 1)
+            ),
+            If(self._control.fields.stop,
+                NextValue(stopping, 1),
+                NextState("FLUSH")
+            ).Elif(post_count >= self._post.storage,
+                NextState("FLUSH")
+            )
+        )
+        # Complete the current DRAM word so no stored sample is left in the converter, with
+        # all-zeros padding records when the source is idle.
+        fsm.act("FLUSH",
+            capturing.eq(~aligned),
+            padding.eq(1),
+            armed.eq(1),
+            If(aligned & ~converter.source.valid,
+                NextState("SEGMENT")
+            )
+        )
+        # Record the segment (if it saw its trigger) then re-arm on the next one or finish.
+        fsm.act("SEGMENT",
+            armed.eq(1),
+            If(triggered,
+                segment_done.eq(1),
+                NextValue(segment, segment + 1),
+            ),
+            If(~stopping & ~last_segment,
+                next_segment.eq(1),
+                NextValue(triggered, 0),
+                NextState("PRE-TRIGGER")
+            ).Else(
+                NextState("DRAIN")
+            )
+        )
+        self.comb += [
+            self.dead.eq(fsm.ongoing("FLUSH") | fsm.ongoing("SEGMENT")),
+        ]
+        fsm.act("DRAIN",
+            armed.eq(1),
+            If(drained,
+                NextValue(done, 1),
+                NextState("IDLE")
+            )
+        )
@@ -0,0 +1,152 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from functools import reduce
+from operator import add
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import *
+
+# Transition Encoder -------------------------------------------------------------------------------
+
+class TransitionEncoder(LiteXModule):
+    """Run-length encoding of logic samples.
+
+    Emits a `(delta, state)` record (`state` in the LSBs, `delta` in the MSBs) only when any
+    channel changes: `state` is the new value of the channels and `delta` the number of samples
+    since the previous record. A record repeating the current state is also emitted when `delta`
+    saturates, so idle channels still produce one record every `2**delta_width - 1` samples.
+
+    When `enable` is cleared every sample is emitted (with `delta` = 1), keeping the same record
+    format for the capture storage and the host.
+
+    With `lanes` > 1 (oversampled inputs) each sink beat holds `lanes` consecutive samples (oldest
+    in the LSBs) and the source beats up to `lanes` records, packed in the LSBs, `count` giving
+    their number (see `RecordSerializer`).
+
+    The record of a sample is on `source` `latency` (1) cycle after the sample is on `sink`.
+    """
+    latency = 1
+
+    def __init__(self, data_width=16, delta_width=16, lanes=1):
+        record_width = data_width + delta_width
+        source_layout = [("data", record_width*lanes)]
+        if lanes > 1:
+            source_layout.append(("count", bits_for(lanes)))
+        self.sink   = sink   = stream.Endpoint([("data", data_width*lanes)])
+        self.source = source = stream.Endpoint(source_layout)
+
+        self._enable = CSRStorage(reset=1, description="Only store transitions (0: store all samples).")
+
+        # # #
+
+        last  = Signal(data_width)
+        delta = Signal(delta_width)
+        first = Signal(reset=1)
+        self.comb += sink.ready.eq(1)
+
+        # Lanes are chained: each one sees the state and delta left by the previous one.
+        samples  = [sink.data[k*data_width:(k + 1)*data_width] for k in range(lanes)]
+        records  = []
+        emits    = []
+        previous = last
+        current  = delta
+        for k, sample in enumerate(samples):
+            lane_delta = Signal(delta_width)
+            emit       = Signal()
+            next_delta = Signal(delta_width)
+            self.comb += [
+                lane_delta.eq(current + 1),
+                emit.eq(sink.valid & (
+                    (first if k == 0 else 0) |
+                    ~self._enable.storage    |
+                    (sample != previous)     |
+                    (lane_delta == (2**delta_width - 1))
+                )),
+                next_delta.eq(Mux(emit, 0, lane_delta)),
+            ]
+            records.append(Cat(sample, lane_delta))
+            emits.append(emit)
+            previous = sample
+            current  = next_delta
+
+        # Records packed in the LSBs (slot `j` gets the `j`-th emitting lane).
+        count = Signal(bits_for(lanes))
+        slots = [Signal(record_width) for j in range(lanes)]
+        self.comb += count.eq(reduce(add, emits))
+        for k, (record, emit) in enumerate(zip(records, emits)):
+            index = Signal(bits_for(lanes))
+            self.comb += index.eq(reduce(add, emits[:k], 0))
+            for j in range(k + 1):
+                self.comb += If(emit & (index == j), slots[j].eq(record))
+
+        self.sync += [
+            source.valid.eq(count != 0),
+            source.data.eq(Cat(*slots)),
+            If(sink.valid,
+                delta.eq(current),
+                last.eq(samples[-1]),
+                If(count != 0,
+                    first.eq(0),
+                )
+            )
+        ]
+        if lanes > 1:
+            self.sync += source.count.eq(count)
+
+# Record Serializer --------------------------------------------------------------------------------
+
+class RecordSerializer(LiteXModule):
+    """Records of a multi-lane `TransitionEncoder`, one per cycle.
+
+    Encoder beats (up to `lanes` records each) are queued in a `depth` FIFO and released one
+    record per cycle, so bursts of transitions faster than a record per cycle are absorbed as long
+    as the average rate stays below it. The sink is not back-pressured (as the capture path): beats
+    arriving while the FIFO is full are lost and strobe `dropped`.
+
+    The `trigger` flag of a beat (see `TriggerMarker`) is passed with its first record, or the first
+    record of the next stored beat when it is lost.
+    """
+    def __init__(self, record_width=32, lanes=4, depth=128):
+        self.sink    = sink   = stream.Endpoint([("data", record_width*lanes), ("count", bits_for(lanes)), ("trigger", 1)])
+        self.source  = source = stream.Endpoint([("data", record_width), ("trigger", 1)])
+        self.dropped = Signal()
+
+        # # #
+
+        self.fifo = fifo = stream.SyncFIFO(sink.description, depth, buffered=True)
+        index   = Signal(max=lanes)
+        pending = Signal()
+        records = Array(fifo.source.data[k*record_width:(k + 1)*record_width] for k in range(lanes))
+        self.comb += [
+            sink.ready.eq(1),
+            fifo.sink.valid.eq(sink.valid),
+            fifo.sink.data.eq(sink.data),
+            fifo.sink.count.eq(sink.count),
+            fifo.sink.trigger.eq(sink.trigger | pending),
+            self.dropped.eq(sink.valid & ~fifo.sink.ready),
+            source.valid.eq(fifo.source.valid),
+            source.data.eq(records[index]),
+            source.trigger.eq(fifo.source.trigger & (index == 0)),
+            fifo.source.ready.eq(source.ready & (index == (fifo.source.count - 1))),
+        ]
+        self.sync += [
+            If(source.valid & source.ready,
+                index.eq(index + 1),
+                If(fifo.source.ready,
+                    index.eq(0),
+                )
+            ),
+            If(fifo.sink.valid & fifo.sink.ready,
+                pending.eq(0)
+            ).Elif(self.dropped,
+                pending.eq(fifo.sink.trigger)
+            )
+        ]
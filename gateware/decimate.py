@@ -0,0 +1,91 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from functools import reduce
+from operator import or_
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import *
+
+# Decimator ----------------------------------------------------------------------------------------
+
+class Decimator(LiteXModule):
+    """Logic samples decimation by `ratio` (1..`max_ratio`).
+
+    Samples are grouped in bins of `ratio` samples and each bin produces:
+    - Normal mode: its last sample.
+    - Peak-detect mode (`ratio` >= 2): two samples, so a transition seen anywhere in the bin (even
+      a glitch shorter than the bin) survives decimation. Channels that changed during the bin
+      emit the complement of their final state then their final state, others emit their state
+      twice, so a single edge is not duplicated and a pulse shows up as a pulse.
+
+    The source is not back-pressured (as the capture path).
+
+    With `lanes` > 1 (oversampled inputs) each beat holds `lanes` consecutive samples (oldest in
+    the LSBs) and `ratio` counts beats: undecimated beats are passed as is, the samples of a
+    decimated bin are repeated over the `lanes` of their beat (so a bin still spans `lanes`
+    samples downstream).
+
+    Undecimated samples reach `source` `latency` (1) cycle after `sink`.
+    """
+    latency = 1
+
+    def __init__(self, data_width=16, max_ratio=2**20, lanes=1):
+        self.sink   = sink   = stream.Endpoint([("data", data_width*lanes)])
+        self.source = source = stream.Endpoint([("data", data_width*lanes)])
+
+        self._ratio = CSRStorage(bits_for(max_ratio), reset=1, description="Samples per bin (0/1: no decimation).")
+        self._peak  = CSRStorage(description="Peak-detect (keep transitions) instead of sampling.")
+
+        # # #
+
+        ratio   = self._ratio.storage
+        peak    = Signal()
+        count   = Signal(len(ratio))
+        last    = Signal(data_width)
+        changed = Signal(data_width)
+        toggled = Signal(data_width)
+        end     = Signal()
+        pending = Signal()
+        samples = [sink.data[k*data_width:(k + 1)*data_width] for k in range(lanes)]
+        self.comb += [
+            sink.ready.eq(1),
+            peak.eq(self._peak.storage & (ratio > 1)),
+            toggled.eq(reduce(or_, [changed, samples[0] ^ last] +
+                [sample ^ previous for previous, sample in zip(samples, samples[1:])])),
+            end.eq(count >= (ratio - 1)),
+        ]
+        self.sync += [
+            source.valid.eq(0),
+            # Second sample of a peak-detect bin.
+            If(pending,
+                pending.eq(0),
+                source.valid.eq(1),
+                source.data.eq(Replicate(last, lanes)),
+            ),
+            If(sink.valid,
+                last.eq(samples[-1]),
+                changed.eq(toggled),
+                count.eq(count + 1),
+                If(end,
+                    count.eq(0),
+                    changed.eq(0),
+                    source.valid.eq(1),
+                    If(peak,
+                        source.data.eq(Replicate(samples[-1] ^ toggled, lanes)),
+                        pending.eq(1),
+                    ).Elif(ratio > 1,
+                        source.data.eq(Replicate(samples[-1], lanes)),
+                    ).Else(
+                        source.data.eq(sink.data),
+                    )
+                )
+            )
+        ]
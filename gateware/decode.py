@@ -0,0 +1,320 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect.packet import Arbiter
+
+# Events -------------------------------------------------------------------------------------------
+
+# 64-bit event records: timestamp (sys clk cycles) | data | kind | decoder.
+EVENT_TIMESTAMP_BITS = 40
+EVENT_DATA_BITS      = 16
+EVENT_KIND_BITS      = 4
+EVENT_DECODER_BITS   = 4
+
+EVENT_DATA    = 0 # UART byte, SPI MOSI (LSBs) / MISO (MSBs) bytes, I2C data byte.
+EVENT_START   = 1 # SPI CS asserted, I2C (repeated) start.
+EVENT_STOP    = 2 # SPI CS released, I2C stop.
+EVENT_ADDRESS = 3 # I2C address byte (address << 1 | read).
+EVENT_ERROR   = 8 # Flag: UART framing error, I2C NACK.
+
+event_layout = [
+    ("data", EVENT_DATA_BITS),
+    ("kind", EVENT_KIND_BITS),
+]
+
+def _channel(data, sel):
+    return (data >> sel)[0]
+
+# UART Decoder -------------------------------------------------------------------------------------
+
+class UARTDecoder(LiteXModule):
+    """8N1 UART receiver on logic channel `rx`, disabled while `divider` (cycles per bit) is 0."""
+    def __init__(self, data, divider_width=24):
+        self.source = source = stream.Endpoint(event_layout)
+
+        self._rx      = CSRStorage(4, description="RX channel.")
+        self._divider = CSRStorage(divider_width, description="sys clk cycles per bit (0: disabled).")
+
+        # # #
+
+        divider = self._divider.storage
+        rx      = Signal(reset=1)
+        rx_d    = Signal(reset=1)
+        timer   = Signal(divider_width)
+        bit     = Signal(3)
+        shift   = Signal(8)
+        self.sync += [
+            rx.eq(_channel(data, self._rx.storage)),
+            rx_d.eq(rx),
+            source.valid.eq(0),
+            If(timer != 0,
+                timer.eq(timer - 1)
+            )
+        ]
+
+        self.fsm = fsm = FSM(reset_state="IDLE")
+        fsm.act("IDLE",
+            If((divider != 0) & rx_d & ~rx,
+                NextValue(timer, divider[1:]),
+                NextState("START")
+            )
+        )
+        # Check the start bit at its middle then sample each bit at its middle.
+        fsm.act("START",
+            If(timer == 0,
+                If(rx,
+                    NextState("IDLE")
+                ).Else(
+                    NextValue(timer, divider - 1),
+                    NextValue(bit, 0),
+                    NextState("DATA")
+                )
+            )
+        )
+        fsm.act("DATA",
+            If(timer == 0,
+                NextValue(shift, Cat(shift[1:], rx)),
+                NextValue(timer, divider - 1),
+                NextValue(bit, bit + 1),
+                If(bit == 7,
+                    NextState("STOP")
+                )
+            )
+        )
+        fsm.act("STOP",
+            If(timer == 0,
+                NextValue(source.valid, 1),
+                NextValue(source.data, shift),
+                NextValue(source.kind, Mux(rx, EVENT_DATA, EVENT_DATA | EVENT_ERROR)),
+                NextState("IDLE")
+            )
+        )
+
+# SPI Decoder --------------------------------------------------------------------------------------
+
+class SPIDecoder(LiteXModule):
+    """SPI sniffer: MOSI/MISO bytes of each 8 clocks while CS (active low) is asserted."""
+    def __init__(self, data):
+        self.source = source = stream.Endpoint(event_layout)
+
+        self._clk  = CSRStorage(4, description="CLK channel.")
+        self._mosi = CSRStorage(4, description="MOSI channel.")
+        self._miso = CSRStorage(4, description="MISO channel.")
+        self._cs   = CSRStorage(4, description="CS channel.")
+        self._control = CSRStorage(fields=[
+            CSRField("enable",    size=1, offset=0, description="Enable the decoder."),
+            CSRField("cpol",      size=1, offset=1, description="Clock idle level."),
+            CSRField("cpha",      size=1, offset=2, description="Sample on the trailing edge."),
+            CSRField("lsb_first", size=1, offset=3, description="Bits are sent LSB first."),
+        ])
+
+        # # #
+
+        fields = self._control.fields
+        clk    = Signal()
+        clk_d  = Signal()
+        cs     = Signal(reset=1)
+        cs_d   = Signal(reset=1)
+        mosi   = Signal()
+        miso   = Signal()
+        self.sync += [
+            clk.eq(_channel(data, self._clk.storage)),
+            clk_d.eq(clk),
+            cs.eq(_channel(data, self._cs.storage)),
+            cs_d.eq(cs),
+            mosi.eq(_channel(data, self._mosi.storage)),
+            miso.eq(_channel(data, self._miso.storage)),
+        ]
+
+        # Data is sampled on the rising edge for modes 0/3, on the falling edge for modes 1/2.
+        sample = Signal()
+        self.comb += If(fields.cpol == fields.cpha,
+            sample.eq(clk & ~clk_d)
+        ).Else(
+            sample.eq(~clk & clk_d)
+        )
+
+        bit        = Signal(3)
+        mosi_shift = Signal(8)
+        miso_shift = Signal(8)
+        mosi_next  = Signal(8)
+        miso_next  = Signal(8)
+        self.comb += If(fields.lsb_first,
+            mosi_next.eq(Cat(mosi_shift[1:], mosi)),
+            miso_next.eq(Cat(miso_shift[1:], miso)),
+        ).Else(
+            mosi_next.eq(Cat(mosi, mosi_shift[:7])),
+            miso_next.eq(Cat(miso, miso_shift[:7])),
+        )
+        self.sync += [
+            source.valid.eq(0),
+            If(~fields.enable,
+                bit.eq(0),
+            ).Elif(cs_d & ~cs,
+                bit.eq(0),
+                source.valid.eq(1),
+                source.kind.eq(EVENT_START),
+                source.data.eq(0),
+            ).Elif(~cs_d & cs,
+                source.valid.eq(1),
+                source.kind.eq(EVENT_STOP),
+                source.data.eq(0),
+            ).Elif(~cs & sample,
+                bit.eq(bit + 1),
+                mosi_shift.eq(mosi_next),
+                miso_shift.eq(miso_next),
+                If(bit == 7,
+                    source.valid.eq(1),
+                    source.kind.eq(EVENT_DATA),
+                    source.data.eq(Cat(mosi_next, miso_next)),
+                )
+            )
+        ]
+
+# I2C Decoder --------------------------------------------------------------------------------------
+
+class I2CDecoder(LiteXModule):
+    """I2C sniffer: start/stop conditions and address/data bytes (NACK flagged as error)."""
+    def __init__(self, data):
+        self.source = source = stream.Endpoint(event_layout)
+
+        self._scl     = CSRStorage(4, description="SCL channel.")
+        self._sda     = CSRStorage(4, description="SDA channel.")
+        self._control = CSRStorage(fields=[
+            CSRField("enable", size=1, offset=0, description="Enable the decoder."),
+        ])
+
+        # # #
+
+        scl   = Signal(reset=1)
+        scl_d = Signal(reset=1)
+        sda   = Signal(reset=1)
+        sda_d = Signal(reset=1)
+        self.sync += [
+            scl.eq(_channel(data, self._scl.storage)),
+            scl_d.eq(scl),
+            sda.eq(_channel(data, self._sda.storage)),
+            sda_d.eq(sda),
+        ]
+
+        bit     = Signal(4)
+        shift   = Signal(8)
+        address = Signal()
+        active  = Signal()
+        self.sync += [
+            source.valid.eq(0),
+            If(~self._control.fields.enable,
+                active.eq(0),
+            # SDA changing while SCL is high: start/stop condition.
+            ).Elif(scl & scl_d & sda_d & ~sda,
+                active.eq(1),
+                address.eq(1),
+                bit.eq(0),
+                source.valid.eq(1),
+                source.kind.eq(EVENT_START),
+                source.data.eq(0),
+            ).Elif(scl & scl_d & ~sda_d & sda,
+                active.eq(0),
+                source.valid.eq(1),
+                source.kind.eq(EVENT_STOP),
+                source.data.eq(0),
+            # 8 bits + ACK, sampled on SCL rising edges.
+            ).Elif(active & scl & ~scl_d,
+                bit.eq(bit + 1),
+                If(bit == 8,
+                    bit.eq(0),
+                    address.eq(0),
+                    source.valid.eq(1),
+                    source.kind.eq(Mux(address, EVENT_ADDRESS, EVENT_DATA) | Mux(sda, EVENT_ERROR, 0)),
+                    source.data.eq(shift),
+                ).Else(
+                    shift.eq(Cat(sda, shift[:7])),
+                )
+            )
+        ]
+
+# Protocol Decoders --------------------------------------------------------------------------------
+
+class ProtocolDecoders(LiteXModule):
+    """UART/SPI/I2C decoders on the logic channels, merged in a stream of 64-bit event records.
+
+    Decoders are numbered in order (UARTs, SPIs then I2Cs) and any of them can be attached to any
+    logic channel through CSRs. Events are timestamped when decoded and buffered per decoder, an
+    event decoded while its decoder FIFO is full is dropped and flagged in `overflow`.
+
+    `trigger` strobes when the decoder selected by `trigger_control` decodes an event of the
+    selected kind whose data matches `trigger_value` on the `trigger_mask` bits.
+    """
+    def __init__(self, data, uarts=2, spis=1, i2cs=1, fifo_depth=16):
+        self.source  = source = stream.Endpoint([("data", 64)])
+        self.trigger = Signal()
+        self.clear   = Signal() # Clears overflow (ex on capture arm).
+
+        self._overflow        = CSRStatus(description="Events were dropped since last clear.")
+        self._trigger_control = CSRStorage(fields=[
+            CSRField("enable",  size=1, offset=0, description="Trigger on decoded events."),
+            CSRField("decoder", size=EVENT_DECODER_BITS, offset=1, description="Decoder index."),
+            CSRField("kind",    size=EVENT_KIND_BITS,    offset=8, description="Event kind."),
+        ])
+        self._trigger_value = CSRStorage(EVENT_DATA_BITS, description="Event data to trigger on.")
+        self._trigger_mask  = CSRStorage(EVENT_DATA_BITS, description="Event data bits compared.")
+
+        # # #
+
+        assert uarts + spis + i2cs <= 2**EVENT_DECODER_BITS
+        self.uarts = uarts
+        self.spis  = spis
+        self.i2cs  = i2cs
+
+        timestamp = Signal(EVENT_TIMESTAMP_BITS)
+        self.sync += timestamp.eq(timestamp + 1)
+
+        decoders = []
+        for n in range(uarts):
+            decoders.append(UARTDecoder(data))
+            setattr(self, f"uart{n}", decoders[-1])
+        for n in range(spis):
+            decoders.append(SPIDecoder(data))
+            setattr(self, f"spi{n}", decoders[-1])
+        for n in range(i2cs):
+            decoders.append(I2CDecoder(data))
+            setattr(self, f"i2c{n}", decoders[-1])
+
+        # Timestamp, per decoder buffering and merge.
+        fifos = []
+        for n, decoder in enumerate(decoders):
+            fifo = stream.SyncFIFO([("data", 64)], fifo_depth)
+            self.submodules += fifo
+            fifos.append(fifo)
+            self.comb += [
+                fifo.sink.valid.eq(decoder.source.valid),
+                fifo.sink.last.eq(1),
+                fifo.sink.data.eq(Cat(timestamp, decoder.source.data, decoder.source.kind,
+                    Constant(n, EVENT_DECODER_BITS))),
+                decoder.source.ready.eq(1),
+            ]
+            self.sync += If(self.clear,
+                self._overflow.status.eq(0)
+            ).Elif(decoder.source.valid & ~fifo.sink.ready,
+                self._overflow.status.eq(1)
+            )
+        self.arbiter = Arbiter([fifo.source for fifo in fifos], source)
+
+        # Trigger on a decoded event.
+        trigger = self._trigger_control.fields
+        cases   = {}
+        for n, decoder in enumerate(decoders):
+            cases[n] = self.trigger.eq(trigger.enable & decoder.source.valid &
+                (decoder.source.kind == trigger.kind) &
+                (((decoder.source.data ^ self._trigger_value.storage) & self._trigger_mask.storage) == 0))
+        cases["default"] = self.trigger.eq(0)
+        self.comb += Case(trigger.decoder, cases)
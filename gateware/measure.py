@@ -0,0 +1,114 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+
+# Reciprocal Counter -------------------------------------------------------------------------------
+
+class ReciprocalCounter(LiteXModule):
+    """Rising edges, first to last rising edge span and high time of `input` over a gate.
+
+    Counters restart on `start` (gate boundary, the results of the ended gate are then on
+    `edges`, `span` and `high` until the next one). The frequency is `(edges - 1)/span` clock
+    cycles (reciprocal counting: resolution of one cycle over the whole span, not over a period)
+    and the duty cycle `high/gate`. Counters saturate at `2**width - 1`.
+    """
+    def __init__(self, width=32):
+        self.input = Signal()
+        self.start = Signal()
+        self.edges = Signal(width)
+        self.span  = Signal(width)
+        self.high  = Signal(width)
+
+        # # #
+
+        input_d = Signal()
+        edges   = Signal(width)
+        since   = Signal(width) # Cycles since the first rising edge.
+        span    = Signal(width)
+        high    = Signal(width)
+        rising  = Signal()
+        self.comb += rising.eq(self.input & ~input_d)
+        self.sync += [
+            input_d.eq(self.input),
+            If(self.start,
+                self.edges.eq(edges),
+                self.span.eq(span),
+                self.high.eq(high),
+                edges.eq(rising),
+                since.eq(0),
+                span.eq(0),
+                high.eq(self.input),
+            ).Else(
+                If(rising & (edges != (2**width - 1)),
+                    edges.eq(edges + 1),
+                    If(edges != 0,
+                        span.eq(since + 1),
+                    )
+                ),
+                If((edges != 0) & (since != (2**width - 1)),
+                    since.eq(since + 1),
+                ),
+                If(self.input & (high != (2**width - 1)),
+                    high.eq(high + 1),
+                ),
+            )
+        ]
+
+# Reciprocal Counters ------------------------------------------------------------------------------
+
+class ReciprocalCounters(LiteXModule):
+    """Free-running frequency/period/duty counters on the `channels` bits of `data`.
+
+    All the channels share back-to-back gates of `gate` cycles (see `ReciprocalCounter`) and their
+    results are updated together at the end of each gate, `gates` counting them so a reader can
+    tell a new result (or a read spanning two gates) from the previous one. `select` picks the
+    reported channel (by bit of `data`, channels not in `channels` read 0).
+    """
+    def __init__(self, data, channels, default_gate=2**24, width=32):
+        self._gate   = CSRStorage(width, reset=default_gate, description="Gate time (cycles).")
+        self._select = CSRStorage(bits_for(len(data) - 1), description="Channel reported below.")
+        self._edges  = CSRStatus(width, description="Rising edges during the last gate.")
+        self._span   = CSRStatus(width, description="Cycles from the first to the last rising edge of the last gate.")
+        self._high   = CSRStatus(width, description="High cycles during the last gate.")
+        self._gates  = CSRStatus(32, description="Gates completed (results updated on each one).")
+
+        # # #
+
+        count = Signal(width)
+        start = Signal()
+        self.comb += start.eq(count >= (self._gate.storage - 1))
+        self.sync += [
+            count.eq(count + 1),
+            If(start,
+                count.eq(0),
+                self._gates.status.eq(self._gates.status + 1),
+            )
+        ]
+
+        edges = Array(Signal(width) for n in range(len(data)))
+        span  = Array(Signal(width) for n in range(len(data)))
+        high  = Array(Signal(width) for n in range(len(data)))
+        for n in channels:
+            counter = ReciprocalCounter(width)
+            setattr(self, f"ch{n}", counter)
+            self.comb += [
+                counter.input.eq(data[n]),
+                counter.start.eq(start),
+                edges[n].eq(counter.edges),
+                span[n].eq(counter.span),
+                high[n].eq(counter.high),
+            ]
+        select = self._select.storage
+        self.comb += [
+            self._edges.status.eq(edges[select]),
+            self._span.status.eq(span[select]),
+            self._high.status.eq(high[select]),
+        ]
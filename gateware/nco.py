@@ -0,0 +1,83 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+
+# NCO Output ---------------------------------------------------------------------------------------
+
+class NCOOutput(LiteXModule):
+    """Square/PWM output of a 32-bit numerically-controlled oscillator.
+
+    The phase accumulator advances by `frequency` each cycle (2**32 = sys clk) and the output is
+    high while the accumulator plus `phase` is below `duty` (2**32 = 100%). Edges are on sys clk,
+    so non integer periods show up to one cycle of jitter.
+    """
+    def __init__(self):
+        self.output = Signal()
+        self.run    = Signal() # Runs while high.
+        self.start  = Signal() # Clears the accumulator.
+
+        self._frequency = CSRStorage(32, description="Phase increment per cycle (2**32 = sys clk).")
+        self._duty      = CSRStorage(32, reset=2**31, description="High time (2**32 = 100%).")
+        self._phase     = CSRStorage(32, description="Phase offset (2**32 = 360°).")
+
+        # # #
+
+        accumulator = Signal(32)
+        position    = Signal(32)
+        self.comb += position.eq(accumulator + self._phase.storage)
+        self.sync += [
+            If(self.start,
+                accumulator.eq(0)
+            ).Elif(self.run,
+                accumulator.eq(accumulator + self._frequency.storage)
+            ),
+            self.output.eq(self.run & (position < self._duty.storage)),
+        ]
+
+# Frequency Generator ------------------------------------------------------------------------------
+
+class FrequencyGenerator(LiteXModule):
+    """NCO/PWM outputs for the function generator header, one per entry of `pins`.
+
+    Outputs are named after their pin (`out<pin>`) and `enable` is indexed by pin number. `start`
+    clears the accumulators of all enabled outputs on the same cycle so they start in phase (with
+    their `phase` offsets), disabled outputs stay low.
+    """
+    def __init__(self, pins):
+        nbits       = max(pins) + 1
+        self.output = Signal(nbits)
+
+        self._enable  = CSRStorage(nbits, description="Enabled outputs (bit n: pin n).")
+        self._control = CSRStorage(fields=[
+            CSRField("start", size=1, offset=0, pulse=True, description="Start enabled outputs."),
+            CSRField("stop",  size=1, offset=1, pulse=True, description="Stop all outputs."),
+        ])
+        self._running = CSRStatus(description="Outputs are running.")
+
+        # # #
+
+        control = self._control.fields
+        running = self._running.status
+        self.sync += If(control.start,
+            running.eq(1)
+        ).Elif(control.stop,
+            running.eq(0)
+        )
+
+        self.pins = pins
+        for pin in pins:
+            out = NCOOutput()
+            setattr(self, f"out{pin}", out)
+            self.comb += [
+                out.start.eq(control.start),
+                out.run.eq(running & self._enable.storage[pin]),
+                self.output[pin].eq(out.output),
+            ]
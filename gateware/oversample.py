@@ -0,0 +1,42 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import *
+
+# IDES Input ---------------------------------------------------------------------------------------
+
+class IDESInput(LiteXModule):
+    """Logic inputs sampled `ratio` times per sys cycle by the GW2A input deserializers.
+
+    Each pad goes through an IDES4 (`ratio` = 4, fast clock `sys2x`, both edges) or an IDES8
+    (`ratio` = 8, fast clock `sys4x`), the parallel side being clocked by `sys` (the fast clocks
+    come from the same PLL as `sys`, as for the DDR3 PHY). `data` holds the `ratio` samples of
+    the last cycle, oldest in the LSBs: sample `k` of channel `n` is bit `k*data_width + n`.
+    Channels without pad (`pads`: dict of channel -> pad) read 0.
+    """
+    def __init__(self, pads, data_width=16, ratio=4):
+        self.data = Signal(ratio*data_width)
+
+        # # #
+
+        fclk    = {4: "sys2x", 8: "sys4x"}[ratio]
+        samples = [Signal(data_width) for k in range(ratio)]
+        for n, pad in pads.items():
+            q = Signal(ratio)
+            self.specials += Instance(f"IDES{ratio}",
+                i_D     = pad,
+                i_FCLK  = ClockSignal(fclk),
+                i_PCLK  = ClockSignal("sys"),
+                i_CALIB = 0,
+                i_RESET = ResetSignal("sys"),
+                **{f"o_Q{k}": q[k] for k in range(ratio)},
+            )
+            self.comb += [samples[k][n].eq(q[k]) for k in range(ratio)]
+        # The deserializers already register the pads (in the fast domain), one more stage for
+        # metastability as the MultiReg of the non-oversampled path.
+        self.sync += self.data.eq(Cat(*samples))
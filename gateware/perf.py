@@ -0,0 +1,63 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+
+# Performance Counters -----------------------------------------------------------------------------
+
+class PerfCounters(LiteXModule):
+    """Event counters and high-water marks, to size buffers and clocks from measurements.
+
+    `counters` (dict of name -> Signal) count the cycles their signal is high (or add up their value
+    for multi-bit signals, ex events counted in another clock domain), `levels` (dict of
+    name -> Signal) keep the maximum value seen. A `cycles` counter (time base) comes first, then
+    the counters and the levels, in `names` order. All values saturate at `2**width - 1`.
+
+    `snapshot` latches every value at once, they are then read one at a time through `select` and
+    `value`; `clear` restarts them all.
+    """
+    def __init__(self, counters={}, levels={}, width=48):
+        self.names = ["cycles", *counters, *levels]
+
+        self._control = CSRStorage(fields=[
+            CSRField("snapshot", size=1, offset=0, pulse=True, description="Latch all values."),
+            CSRField("clear",    size=1, offset=1, pulse=True, description="Restart all values."),
+        ])
+        self._select = CSRStorage(bits_for(len(self.names) - 1), description="Value reported below.")
+        self._value  = CSRStatus(width, description="Selected value at the last snapshot.")
+
+        # # #
+
+        clear  = self._control.fields.clear
+        values = []
+        for event in [1, *counters.values()]:
+            value = Signal(width)
+            self.sync += If(clear,
+                value.eq(0)
+            ).Elif((value + event) >= (2**width - 1),
+                value.eq(2**width - 1)
+            ).Else(
+                value.eq(value + event)
+            )
+            values.append(value)
+        for level in levels.values():
+            value = Signal(width)
+            self.sync += If(clear,
+                value.eq(0)
+            ).Elif(level > value,
+                value.eq(level)
+            )
+            values.append(value)
+
+        latched = Array(Signal(width) for value in values)
+        self.sync += If(self._control.fields.snapshot,
+            [latch.eq(value) for latch, value in zip(latched, values)]
+        )
+        self.comb += self._value.status.eq(latched[self._select.storage])
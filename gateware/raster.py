@@ -0,0 +1,242 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import *
+from litex.soc.cores.video import video_timing_layout, video_data_layout
+
+# Waveform Rasterizer ------------------------------------------------------------------------------
+
+class WaveformRasterizer(LiteXModule):
+    """Live persistence display of the logic channels.
+
+    Each trigger (or immediately in `auto` mode) sweeps the next `columns` samples of `sink` across
+    the screen. Every (column, channel) pixel accumulates how many sweeps saw the channel high, low
+    or toggling there in saturating `intensity_bits` counters, which fade by one step every `decay`
+    cycles (0: infinite persistence). The accumulator is an on-chip dual-port memory: the sys side
+    does one read-modify-write per 2 cycles (sweeps are buffered so they are taken at full sample
+    rate), the video side scans it out without involving the CPU or the DDR3.
+
+    Channels are drawn in horizontal bands of `vres`//len(`channels`) lines: high level, low level
+    and transitions (vertical segment) with brightness following the accumulated counts.
+    """
+    def __init__(self, channels, columns=640, vres=480, intensity_bits=5, clock_domain="video"):
+        self.sink     = sink = stream.Endpoint([("data", max(channels) + 1)])
+        self.trigger  = Signal()
+        self.vtg_sink = vtg_sink = stream.Endpoint(video_timing_layout)
+        self.source   = source   = stream.Endpoint(video_data_layout)
+
+        self._control = CSRStorage(fields=[
+            CSRField("enable", size=1, offset=0, description="Rasterize sweeps."),
+            CSRField("auto",   size=1, offset=1, description="Sweep without waiting for triggers."),
+            CSRField("clear",  size=1, offset=2, pulse=True, description="Clear the display."),
+        ])
+        self._decay = CSRStorage(32, reset=2**20, description="Cycles per fade step (0: none).")
+        self._count = CSRStatus(32, description="Sweeps rasterized.")
+
+        # # #
+
+        self.intensity_bits = intensity_bits
+
+        nchannels = len(channels)
+        ibits     = intensity_bits
+        imax      = 2**ibits - 1
+        control   = self._control.fields
+
+        # Accumulator: one word per column holding (high, low, toggle) counters of each channel.
+        mem     = Memory(3*ibits*nchannels, columns)
+        port    = mem.get_port(write_capable=True)
+        scan    = mem.get_port(clock_domain=clock_domain)
+        self.specials += mem, port, scan
+
+        # Sweeps --------------------------------------------------------------------------------
+        self.fifo = fifo = stream.SyncFIFO([
+            ("column", bits_for(columns - 1)),
+            ("level",  nchannels),
+            ("toggle", nchannels)], columns)
+        level    = Signal(nchannels)
+        previous = Signal(nchannels)
+        column   = Signal(bits_for(columns - 1))
+        sweeping = Signal()
+        self.comb += [
+            sink.ready.eq(1),
+            level.eq(Cat(*[sink.data[n] for n in channels])),
+            fifo.sink.valid.eq(sweeping & sink.valid),
+            fifo.sink.column.eq(column),
+            fifo.sink.level.eq(level),
+            fifo.sink.toggle.eq(Mux(column == 0, 0, level ^ previous)),
+        ]
+        # A new sweep starts once the previous one has been accumulated.
+        self.sync += [
+            If(sweeping,
+                If(sink.valid,
+                    previous.eq(level),
+                    column.eq(column + 1),
+                    If(column == (columns - 1),
+                        sweeping.eq(0),
+                        self._count.status.eq(self._count.status + 1),
+                    )
+                )
+            ).Elif(control.enable & ~fifo.source.valid & (self.trigger | control.auto),
+                sweeping.eq(1),
+                column.eq(0),
+            )
+        ]
+
+        # Fade / clear passes -------------------------------------------------------------------
+        timer   = Signal(32)
+        fading  = Signal()
+        clear   = Signal()
+        fcolumn = Signal(bits_for(columns - 1))
+        self.sync += [
+            If((timer != 0) & (timer < self._decay.storage),
+                timer.eq(timer - 1)
+            ).Elif(self._decay.storage != 0,
+                timer.eq(self._decay.storage - 1),
+                fading.eq(1),
+            ),
+            If(control.clear,
+                clear.eq(1),
+                fading.eq(1),
+            )
+        ]
+
+        # Read-modify-write: read on phase 0, write on phase 1. Sweeps have priority.
+        phase   = Signal()
+        adr     = Signal(bits_for(columns - 1))
+        hit     = Signal()
+        hit_lvl = Signal(nchannels)
+        hit_tgl = Signal(nchannels)
+        self.comb += [
+            fifo.source.ready.eq(~phase),
+            If(phase,
+                port.adr.eq(adr)
+            ).Elif(fifo.source.valid,
+                port.adr.eq(fifo.source.column)
+            ).Else(
+                port.adr.eq(fcolumn)
+            )
+        ]
+        self.sync += [
+            phase.eq(0),
+            If(~phase,
+                adr.eq(port.adr),
+                If(fifo.source.valid,
+                    phase.eq(1),
+                    hit.eq(1),
+                    hit_lvl.eq(fifo.source.level),
+                    hit_tgl.eq(fifo.source.toggle),
+                ).Elif(fading,
+                    phase.eq(1),
+                    hit.eq(0),
+                    fcolumn.eq(fcolumn + 1),
+                    If(fcolumn == (columns - 1),
+                        fcolumn.eq(0),
+                        fading.eq(0),
+                        clear.eq(0),
+                    )
+                )
+            )
+        ]
+        updated = []
+        for n in range(nchannels):
+            for k, inc in enumerate([hit_lvl[n], ~hit_lvl[n], hit_tgl[n]]):
+                value = port.dat_r[(3*n + k)*ibits:(3*n + k + 1)*ibits]
+                new   = Signal(ibits)
+                self.comb += If(clear,
+                    new.eq(0)
+                ).Elif(hit,
+                    new.eq(Mux(inc & (value != imax), value + 1, value))
+                ).Else(
+                    new.eq(Mux(value != 0, value - 1, 0))
+                )
+                updated.append(new)
+        self.comb += [
+            port.we.eq(phase),
+            port.dat_w.eq(Cat(*updated)),
+        ]
+
+        # Scanout -------------------------------------------------------------------------------
+        # Band of each line (channel) and line in the band, tracked as vcount changes.
+        band_lines = vres//nchannels
+        high_line  = band_lines//6
+        low_line   = band_lines - 1 - band_lines//6
+        vcount     = Signal(len(vtg_sink.vcount))
+        last_band  = Signal(max=nchannels + 1)
+        last_line  = Signal(max=band_lines)
+        band       = Signal(max=nchannels + 1)
+        line       = Signal(max=band_lines)
+        self.comb += [
+            band.eq(last_band),
+            line.eq(last_line),
+            If(vtg_sink.vcount != vcount,
+                If(vtg_sink.vcount == 0,
+                    band.eq(0),
+                    line.eq(0),
+                ).Elif((last_line == (band_lines - 1)) & (last_band != nchannels),
+                    band.eq(last_band + 1),
+                    line.eq(0),
+                ).Else(
+                    line.eq(last_line + 1),
+                )
+            )
+        ]
+        sd = getattr(self.sync, clock_domain)
+        sd += If(vtg_sink.valid,
+            vcount.eq(vtg_sink.vcount),
+            last_band.eq(band),
+            last_line.eq(line),
+        )
+        self.comb += [
+            vtg_sink.ready.eq(source.ready),
+            scan.adr.eq(vtg_sink.hcount),
+        ]
+
+        # Memory read latency: delay timings one cycle and pick the counter of the pixel.
+        in_band   = Signal()
+        counter   = Signal(2) # 0: high, 1: low, 2: toggle, 3: none.
+        separator = Signal()
+        sd += If(vtg_sink.valid & vtg_sink.ready,
+            source.valid.eq(1),
+            source.hsync.eq(vtg_sink.hsync),
+            source.vsync.eq(vtg_sink.vsync),
+            source.de.eq(vtg_sink.de),
+            in_band.eq((band < nchannels) & (vtg_sink.hcount < columns)),
+            separator.eq(line == (band_lines - 1)),
+            If(line == high_line,
+                counter.eq(0)
+            ).Elif(line == low_line,
+                counter.eq(1)
+            ).Elif((line > high_line) & (line < low_line),
+                counter.eq(2)
+            ).Else(
+                counter.eq(3)
+            )
+        ).Elif(source.ready,
+            source.valid.eq(0)
+        )
+        intensity = Signal(ibits)
+        selected  = Array(scan.dat_r[i*ibits:(i + 1)*ibits] for i in range(3*nchannels))
+        self.comb += If(in_band & (counter != 3),
+            intensity.eq(selected[3*band + counter])
+        )
+        # Green phosphor, dim separators between bands.
+        level8 = Signal(8)
+        self.comb += level8.eq(Cat(Replicate(0, 8 - ibits), intensity) |
+            (intensity >> (2*ibits - 8) if 2*ibits > 8 else 0))
+        self.comb += If(in_band & separator,
+            source.r.eq(0x20),
+            source.g.eq(0x20),
+            source.b.eq(0x20),
+        ).Else(
+            source.r.eq(level8 >> 2),
+            source.g.eq(level8),
+            source.b.eq(level8 >> 2),
+        )
@@ -0,0 +1,156 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import re
+
+from migen import *
+from migen.fhdl.structure import Display, Finish
+
+from litex.gen import *
+
+# Stimulus File ------------------------------------------------------------------------------------
+
+_UNITS = {"s": 1, "ms": 1e-3, "us": 1e-6, "ns": 1e-9}
+
+def read_stimulus(filename, clk_freq, inputs):
+    """Parse a stimulus file into `StimulusPlayer` records.
+
+    One event per line (`#` starts a comment): `<time> <input> <value>` sets `input` (a name of
+    `inputs`, a dict of name -> (width, initial value)) to `value` from `time` on, `<input><n>`
+    only sets its bit `n`. `<time> finish` ends the simulation. Times are absolute, in cycles or
+    with a unit (`s`, `ms`, `us`, `ns`), values are Python integer literals (`0x1f`, `0b101`).
+
+        0      btn_n           0b11111
+        10us   logicAnalyzer   0x0004
+        12.5us logicAnalyzer3  1
+        1ms    finish
+    """
+    state  = {name: initial for name, (width, initial) in inputs.items()}
+    events = []
+    with open(filename) as f:
+        for lineno, line in enumerate(f, 1):
+            fields = line.split("#")[0].split()
+            if not fields:
+                continue
+            t = re.fullmatch(r"([0-9.]+)([a-z]*)", fields[0])
+            if t is None or t.group(2) not in ["", *_UNITS]:
+                raise ValueError(f"{filename}:{lineno}: invalid time {fields[0]}")
+            cycle = int(float(t.group(1)) if t.group(2) == "" else
+                round(float(t.group(1))*_UNITS[t.group(2)]*clk_freq))
+            if fields[1:] == ["finish"]:
+                events.append((cycle, None, None, None))
+                continue
+            m = re.fullmatch(r"(.*?)(\d*)", fields[1])
+            if len(fields) != 3 or m.group(1) not in inputs:
+                raise ValueError(f"{filename}:{lineno}: invalid event {line.strip()}")
+            bit = None if m.group(2) == "" else int(m.group(2))
+            events.append((cycle, m.group(1), bit, int(fields[2], 0)))
+    events.sort(key=lambda e: e[0])
+
+    # Records: wait `cycles` after the previous one, then apply `values`.
+    records = [[0, dict(state), False]]
+    last    = 0
+    for cycle, name, bit, value in events:
+        if cycle != last:
+            records.append([cycle - last, dict(state), False])
+            last = cycle
+        if name is None:
+            records[-1][2] = True
+            continue
+        if bit is None:
+            state[name] = value
+        else:
+            state[name] = (state[name] & ~(1 << bit)) | ((value & 1) << bit)
+        records[-1][1] = dict(state)
+    return [tuple(r) for r in records]
+
+# Stimulus Player ----------------------------------------------------------------------------------
+
+class StimulusPlayer(LiteXModule):
+    """Drives `outputs` (dict of name -> Signal) from a list of records (see `read_stimulus`).
+
+    Each `(cycles, values, finish)` record sets `values` (dict of name -> value) `cycles` cycles
+    after the previous one (after reset for the first one) and ends the simulation when `finish`
+    is set. Records are stored in a ROM, the outputs keep the last values at the end.
+    """
+    def __init__(self, outputs, records, wait_width=32):
+        self.done = Signal()
+
+        # # #
+
+        # Split waits that do not fit.
+        split = []
+        for cycles, values, finish in records:
+            while cycles >= 2**wait_width:
+                split.append((2**wait_width - 1, split[-1][1] if split else {}, False))
+                cycles -= 2**wait_width - 1
+            split.append((cycles, values, finish))
+        records = split or [(0, {}, False)]
+
+        # ROM: (wait, finish, outputs...).
+        layout = [("wait", wait_width), ("finish", 1)]
+        layout += [(name, len(signal)) for name, signal in outputs.items()]
+        init = []
+        for cycles, values, finish in records:
+            word, shift = 0, 0
+            for name, width in layout:
+                value = {"wait": cycles, "finish": finish}.get(name, values.get(name, 0))
+                word  |= (value & (2**width - 1)) << shift
+                shift += width
+            init.append(word)
+        mem  = Memory(sum(width for name, width in layout), len(init), init=init)
+        port = mem.get_port(async_read=True)
+        self.specials += mem, port
+        fields = {}
+        shift  = 0
+        for name, width in layout:
+            fields[name] = port.dat_r[shift:shift + width]
+            shift += width
+
+        # Playback.
+        index = Signal(max=len(init) + 1)
+        count = Signal(wait_width)
+        self.comb += [
+            port.adr.eq(index),
+            self.done.eq(index == len(init)),
+        ]
+        self.sync += If(~self.done,
+            count.eq(count + 1),
+            If(count == fields["wait"],
+                [signal.eq(fields[name]) for name, signal in outputs.items()],
+                If(fields["finish"], Finish()),
+                index.eq(index + 1),
+                count.eq(1),
+            )
+        )
+
+# Signal Recorder ----------------------------------------------------------------------------------
+
+class SignalRecorder(LiteXModule):
+    """Prints `rec <cycle> <name> <value>` on each change of `signals` (dict of name -> Signal).
+
+    Simulation only (`$display`), the lines are mixed with the simulated UART console output.
+    """
+    def __init__(self, signals):
+        self.cycle = Signal(64)
+
+        # # #
+
+        first = Signal(reset=1)
+        self.sync += [
+            self.cycle.eq(self.cycle + 1),
+            first.eq(0),
+        ]
+        for name, signal in signals.items():
+            value = Signal(len(signal), name_override=f"rec_{name}")
+            last  = Signal(len(signal))
+            self.comb += value.eq(signal)
+            self.sync += [
+                last.eq(value),
+                If(first | (value != last),
+                    Display(f"rec %0d {name} %x", self.cycle, value)
+                )
+            ]
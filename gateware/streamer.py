@@ -0,0 +1,109 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect.csr_eventmanager import *
+
+from litedram.frontend.dma import LiteDRAMDMAReader
+
+# Capture Streamer ---------------------------------------------------------------------------------
+
+class CaptureStreamer(LiteXModule):
+    """Streams a region of a circular DRAM buffer to a byte stream (the UART TX) without the CPU.
+
+    `length` bytes are sent starting at byte `first` of the buffer of `size` bytes at `base` (byte
+    offsets from the start of the DRAM, `base` and `size` multiples of the DRAM word), wrapping to
+    `base` at the end of the buffer, in memory order. `busy` is high from `start` until the last
+    byte has been accepted by `source`, then the `done` event is raised.
+    """
+    def __init__(self, port, fifo_depth=32):
+        self.source = source = stream.Endpoint([("data", 8)])
+        self.busy   = Signal()
+
+        self._control = CSRStorage(fields=[
+            CSRField("start", size=1, offset=0, pulse=True, description="Start streaming."),
+        ])
+        self._base   = CSRStorage(32, description="Buffer base (bytes from DRAM start, word aligned).")
+        self._size   = CSRStorage(32, description="Buffer size (bytes, multiple of the DRAM word).")
+        self._first  = CSRStorage(32, description="First byte to send (offset in the buffer).")
+        self._length = CSRStorage(32, description="Bytes to send.")
+        self._status = CSRStatus(fields=[
+            CSRField("busy", size=1, offset=0, description="Streaming in progress."),
+        ])
+
+        self.ev = EventManager()
+        self.ev.done = EventSourcePulse(description="Last byte sent.")
+        self.ev.finalize()
+
+        # # #
+
+        wbytes = port.data_width//8
+        shift  = log2_int(wbytes)
+
+        # DRAM reader and words -> bytes (first byte in the LSBs).
+        self.dma = dma = LiteDRAMDMAReader(port, fifo_depth=fifo_depth, fifo_buffered=True)
+        self.converter = converter = stream.Converter(port.data_width, 8)
+        self.comb += dma.source.connect(converter.sink)
+
+        # Words to read: from the word holding `first` to the one holding the last byte.
+        skip  = Signal(shift)
+        words = Signal(32)
+        self.comb += [
+            skip.eq(self._first.storage[:shift]),
+            words.eq((self._length.storage + skip + wbytes - 1) >> shift),
+        ]
+
+        # Address generation, wrapping at the end of the buffer.
+        offset  = Signal(32 - shift)
+        fetched = Signal(32)
+        self.comb += [
+            dma.sink.valid.eq(self.busy & (fetched != words)),
+            dma.sink.address.eq(self._base.storage[shift:] + offset),
+        ]
+        self.sync += [
+            If(self._control.fields.start,
+                offset.eq(self._first.storage[shift:]),
+                fetched.eq(0),
+            ).Elif(dma.sink.valid & dma.sink.ready,
+                offset.eq(offset + 1),
+                If(offset == ((self._size.storage >> shift) - 1),
+                    offset.eq(0)
+                ),
+                fetched.eq(fetched + 1),
+            )
+        ]
+
+        # Bytes: drop the ones before `first` and after the last one.
+        index = Signal(32 + shift)
+        keep  = Signal()
+        self.comb += [
+            keep.eq((index >= skip) & (index < (self._length.storage + skip))),
+            source.valid.eq(converter.source.valid & keep),
+            source.data.eq(converter.source.data),
+            converter.source.ready.eq(~keep | source.ready),
+        ]
+        self.sync += [
+            If(self._control.fields.start,
+                index.eq(0),
+                self.busy.eq(self._length.storage != 0),
+            ).Elif(converter.source.valid & converter.source.ready,
+                index.eq(index + 1),
+                If(index == ((words << shift) - 1),
+                    self.busy.eq(0)
+                )
+            )
+        ]
+        busy_d = Signal()
+        self.sync += busy_d.eq(self.busy)
+        self.comb += [
+            self._status.fields.busy.eq(self.busy),
+            self.ev.done.trigger.eq(busy_d & ~self.busy),
+        ]
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from functools import reduce
+from operator import or_
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import *
+
+# Logic Trigger ------------------------------------------------------------------------------------
+
+TRIGGER_MODE_EDGE      = 0
+TRIGGER_MODE_PATTERN   = 1
+TRIGGER_MODE_QUALIFIED = 2
+
+class LogicTrigger(LiteXModule):
+    """Edge/pattern trigger for logic channels.
+
+    - Edge: any channel of `rising` (resp. `falling`) seeing a rising (resp. falling) edge.
+    - Pattern: `data` entering the `mask`/`value` pattern.
+    - Qualified: an edge while the pattern matches.
+
+    Triggers closer than `holdoff` cycles to the previous one are ignored. `trigger` is a
+    one-cycle strobe, `latency` (2) cycles after the sample that caused it.
+
+    With `lanes` > 1 (oversampled inputs) `data` holds `lanes` consecutive samples per cycle
+    (oldest in the LSBs), edges and pattern entries are detected between all of them.
+    """
+    latency = 2
+
+    def __init__(self, data_width=16, lanes=1):
+        self.data    = Signal(data_width*lanes)
+        self.trigger = Signal()
+
+        self._control = CSRStorage(fields=[
+            CSRField("enable", size=1, offset=0, description="Enable the trigger."),
+            CSRField("mode",   size=2, offset=1, values=[
+                ("``0b00``", "Edge."),
+                ("``0b01``", "Pattern."),
+                ("``0b10``", "Edge qualified by pattern."),
+            ]),
+        ])
+        self._rising  = CSRStorage(data_width, description="Channels triggering on a rising edge.")
+        self._falling = CSRStorage(data_width, description="Channels triggering on a falling edge.")
+        self._mask    = CSRStorage(data_width, description="Pattern: channels compared.")
+        self._value   = CSRStorage(data_width, description="Pattern: expected level of the compared channels.")
+        self._holdoff = CSRStorage(32, description="Minimum cycles between two triggers.")
+        self._count   = CSRStatus(32, description="Triggers since last enable.")
+
+        # # #
+
+        enable = self._control.fields.enable
+        mode   = self._control.fields.mode
+
+        # Stage 1: edges / pattern, of each sample against the previous one.
+        samples   = [self.data[k*data_width:(k + 1)*data_width] for k in range(lanes)]
+        data_d    = Signal(data_width)
+        match_d   = Signal()
+        edges     = []
+        matches   = []
+        previous  = data_d
+        for sample in samples:
+            edges.append(((sample & ~previous & self._rising.storage) |
+                          (~sample & previous & self._falling.storage)) != 0)
+            matches.append(((sample ^ self._value.storage) & self._mask.storage) == 0)
+            previous = sample
+        edge      = Signal()
+        entered   = Signal()
+        qualified = Signal()
+        self.sync += [
+            data_d.eq(samples[-1]),
+            match_d.eq(matches[-1]),
+            edge.eq(reduce(or_, edges)),
+            entered.eq(reduce(or_, [m & ~m_d for m_d, m in zip([match_d] + matches, matches)])),
+            qualified.eq(reduce(or_, [e & m for e, m in zip(edges, matches)])),
+        ]
+
+        # Stage 2: mode / holdoff.
+        hit     = Signal()
+        holdoff = Signal(32)
+        self.comb += Case(mode, {
+            TRIGGER_MODE_EDGE      : hit.eq(edge),
+            TRIGGER_MODE_PATTERN   : hit.eq(entered),
+            TRIGGER_MODE_QUALIFIED : hit.eq(qualified),
+            "default"              : hit.eq(0),
+        })
+        self.sync += [
+            self.trigger.eq(0),
+            If(holdoff != 0,
+                holdoff.eq(holdoff - 1)
+            ),
+            If(~enable,
+                holdoff.eq(0),
+                self._count.status.eq(0),
+            ).Elif(hit & (holdoff == 0),
+                self.trigger.eq(1),
+                holdoff.eq(self._holdoff.storage),
+                self._count.status.eq(self._count.status + 1),
+            )
+        ]
+
+# Trigger Marker -----------------------------------------------------------------------------------
+
+class TriggerMarker(LiteXModule):
+    """Trigger strobe carried in the record stream.
+
+    `source` is `sink` with a `trigger` field flagging the record passed on the `trigger` cycle (or
+    the next one passed), so the trigger stays with its record through the FIFOs and clock domain
+    crossing between the encoder and the capture. The records of a sample must reach `sink`
+    `LogicTrigger.latency` cycles after it, as its trigger strobe.
+    """
+    def __init__(self, description):
+        self.trigger = Signal()
+        self.sink    = sink   = stream.Endpoint(description)
+        self.source  = source = stream.Endpoint([*sink.description.payload_layout, ("trigger", 1)])
+
+        # # #
+
+        pending = Signal()
+        self.comb += [
+            sink.connect(source),
+            source.trigger.eq(self.trigger | pending),
+        ]
+        self.sync += If(source.valid & source.ready,
+            pending.eq(0)
+        ).Elif(self.trigger,
+            pending.eq(1)
+        )
+
+# Latency Testbench --------------------------------------------------------------------------------
+
+class _TriggerBench(Module):
+    """Synchronizer -> decimator -> encoder -> trigger marker -> capture chain of scopy.BaseSoC
+    (trigger on the synchronized samples), on an always ready DRAM port."""
+    def __init__(self):
+        from migen.genlib.cdc import MultiReg
+        from litedram.common import LiteDRAMNativePort
+        from gateware.compress import TransitionEncoder
+        from gateware.decimate import Decimator
+        from gateware.capture import LogicCapture
+
+        self.pads = Signal(16)
+        self.port = port = LiteDRAMNativePort("write", address_width=24, data_width=64)
+        sample = Signal(16)
+        self.specials += MultiReg(self.pads, sample)
+        self.submodules.trigger   = LogicTrigger()
+        self.submodules.decimator = Decimator()
+        self.submodules.encoder   = TransitionEncoder()
+        self.submodules.marker    = TriggerMarker(self.encoder.source.description)
+        self.submodules.capture   = LogicCapture(port, data_width=32, fifo_depth=16,
+            default_length=0x1000)
+        assert self.decimator.latency + self.encoder.latency == self.trigger.latency
+        records = self.marker.source
+        self.comb += [
+            port.cmd.ready.eq(1),
+            port.wdata.ready.eq(1),
+            self.trigger.data.eq(sample),
+            self.decimator.sink.valid.eq(1),
+            self.decimator.sink.data.eq(sample),
+            self.decimator.source.connect(self.encoder.sink),
+            self.encoder.source.connect(self.marker.sink),
+            self.marker.trigger.eq(self.trigger.trigger),
+            records.connect(self.capture.sink, omit={"trigger"}),
+            self.capture.trigger.eq(records.valid & records.ready & records.trigger),
+        ]
+
+def latency_testbench(channel=3):
+    """Measure pad edge -> trigger strobe -> capture triggered latencies (in sys cycles), with a
+    one sample pulse: the stored record at `trigger_index` must be its rising edge."""
+    dut     = _TriggerBench()
+    results = {}
+    stored  = []
+
+    def generator():
+        yield dut.trigger._control.fields.enable.eq(1)
+        yield dut.trigger._control.fields.mode.eq(TRIGGER_MODE_EDGE)
+        yield dut.trigger._rising.storage.eq(1 << channel)
+        yield dut.capture._post.storage.eq(16)
+        yield dut.capture._control.fields.arm.eq(1)
+        yield
+        yield dut.capture._control.fields.arm.eq(0)
+        for i in range(16):
+            yield
+        yield dut.pads.eq(1 << channel)
+        for cycle in range(64):
+            yield
+            yield dut.pads.eq(0)
+            if "trigger" not in results and (yield dut.trigger.trigger):
+                results["trigger"] = cycle
+            if "capture" not in results and (yield dut.capture._status.fields.triggered):
+                results["capture"] = cycle
+        results["trigger_index"] = (yield dut.capture._trigger_index.status)
+
+    @passive
+    def monitor():
+        while True:
+            if (yield dut.capture.stored):
+                stored.append((yield dut.capture.sink.data))
+            yield
+
+    run_simulation(dut, [generator(), monitor()])
+    index = results["trigger_index"]
+    assert (stored[index] >> channel) & 1, "trigger_index is not the rising edge record"
+    assert index == 0 or not (stored[index - 1] >> channel) & 1
+    return results
+
+if __name__ == "__main__":
+    results = latency_testbench()
+    print(f"Pad edge -> trigger strobe      : {results['trigger']} cycles.")
+    print(f"Pad edge -> capture triggered   : {results['capture']} cycles.")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""AWG waveform upload (gateware/awg.py, firmware/awg.c).
+
+Waveforms are stored in the DDR3 AWG buffer as 16-bit little endian samples, DAC code (offset
+binary) in the 14 LSBs. Two transports, both taking NumPy arrays directly:
+
+- Serial: `:SOUR:ARB:UPL` framed binary upload. Each block carries its offset and a CRC32 checked
+  by the firmware, `window` blocks are kept in flight and NAKed blocks are resent. Throughput is
+  bounded by the console baudrate.
+- Etherbone: blocks are written straight into DDR3 in windowed bursts (see host/etherbone.py),
+  then read back and checked against their CRC32, mismatching blocks are rewritten. This is the
+  path for multi-megabyte waveforms.
+
+    python3 -m host.awg --port /dev/ttyUSB1 wave.npy --play
+    python3 -m host.awg --host 192.168.1.50 --csr-csv csr.csv wave.npy
+"""
+
+import time
+import zlib
+import struct
+import argparse
+
+import numpy as np
+
+DAC_BITS     = 14
+WORD_BYTES   = 16 # DRAM word, loops are word aligned.
+UPLOAD_MAGIC = 0x42475741 # "AWGB"
+UPLOAD_BLOCK = 4096       # Max payload per serial frame (firmware/awg.c).
+
+_FRAME_HEADER = struct.Struct("<IIII")
+
+# Samples ------------------------------------------------------------------------------------------
+
+def waveform_bytes(samples, word_bytes=WORD_BYTES):
+    """AWG buffer bytes of `samples`: integer arrays are DAC codes, float arrays are scaled from
+    [-1.0, 1.0] to the DAC range. Padded to whole DRAM words with the last sample."""
+    samples = np.asarray(samples)
+    if samples.dtype.kind == "f":
+        full    = 2**(DAC_BITS - 1)
+        samples = np.clip(np.rint(samples*(full - 1) + full), 0, 2**DAC_BITS - 1)
+    samples = samples.astype("<u2") & (2**DAC_BITS - 1)
+    pad     = -len(samples) % (word_bytes//2)
+    if pad and len(samples):
+        samples = np.concatenate((samples, np.full(pad, samples[-1], "<u2")))
+    return samples.tobytes()
+
+def _blocks(data, block):
+    return [(offset, data[offset:offset + block]) for offset in range(0, len(data), block)]
+
+# Serial -------------------------------------------------------------------------------------------
+
+def frame(offset, payload):
+    return _FRAME_HEADER.pack(UPLOAD_MAGIC, offset, len(payload), zlib.crc32(payload)) + payload
+
+def upload_serial(scpi, samples, offset=0, window=4, retries=4):
+    """Upload `samples` at byte `offset` of the AWG buffer through `scpi` (host.scpi.SCPISerial).
+    Returns the number of bytes uploaded."""
+    data    = waveform_bytes(samples)
+    blocks  = {offset + o: payload for o, payload in _blocks(data, UPLOAD_BLOCK)}
+    todo    = sorted(blocks)[::-1]
+    tries   = dict.fromkeys(blocks, 0)
+    pending = set()
+
+    scpi.write(":SOUR:ARB:UPL")
+    while todo or pending:
+        while todo and len(pending) < window:
+            base = todo.pop()
+            scpi.port.write(frame(base, blocks[base]))
+            pending.add(base)
+        status, _, base = scpi.readline().partition(" ")
+        if status == "ERR":
+            raise IOError("Upload aborted by the firmware (bad frame header).")
+        base = int(base)
+        pending.discard(base)
+        if status == "NAK":
+            tries[base] += 1
+            if tries[base] > retries:
+                raise IOError(f"Block @ 0x{base:08x}: CRC mismatch.")
+            todo.append(base)
+    scpi.port.write(_FRAME_HEADER.pack(UPLOAD_MAGIC, 0, 0, 0))
+    status, _, total = scpi.readline().partition(" ")
+    if status != "END" or int(total) != len(data):
+        raise IOError(f"Upload incomplete ({status} {total}).")
+    return len(data)
+
+def play_serial(scpi, offset, length, cycles=0):
+    """Loop `length` bytes uploaded at `offset`, `cycles` times (0: forever)."""
+    scpi.write(f":SOUR:ARB:STAR {offset}")
+    scpi.write(f":SOUR:ARB:LOOP {offset},{offset + length}")
+    scpi.write(f":SOUR:ARB:NCYC {cycles}")
+    scpi.write(":SOUR:FUNC ARB")
+    scpi.write(":OUTP ON")
+
+# Etherbone ----------------------------------------------------------------------------------------
+
+def upload_etherbone(client, csr_csv, samples, offset=0, block=1 << 16, verify=True, retries=4):
+    """Upload `samples` at byte `offset` of the AWG buffer through `client`
+    (host.etherbone.EtherboneClient). Returns the number of bytes uploaded.
+
+    The AWG flushes the L2 cache when started from the firmware (`:OUTP ON`).
+    """
+    from host.etherbone import load_csr_csv
+    _, regions, constants = load_csr_csv(csr_csv)
+    base = regions["main_ram"] + int(constants["awg_buffer_base"])
+    data = waveform_bytes(samples, int(constants["awg_word_bytes"]))
+    if offset + len(data) > int(constants["awg_buffer_length"]):
+        raise ValueError("Waveform does not fit in the AWG buffer.")
+    for o, payload in _blocks(data, block):
+        addr = base + offset + o
+        for _ in range(retries + 1):
+            client.write(addr, payload)
+            if not verify or zlib.crc32(client.read(addr, len(payload))) == zlib.crc32(payload):
+                break
+        else:
+            raise IOError(f"Block @ 0x{offset + o:08x}: CRC mismatch.")
+    return len(data)
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="LycheeMSO AWG waveform upload.")
+    parser.add_argument("waveform",                                 help="Waveform (.npy, or raw 16-bit LE samples).")
+    parser.add_argument("--offset",   default="0",                  help="Byte offset in the AWG buffer.")
+    parser.add_argument("--port",     default=None,                 help="Serial port (framed upload).")
+    parser.add_argument("--baudrate", default=115200, type=int,     help="Serial baudrate.")
+    parser.add_argument("--window",   default=4,      type=int,     help="Blocks in flight (serial).")
+    parser.add_argument("--host",     default=None,                 help="Board IP address (Etherbone upload).")
+    parser.add_argument("--csr-csv",  default="csr.csv",            help="CSR map (Etherbone upload).")
+    parser.add_argument("--play",     action="store_true",          help="Loop the waveform (serial).")
+    args = parser.parse_args()
+
+    if args.waveform.endswith(".npy"):
+        samples = np.load(args.waveform)
+    else:
+        samples = np.fromfile(args.waveform, dtype="<u2")
+    offset = int(args.offset, 0)
+
+    start = time.perf_counter()
+    if args.host is not None:
+        from host.etherbone import EtherboneClient
+        client = EtherboneClient(args.host)
+        length = upload_etherbone(client, args.csr_csv, samples, offset)
+        client.close()
+    else:
+        from host.scpi import SCPISerial
+        scpi   = SCPISerial(args.port or "/dev/ttyUSB1", args.baudrate)
+        length = upload_serial(scpi, samples, offset, window=args.window)
+        if args.play:
+            play_serial(scpi, offset, length)
+        scpi.close()
+    duration = time.perf_counter() - start
+    print(f"Uploaded {length} bytes in {duration:.3f}s ({length/duration/1e6:.2f} MB/s).")
+
+if __name__ == "__main__":
+    main()
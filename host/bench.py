@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Acquire -> transfer -> decode benchmark of the host tooling.
+
+Runs full capture cycles (`:SING`, `:TRIG:STAT?` until stopped, `WAV:PRE?`, `WAV:DATA?`, record
+parsing) through host.scpi against the pty fake instrument (host/fake.py) or a real board, for
+each combination of capture depth and baudrate, and reports waveforms/s, bytes/s, parse time and
+memory per capture.
+
+    python3 -m host.bench --points 1000 100000 --baudrate 115200 1000000 --latency 0.001
+    python3 -m host.bench --port /dev/ttyUSB1 --points 1000
+"""
+
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+
+from host.scpi import SCPISerial, read_block, block_to_array
+from host.transitions import split, timestamps
+
+# Capture Cycle ------------------------------------------------------------------------------------
+
+def parse(data):
+    """Host side of a capture: records -> (timestamps, states)."""
+    records   = block_to_array(data)
+    _, states = split(records)
+    return timestamps(records), states
+
+def acquire(scpi, poll=0.0):
+    """One capture cycle, returns `(block, transfer time, parse time)`."""
+    scpi.write(":SING")
+    while scpi.query(":TRIG:STAT?") != "STOP":
+        time.sleep(poll)
+    scpi.preamble()
+    start = time.perf_counter()
+    scpi.write("WAV:DATA?")
+    data  = read_block(scpi.port)
+    transfer = time.perf_counter() - start
+    start = time.perf_counter()
+    parse(data)
+    return data, transfer, time.perf_counter() - start
+
+def parse_memory(data):
+    """Peak memory (bytes) allocated while parsing a capture."""
+    tracemalloc.start()
+    parse(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def run(scpi, points, captures):
+    """Benchmark `captures` cycles of `points` records, returns a dict of results."""
+    scpi.write(f":ACQ:MDEP {points}")
+    transfers, parses, nbytes = [], [], 0
+    start = time.perf_counter()
+    for _ in range(captures):
+        data, transfer, parse_time = acquire(scpi)
+        transfers.append(transfer)
+        parses.append(parse_time)
+        nbytes += len(data)
+    duration = time.perf_counter() - start
+    return {
+        "points"      : points,
+        "waveforms/s" : captures/duration,
+        "bytes/s"     : nbytes/sum(transfers),
+        "parse (ms)"  : 1e3*float(np.median(parses)),
+        "memory (kB)" : parse_memory(data)/1e3,
+    }
+
+def format_results(results):
+    columns = ["baudrate", "points", "waveforms/s", "bytes/s", "parse (ms)", "memory (kB)"]
+    lines   = ["".join(f"{c:>14}" for c in columns)]
+    for r in results:
+        lines.append("".join(f"{r[c]:>14.6g}" if isinstance(r[c], float) else f"{r[c]:>14}"
+            for c in columns))
+    return "\n".join(lines)
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="LycheeMSO host tooling benchmark.")
+    parser.add_argument("--port",        default=None,                        help="Serial port (default: fake instrument).")
+    parser.add_argument("--baudrate",    default=[115200], type=int, nargs="+", help="Baudrate(s).")
+    parser.add_argument("--points",      default=[1000],   type=int, nargs="+", help="Records per capture.")
+    parser.add_argument("--captures",    default=10,       type=int,          help="Captures per run.")
+    parser.add_argument("--latency",     default=0.0,      type=float,        help="Fake instrument command latency (s).")
+    parser.add_argument("--acquisition", default=0.0,      type=float,        help="Fake instrument acquisition time (s).")
+    args = parser.parse_args()
+
+    results = []
+    for baudrate in args.baudrate:
+        fake = None
+        port = args.port
+        if port is None:
+            from host.fake import FakeInstrument
+            fake = FakeInstrument(baudrate, args.latency, args.acquisition)
+            port = fake.port
+        scpi = SCPISerial(port, baudrate)
+        for points in args.points:
+            results.append({"baudrate": baudrate, **run(scpi, points, args.captures)})
+        scpi.close()
+        if fake is not None:
+            fake.close()
+    print(format_results(results))
+
+if __name__ == "__main__":
+    main()
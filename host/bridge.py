@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""SCPI raw-socket (port 5025) bridge to the firmware serial console.
+
+The bridge owns the serial port and serves any number of TCP clients:
+- Commands from all clients are queued and pipelined on the serial link (bounded by the number of
+  bytes the firmware can buffer while busy).
+- Identical queries in flight are sent once and the answer is shared.
+- Idempotent queries (*IDN?, preamble, settings, waveform data) are cached until a command changes
+  the instrument state or a new acquisition is started.
+
+The console echoes each command before answering, the echo is used to frame (and resynchronize)
+responses, so stray output like "Error!" never shifts answers between clients. A serial error (ex
+port unplugged) fails the pending requests and stops the bridge.
+
+    python3 -m host.bridge --port /dev/ttyUSB1
+"""
+
+import asyncio
+import argparse
+import collections
+import logging
+
+logger = logging.getLogger("bridge")
+
+# Commands -----------------------------------------------------------------------------------------
+
+# Headers are compared normalized (see normalize): upper case, queries ending with Q.
+
+# Queries whose answer only changes when the instrument is reconfigured.
+CACHEABLE = {
+    "*IDNQ",
+    "WAV:PREQ",
+    "WAV:DATAQ",
+    ":ACQ:MDEPQ",
+    ":ACQ:SEGMQ",
+    ":ACQ:DECQ",
+    ":ACQ:CLKDQ",
+    ":ACQ:TYPEQ",
+    ":ACQ:SRATQ",
+    "WAV:SEGMQ",
+    "WAV:SEGM:COUNQ",
+    "WAV:SEGM:TIMQ",
+    ":TRIG:MODEQ",
+    ":TRIG:EDGE:SOURQ",
+    ":TRIG:EDGE:SLOPEQ",
+    ":TRIG:EDGE:LEVQ",
+    ":TRIG:PATT:PATTQ",
+    ":TRIG:HOLDQ",
+    ":SOUR:FUNCQ",
+    ":SOUR:FREQQ",
+    ":SOUR:AMPLQ",
+    ":SOUR:OFFSQ",
+    ":SOUR:ARB:NCYCQ",
+}
+# Cached forever.
+STATIC = {"*IDNQ"}
+# Only cacheable once the acquisition is stopped.
+ACQUISITION = {"WAV:PREQ", "WAV:DATAQ", "WAV:SEGM:COUNQ", "WAV:SEGM:TIMQ"}
+# Commands starting an acquisition.
+ACQUIRE = {":SING", ":RUN"}
+# Queries answered with an IEEE-488.2 binary block.
+BLOCK = {"WAV:DATAQ", ":DEC:DATAQ"}
+
+def header(cmd):
+    return cmd.split(" ", 1)[0]
+
+def normalize(cmd):
+    """`cmd` as looked up by the firmware (firmware/scpi.c): header in upper case with "?" turned
+    into Q, arguments separated by single spaces. Used to classify commands and as cache key."""
+    head, *args = cmd.split()
+    return " ".join([head.upper().replace("?", "Q"), *args])
+
+def response_kind(cmd):
+    """Expected answer: "block", "line" or None (the console uses both "?" and "Q" for queries)."""
+    key  = normalize(cmd)
+    head = header(key)
+    if head in BLOCK:
+        return "block"
+    if header(cmd).endswith("?") or (head.endswith("Q") and head == key):
+        return "line"
+    return None
+
+# Serial Link --------------------------------------------------------------------------------------
+
+class SerialLink:
+    """Pipelined request/response transport over the serial console."""
+    def __init__(self, port, baudrate=115200, max_inflight=64, timeout=2.0, echo=True):
+        import serial
+        self.serial       = serial.Serial(port, baudrate, timeout=0)
+        self.baudrate     = baudrate
+        self.max_inflight = max_inflight
+        self.timeout      = timeout
+        self.echo         = echo
+        self.reader       = asyncio.StreamReader(limit=2**20)
+        self.queue        = asyncio.Queue()
+        self.inflight     = collections.deque()
+        self.space        = asyncio.Condition()
+        self.error        = None
+        self.closed       = asyncio.Event()
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self.serial.fileno(), self._on_readable)
+        self.tasks = [
+            asyncio.create_task(self._writer()),
+            asyncio.create_task(self._reader()),
+        ]
+
+    def _on_readable(self):
+        try:
+            data = self.serial.read(self.serial.in_waiting or 1)
+        except OSError as e: # Port unplugged (EIO): readable forever.
+            self.close(e)
+            return
+        if data:
+            self.reader.feed_data(data)
+
+    def close(self, error):
+        """Stop on a serial error, failing requests in flight, queued and to come with it."""
+        if self.error is not None:
+            return
+        logger.error("Serial link closed: %s", error)
+        self.error = ConnectionError(f"Serial link closed ({error}).")
+        asyncio.get_running_loop().remove_reader(self.serial.fileno())
+        self.serial.close()
+        for task in self.tasks:
+            task.cancel()
+        futures = [future for _, future in self.inflight]
+        while not self.queue.empty():
+            futures.append(self.queue.get_nowait()[1])
+        self.inflight.clear()
+        for future in futures:
+            if not future.done():
+                future.set_exception(self.error)
+        self.closed.set()
+
+    def request(self, cmd):
+        future = asyncio.get_running_loop().create_future()
+        if self.error is not None:
+            future.set_exception(self.error)
+        else:
+            self.queue.put_nowait((cmd, future))
+        return future
+
+    def _inflight_bytes(self):
+        return sum(len(cmd) + 1 for cmd, _ in self.inflight)
+
+    async def _writer(self):
+        while True:
+            cmd, future = await self.queue.get()
+            async with self.space:
+                await self.space.wait_for(lambda: not self.inflight or
+                    self._inflight_bytes() + len(cmd) + 1 <= self.max_inflight)
+                self.inflight.append((cmd, future))
+                self.space.notify_all()
+            try:
+                self.serial.write(cmd.encode() + b"\n")
+            except OSError as e:
+                self.close(e)
+
+    async def _read(self, coro, nbytes=0):
+        # Allow 2x the line time for the payload on top of the base timeout.
+        timeout = self.timeout + 2*nbytes*10/self.baudrate
+        return await asyncio.wait_for(coro, timeout)
+
+    async def _readline(self):
+        line = await self._read(self.reader.readuntil(b"\n"))
+        return line.decode(errors="replace").strip("\r\n")
+
+    async def _read_block(self):
+        await self._read(self.reader.readuntil(b"#"))
+        ndigits = await self._read(self.reader.readexactly(1))
+        length  = await self._read(self.reader.readexactly(int(ndigits)))
+        data    = await self._read(self.reader.readexactly(int(length)), int(length))
+        await self._read(self.reader.readexactly(1))
+        return b"#" + ndigits + length + data + b"\n"
+
+    async def _reader(self):
+        while True:
+            async with self.space:
+                await self.space.wait_for(lambda: self.inflight)
+                cmd, future = self.inflight[0]
+            try:
+                # Skip stray output (ex "Error!" of a previous command) up to our echo.
+                while self.echo:
+                    line = await self._readline()
+                    if line == cmd:
+                        break
+                    logger.warning("Unexpected console output: %r", line)
+                kind = response_kind(cmd)
+                if kind == "block":
+                    result = await self._read_block()
+                elif kind == "line":
+                    result = await self._readline()
+                else:
+                    result = None
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                result = e
+            async with self.space:
+                self.inflight.popleft()
+                self.space.notify_all()
+            if not future.done():
+                if isinstance(result, Exception):
+                    future.set_exception(TimeoutError(f"{cmd}: no response ({result!r})."))
+                else:
+                    future.set_result(result)
+
+# Bridge -------------------------------------------------------------------------------------------
+
+class Bridge:
+    def __init__(self, link):
+        self.link      = link
+        self.cache     = {}
+        self.pending   = {}
+        self.acquiring = False
+        # Bumped when the instrument state may change: answers of queries sent before are neither
+        # cached nor shared with later queries.
+        self.generation = 0
+
+    def _invalidate(self):
+        self.generation += 1
+        self.cache   = {k: v for k, v in self.cache.items() if k in STATIC}
+        self.pending = {}
+
+    async def execute(self, cmd):
+        key  = normalize(cmd)
+        head = header(key)
+        kind = response_kind(cmd)
+
+        # Settings / acquisition control.
+        if kind is None:
+            self._invalidate()
+            if head in ACQUIRE:
+                self.generation += 1
+                self.acquiring   = True
+            return await self.link.request(cmd)
+
+        # Queries: cache, then coalesce identical requests in flight.
+        cacheable  = key in CACHEABLE and not (self.acquiring and key in ACQUISITION)
+        generation = self.generation
+        if cacheable and key in self.cache:
+            return self.cache[key]
+        if key not in self.pending:
+            self.pending[key] = self.link.request(cmd)
+        future = self.pending[key]
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            if self.pending.get(key) is future:
+                del self.pending[key]
+        if generation != self.generation:
+            return result
+        if head == ":TRIG:STATQ" and result == "STOP":
+            self.acquiring = False
+        if cacheable:
+            self.cache[key] = result
+        return result
+
+    async def handle_client(self, reader, writer):
+        peer      = writer.get_extra_info("peername")
+        responses = asyncio.Queue()
+        logger.info("Client %s connected.", peer)
+
+        async def respond():
+            while True:
+                task = await responses.get()
+                if task is None:
+                    break
+                try:
+                    result = await task
+                except Exception as e:
+                    logger.warning("%s", e)
+                    continue
+                if result is None:
+                    continue
+                writer.write(result if isinstance(result, bytes) else result.encode() + b"\n")
+                await writer.drain()
+
+        responder = asyncio.create_task(respond())
+        try:
+            while line := await reader.readline():
+                cmd = line.decode(errors="replace").strip()
+                if cmd:
+                    responses.put_nowait(asyncio.ensure_future(self.execute(cmd)))
+        except ConnectionError:
+            pass
+        finally:
+            responses.put_nowait(None)
+            await responder
+            writer.close()
+            logger.info("Client %s disconnected.", peer)
+
+# Run ----------------------------------------------------------------------------------------------
+
+async def serve(args):
+    link = SerialLink(args.port, args.baudrate, max_inflight=args.max_inflight, echo=not args.no_echo)
+    await link.start()
+    bridge = Bridge(link)
+    server = await asyncio.start_server(bridge.handle_client, args.bind, args.tcp_port)
+    logger.info("Serving %s on %s:%d.", args.port, args.bind, args.tcp_port)
+    async with server:
+        await link.closed.wait()
+    raise SystemExit(f"{args.port}: {link.error}")
+
+def main():
+    parser = argparse.ArgumentParser(description="LycheeMSO SCPI raw-socket bridge.")
+    parser.add_argument("--port",         default="/dev/ttyUSB1", help="Serial port.")
+    parser.add_argument("--baudrate",     default=115200, type=int, help="Serial baudrate.")
+    parser.add_argument("--bind",         default="0.0.0.0",      help="TCP bind address.")
+    parser.add_argument("--tcp-port",     default=5025, type=int, help="TCP port.")
+    parser.add_argument("--max-inflight", default=64,   type=int, help="Max command bytes sent ahead of the firmware.")
+    parser.add_argument("--no-echo",      action="store_true",    help="Console does not echo commands.")
+    parser.add_argument("--verbose",      action="store_true",    help="Log client connections.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    asyncio.run(serve(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Pipelined Etherbone client for bulk readout of the DDR3 capture buffer (and bulk writes, ex
+AWG waveforms).
+
+Reads are split in bursts of up to 255 words (one Etherbone record per UDP packet) and up to
+`window` bursts are kept in flight. Each burst uses its start address as return address, so
+responses are matched without any per-request state on the device and lost packets are simply
+re-requested. Write bursts read back their last word the same way, which acknowledges them.
+
+`EtherboneLoopback` is a UDP stand-in for the SoC that serves reads/writes from host memory, it
+allows measuring the host side throughput without a board:
+
+    python3 -m host.etherbone --loopback --length 0x1000000
+"""
+
+import csv
+import time
+import socket
+import struct
+import argparse
+import threading
+
+import numpy as np
+
+ETHERBONE_MAGIC   = 0x4e6f
+ETHERBONE_VERSION = 1
+ETHERBONE_PORT    = 1234
+MAX_BURST         = 255
+
+_PACKET_HEADER = struct.Struct(">HBBxxxx")
+_RECORD_HEADER = struct.Struct(">BBBB")
+
+# Packets ------------------------------------------------------------------------------------------
+
+def encode_record(wbase=0, wdata=(), rbase=0, raddrs=()):
+    """Encode an Etherbone packet holding a single record (32-bit address/port)."""
+    wdata  = np.asarray(wdata,  dtype=">u4")
+    raddrs = np.asarray(raddrs, dtype=">u4")
+    assert len(wdata) <= MAX_BURST and len(raddrs) <= MAX_BURST
+    packet = bytearray(_PACKET_HEADER.pack(ETHERBONE_MAGIC, ETHERBONE_VERSION << 4, 0x44))
+    packet += _RECORD_HEADER.pack(0, 0x0f, len(wdata), len(raddrs))
+    if len(wdata):
+        packet += struct.pack(">I", wbase) + wdata.tobytes()
+    if len(raddrs):
+        packet += struct.pack(">I", rbase) + raddrs.tobytes()
+    return bytes(packet)
+
+def decode_records(packet):
+    """Decode an Etherbone packet into `[(wbase, wdata, rbase, raddrs), ...]` (arrays of >u4)."""
+    magic, flags, sizes = _PACKET_HEADER.unpack_from(packet)
+    if magic != ETHERBONE_MAGIC:
+        raise ValueError(f"Not an Etherbone packet (magic 0x{magic:04x}).")
+    records = []
+    offset  = _PACKET_HEADER.size
+    while offset + _RECORD_HEADER.size <= len(packet):
+        _, _, wcount, rcount = _RECORD_HEADER.unpack_from(packet, offset)
+        offset += _RECORD_HEADER.size
+        wbase, wdata, rbase, raddrs = 0, np.zeros(0, ">u4"), 0, np.zeros(0, ">u4")
+        if wcount:
+            wbase  = struct.unpack_from(">I", packet, offset)[0]
+            wdata  = np.frombuffer(packet, ">u4", wcount, offset + 4)
+            offset += 4*(wcount + 1)
+        if rcount:
+            rbase  = struct.unpack_from(">I", packet, offset)[0]
+            raddrs = np.frombuffer(packet, ">u4", rcount, offset + 4)
+            offset += 4*(rcount + 1)
+        records.append((wbase, wdata, rbase, raddrs))
+    return records
+
+# CSR map ------------------------------------------------------------------------------------------
+
+def load_csr_csv(filename):
+    """Return `(registers, regions, constants)` dicts from a LiteX csr.csv."""
+    registers, regions, constants = {}, {}, {}
+    with open(filename) as f:
+        for row in csv.reader(l for l in f if not l.startswith("#")):
+            kind, name, value = row[0], row[1], row[2]
+            if kind == "csr_register":
+                registers[name] = int(value, 0)
+            elif kind == "memory_region":
+                regions[name] = int(value, 0)
+            elif kind == "constant":
+                constants[name] = value
+    return registers, regions, constants
+
+# Client -------------------------------------------------------------------------------------------
+
+class EtherboneClient:
+    def __init__(self, host="192.168.1.50", port=ETHERBONE_PORT, burst=MAX_BURST, window=8,
+        timeout=0.1, retries=10):
+        assert 1 <= burst <= MAX_BURST
+        self.addr    = (host, port)
+        self.burst   = burst
+        self.window  = window
+        self.timeout = timeout
+        self.retries = retries
+        self.sock    = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4*1024*1024)
+        self.sock.settimeout(timeout)
+
+    def close(self):
+        self.sock.close()
+
+    def read32(self, addr):
+        return int(self.read_words(addr, 1)[0])
+
+    def write32(self, addr, value):
+        self.sock.sendto(encode_record(wbase=addr, wdata=[value]), self.addr)
+
+    def _pipeline(self, bursts, packet, complete):
+        """Keep up to `window` bursts in flight and resend lost ones.
+
+        `bursts` are `(base, ...)` tuples, `packet(burst)` encodes a burst whose answer is returned
+        at `base`, `complete(burst, wdata)` consumes the answer (False to resend the burst).
+        """
+        todo    = list(bursts)[::-1]
+        pending = {} # base -> [burst, deadline, tries].
+
+        def send(burst, tries):
+            self.sock.sendto(packet(burst), self.addr)
+            pending[burst[0]] = [burst, time.monotonic() + self.timeout, tries]
+
+        while todo or pending:
+            while todo and len(pending) < self.window:
+                send(todo.pop(), 0)
+            try:
+                packet_in = self.sock.recv(65536)
+            except socket.timeout:
+                packet_in = None
+            if packet_in is not None:
+                for wbase, wdata, _, _ in decode_records(packet_in):
+                    entry = pending.get(wbase)
+                    if entry is not None and complete(entry[0], wdata):
+                        del pending[wbase]
+            # Resend lost bursts.
+            now = time.monotonic()
+            for base, (burst, deadline, tries) in list(pending.items()):
+                if now > deadline:
+                    if tries >= self.retries:
+                        raise TimeoutError(f"No response for burst @ 0x{base:08x}.")
+                    send(burst, tries + 1)
+
+    def read_words(self, addr, count):
+        """Read `count` 32-bit words starting at byte address `addr`."""
+        out = np.empty(count, dtype=np.uint32)
+
+        def packet(burst):
+            base, index, n = burst
+            return encode_record(rbase=base, raddrs=base + 4*np.arange(n))
+
+        def complete(burst, wdata):
+            base, index, n = burst
+            if len(wdata) != n:
+                return False
+            out[index:index + n] = wdata
+            return True
+
+        self._pipeline([(addr + 4*i, i, min(self.burst, count - i))
+            for i in range(0, count, self.burst)], packet, complete)
+        return out
+
+    def write_words(self, addr, words):
+        """Write 32-bit `words` starting at byte address `addr`.
+
+        Each burst also reads back its last word (answered at the burst address), which
+        acknowledges the burst and keeps writes windowed like reads.
+        """
+        words = np.asarray(words, dtype=np.uint32)
+
+        def packet(burst):
+            base, index, n = burst
+            return encode_record(wbase=base, wdata=words[index:index + n],
+                rbase=base, raddrs=[base + 4*(n - 1)])
+
+        def complete(burst, wdata):
+            base, index, n = burst
+            return len(wdata) == 1 and wdata[0] == words[index + n - 1]
+
+        self._pipeline([(addr + 4*i, i, min(self.burst, len(words) - i))
+            for i in range(0, len(words), self.burst)], packet, complete)
+
+    def read(self, addr, length):
+        """Read `length` bytes (multiple of 4) starting at `addr`, as memory ordered bytes."""
+        assert addr % 4 == 0 and length % 4 == 0
+        return self.read_words(addr, length//4).astype("<u4").tobytes()
+
+    def write(self, addr, data):
+        """Write `data` bytes (multiple of 4) starting at `addr`, in memory order."""
+        assert addr % 4 == 0 and len(data) % 4 == 0
+        self.write_words(addr, np.frombuffer(data, dtype="<u4"))
+
+    def flush_l2_cache(self, regions, constants):
+        """Evict the SoC L2 cache (as libbase flush_l2_cache(): read twice its size of main_ram),
+        so buffers written by DMA behind it are read from DRAM."""
+        l2_size = int(constants.get("config_l2_size", 0))
+        if l2_size:
+            self.read_words(regions["main_ram"], 2*l2_size//4)
+
+    def read_capture(self, csr_csv, dtype="<u4", segment=None, name="capture", width=None):
+        """Read the last capture of gateware/capture.py, oldest record first.
+
+        In segmented mode, `segment` selects the segment to read (default: 0). `name`/`width`
+        select another instance of the capture core (ex "events", 64 for the decoded events).
+        """
+        registers, regions, constants = load_csr_csv(csr_csv)
+        rbytes   = (width or int(constants["capture_sample_width"]))//8
+        base     = self.read32(registers[f"{name}_base"])
+        capacity = self.read32(registers[f"{name}_length"])//rbytes
+        count    = self.read32(registers[f"{name}_count"])
+        segments = 1
+        if f"{name}_segments" in registers:
+            segments = self.read32(registers[f"{name}_segments"])
+        if segments > 1:
+            if not 0 <= (segment or 0) < segments:
+                raise ValueError(f"Segment {segment} out of range ({segments} segments).")
+            length = self.read32(registers[f"{name}_segment_length"])
+            # Acknowledged (read back) write: the select must be in effect before segment_count.
+            self.write_words(registers[f"{name}_segment_select"], [segment or 0])
+            base    += (segment or 0)*length
+            capacity = length//rbytes
+            count    = self.read32(registers[f"{name}_segment_count"])
+        stored   = min(count, capacity)
+        first    = (count - stored) % capacity if capacity else 0
+        buf      = regions["main_ram"] + base
+        self.flush_l2_cache(regions, constants)
+        data     = self.read(buf + first*rbytes, (min(stored, capacity - first))*rbytes)
+        data    += self.read(buf, (stored - min(stored, capacity - first))*rbytes)
+        return np.frombuffer(data, dtype=dtype)
+
+# Loopback -----------------------------------------------------------------------------------------
+
+class EtherboneLoopback:
+    """UDP Etherbone target serving a host memory buffer mapped at `base`."""
+    def __init__(self, memory, base=0, host="127.0.0.1", port=0):
+        self.memory = np.frombuffer(memory, dtype="<u4")
+        self.base   = base
+        self.sock   = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.1)
+        self.addr   = self.sock.getsockname()
+        self.stop   = threading.Event()
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.stop.set()
+        self.thread.join()
+        self.sock.close()
+
+    def _serve(self):
+        while not self.stop.is_set():
+            try:
+                packet, peer = self.sock.recvfrom(65536)
+            except socket.timeout:
+                continue
+            for wbase, wdata, rbase, raddrs in decode_records(packet):
+                if len(wdata):
+                    index = (wbase - self.base)//4
+                    self.memory[index:index + len(wdata)] = wdata
+                if len(raddrs):
+                    rdata = self.memory[(raddrs.astype(np.int64) - self.base)//4]
+                    self.sock.sendto(encode_record(wbase=rbase, wdata=rdata), peer)
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="LycheeMSO Etherbone bulk readout.")
+    parser.add_argument("--host",     default="192.168.1.50",  help="Board IP address.")
+    parser.add_argument("--port",     default=ETHERBONE_PORT,   type=int, help="Etherbone UDP port.")
+    parser.add_argument("--addr",     default="0x41000000",     help="Start address (bytes).")
+    parser.add_argument("--length",   default="0x100000",       help="Length (bytes).")
+    parser.add_argument("--burst",    default=MAX_BURST,        type=int, help="Words per Etherbone burst.")
+    parser.add_argument("--window",   default=8,                type=int, help="Outstanding bursts.")
+    parser.add_argument("--csr-csv",  default=None,             help="Read the last capture using this CSR map.")
+    parser.add_argument("--loopback", action="store_true",      help="Read from a local UDP stand-in.")
+    parser.add_argument("--output",   default=None,             help="Save data to this file.")
+    args = parser.parse_args()
+
+    addr     = int(args.addr, 0)
+    length   = int(args.length, 0)
+    loopback = None
+    host, port = args.host, args.port
+    if args.loopback:
+        memory   = np.random.default_rng(0).integers(0, 2**32, length//4, dtype=np.uint32)
+        loopback = EtherboneLoopback(memory, base=addr)
+        host, port = loopback.addr
+
+    client = EtherboneClient(host, port, burst=args.burst, window=args.window)
+    start  = time.perf_counter()
+    if args.csr_csv is not None:
+        data = client.read_capture(args.csr_csv).tobytes()
+    else:
+        data = client.read(addr, length)
+    duration = time.perf_counter() - start
+    print(f"Read {len(data)} bytes in {duration:.3f}s ({len(data)/duration/1e6:.2f} MB/s).")
+    if loopback is not None:
+        assert data == memory.tobytes()
+        loopback.close()
+    if args.output is not None:
+        with open(args.output, "wb") as f:
+            f.write(data)
+    client.close()
+
+if __name__ == "__main__":
+    main()
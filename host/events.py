@@ -0,0 +1,90 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Host side of the gateware protocol decoders (gateware/decode.py).
+
+Decoded events are stored as 64-bit records: timestamp (40 LSBs, sys clk cycles), data (16 bits),
+kind (4 bits) and decoder index (4 MSBs). All-zeros records only pad the last DRAM word.
+
+    from host.scpi import SCPISerial
+    scpi   = SCPISerial()
+    events = decode(scpi.query_block(":DEC:DATAQ", dtype="<u8"))
+"""
+
+import numpy as np
+
+TIMESTAMP_BITS = 40
+DATA_BITS      = 16
+KIND_BITS      = 4
+
+EVENT_DATA    = 0
+EVENT_START   = 1
+EVENT_STOP    = 2
+EVENT_ADDRESS = 3
+EVENT_ERROR   = 8
+
+KIND_NAMES = {
+    EVENT_DATA    : "DATA",
+    EVENT_START   : "START",
+    EVENT_STOP    : "STOP",
+    EVENT_ADDRESS : "ADDR",
+}
+
+event_dtype = np.dtype([
+    ("timestamp", np.int64),
+    ("data",      np.uint16),
+    ("kind",      np.uint8),
+    ("error",     np.bool_),
+    ("decoder",   np.uint8),
+])
+
+# Records ------------------------------------------------------------------------------------------
+
+def decode(records):
+    """Decode raw records into an `event_dtype` array, with timestamps unwrapped (oldest first)."""
+    records = np.asarray(records, dtype=np.uint64)
+    records = records[records != 0]
+    events  = np.empty(len(records), dtype=event_dtype)
+    stamps  = (records & np.uint64(2**TIMESTAMP_BITS - 1)).astype(np.int64)
+    # The timestamp counter wraps (every ~6h at 48MHz). Records of different decoders go through
+    # an arbiter and can be stored a few cycles out of order: only a step back of more than half
+    # the counter range is a wrap (and a step forward as large a late record from before it).
+    steps   = np.diff(stamps, prepend=stamps[:1])
+    half    = 1 << (TIMESTAMP_BITS - 1)
+    wraps   = np.cumsum(steps < -half) - np.cumsum(steps > half)
+    events["timestamp"] = stamps + (wraps << TIMESTAMP_BITS)
+    events["data"]      = (records >> np.uint64(TIMESTAMP_BITS)) & np.uint64(2**DATA_BITS - 1)
+    kind                = (records >> np.uint64(TIMESTAMP_BITS + DATA_BITS)) & np.uint64(2**KIND_BITS - 1)
+    events["kind"]      = kind & np.uint64(EVENT_ERROR - 1)
+    events["error"]     = (kind & np.uint64(EVENT_ERROR)) != 0
+    events["decoder"]   = records >> np.uint64(TIMESTAMP_BITS + DATA_BITS + KIND_BITS)
+    return events[np.argsort(events["timestamp"], kind="stable")]
+
+def decoder_names(constants):
+    """Decoder index -> name ("UART0", "SPI0", "IIC0"...) from the csr.csv constants."""
+    names = []
+    for prefix, key in [("UART", "decoder_uarts"), ("SPI", "decoder_spis"), ("IIC", "decoder_i2cs")]:
+        names += [f"{prefix}{n}" for n in range(int(constants.get(key, 0)))]
+    return names
+
+def data_bytes(events, decoder):
+    """Bytes decoded by `decoder` (SPI: MOSI bytes, see `miso_bytes`)."""
+    sel = (events["decoder"] == decoder) & np.isin(events["kind"], (EVENT_DATA, EVENT_ADDRESS))
+    return (events["data"][sel] & 0xff).astype(np.uint8).tobytes()
+
+def miso_bytes(events, decoder):
+    sel = (events["decoder"] == decoder) & (events["kind"] == EVENT_DATA)
+    return (events["data"][sel] >> 8).astype(np.uint8).tobytes()
+
+def format_events(events, names=None, sys_clk_freq=48e6):
+    """Text listing of `events`, one per line."""
+    lines = []
+    for e in events:
+        name = names[e["decoder"]] if names else str(e["decoder"])
+        kind = KIND_NAMES.get(int(e["kind"]), str(e["kind"]))
+        lines.append(f"{e['timestamp']/sys_clk_freq:14.9f} {name:6s} {kind:5s} "
+            f"0x{int(e['data']):04x}{' ERR' if e['error'] else ''}")
+    return "\n".join(lines)
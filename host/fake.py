@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Fake instrument on a pseudo-terminal, for host tooling tests/benchmarks without a board.
+
+Speaks the firmware console protocol (firmware/main.c): echo of the received characters, "\\n\\r"
+line endings, "Error!" on unknown commands, IEEE-488.2 blocks of synthetic `(delta, state)`
+capture records (host/transitions.py), the `:TRIG` settings and queries (firmware/trigger.c) and
+the `:SOUR:ARB:UPL` framed AWG upload (firmware/awg.c, frames stored in `awg_buffer`). Output is
+paced at `baudrate` (10 bits per byte) and each command answered after `latency` seconds.
+
+    python3 -m host.fake --baudrate 115200 --latency 0.001
+"""
+
+import os
+import time
+import tty
+import select
+import argparse
+import threading
+
+import zlib
+
+import numpy as np
+
+from host.awg import UPLOAD_MAGIC, UPLOAD_BLOCK, _FRAME_HEADER
+from host.transitions import STATE_BITS
+
+AWG_BUFFER_LENGTH = 0x0200_0000 # scopy.BaseSoC default.
+
+# Trigger settings (firmware/trigger.c).
+TRIGGER_MODES    = ["EDGE", "PATT", "QUAL"]
+TRIGGER_SLOPES   = ["POS", "NEG", "RFAL"]
+TRIGGER_CHANNELS = 16
+
+# Waveforms ----------------------------------------------------------------------------------------
+
+def synthetic_records(points, channels=0xfe7c, max_delta=64, seed=0):
+    """`points` capture records: random transitions of `channels` (bitmask) `1..max_delta` samples
+    apart."""
+    rng    = np.random.default_rng(seed)
+    bits   = np.flatnonzero([(channels >> n) & 1 for n in range(STATE_BITS)])
+    toggle = (1 << rng.choice(bits, points)).astype(np.uint32)
+    states = np.bitwise_xor.accumulate(toggle) & (2**STATE_BITS - 1)
+    deltas = rng.integers(1, max_delta + 1, points, dtype=np.uint32)
+    return (deltas << STATE_BITS) | states
+
+# Fake Instrument ----------------------------------------------------------------------------------
+
+class FakeInstrument:
+    """Firmware console stand-in served on the slave side of a pty (`self.port`)."""
+    def __init__(self, baudrate=115200, latency=0.0, acquisition=0.0, points=1000, seed=0):
+        self.baudrate    = baudrate
+        self.latency     = latency
+        self.acquisition = acquisition
+        self.points      = points
+        self.seed        = seed
+        self.decimation  = 1
+        self.source      = 0
+        self.armed_at    = None
+        self.records     = np.zeros(0, dtype=np.uint32)
+        self.awg_buffer  = bytearray()
+        self.upload      = None # Bytes of the current frame while uploading.
+        self.uploaded    = 0
+        self.trig_mode   = "EDGE"
+        self.trig_source = 2
+        self.trig_slope  = "POS"
+        self.trig_level  = 0
+        self.trig_patt   = "X"*TRIGGER_CHANNELS
+        self.trig_hold   = 0
+        self.commands    = {
+            "*IDNQ"             : lambda arg: "SD,SadOscilloscope,0,0.01-0.0-0.0",
+            "WAV:PREQ"          : self.preamble,
+            "WAV:DATAQ"         : self.data,
+            "WAV:SOUR"          : self.set_source,
+            "WAV:SOURQ"         : lambda arg: f"D{self.source}",
+            ":SING"             : self.arm,
+            ":TFOR"             : self.arm,
+            ":STOP"             : self.stop,
+            ":TRIG:STATQ"       : self.state,
+            ":TRIG:MODE"        : self.set_trigger_mode,
+            ":TRIG:MODEQ"       : lambda arg: self.trig_mode,
+            ":TRIG:EDGE:SOUR"   : self.set_trigger_source,
+            ":TRIG:EDGE:SOURQ"  : lambda arg: f"D{self.trig_source}",
+            ":TRIG:EDGE:LEV"    : self.set_trigger_level,
+            ":TRIG:EDGE:LEVQ"   : lambda arg: str(self.trig_level),
+            ":TRIG:EDGE:SLOPE"  : self.set_trigger_slope,
+            ":TRIG:EDGE:SLOPEQ" : lambda arg: self.trig_slope,
+            ":TRIG:PATT:PATT"   : self.set_trigger_pattern,
+            ":TRIG:PATT:PATTQ"  : lambda arg: self.trig_patt,
+            ":TRIG:HOLD"        : self.set_trigger_holdoff,
+            ":TRIG:HOLDQ"       : lambda arg: str(self.trig_hold),
+            ":ACQ:MDEP"         : self.set_points,
+            ":ACQ:MDEPQ"        : lambda arg: str(self.points),
+            ":ACQ:DEC"          : self.set_decimation,
+            ":ACQ:DECQ"         : lambda arg: str(self.decimation),
+            ":ACQ:SRATQ"        : lambda arg: str(48_000_000//self.decimation),
+            ":SOUR:ARB:UPL"     : self.start_upload,
+        }
+
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port    = os.ttyname(slave)
+        self._slave  = slave
+        self._closed = False
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._closed = True
+        self._thread.join()
+        os.close(self.master)
+        os.close(self._slave)
+
+    # Commands -------------------------------------------------------------------------------------
+
+    def arm(self, arg):
+        self.armed_at = time.monotonic()
+        self.records  = synthetic_records(self.points, seed=self.seed)
+        self.seed    += 1
+
+    def stop(self, arg):
+        self.armed_at = None
+
+    def state(self, arg):
+        if self.armed_at is None:
+            return "STOP"
+        if time.monotonic() - self.armed_at < self.acquisition:
+            return "WAIT"
+        self.armed_at = None
+        return "STOP"
+
+    def set_points(self, arg):
+        self.points = int(arg, 0)
+
+    def set_decimation(self, arg):
+        self.decimation = int(arg, 0)
+
+    def set_source(self, arg):
+        if not arg.upper().startswith("D"):
+            raise ValueError(arg)
+        self.source = int(arg[1:])
+
+    # Arguments are case sensitive, as in the firmware (only headers are normalized).
+    def set_trigger_mode(self, arg):
+        if arg not in TRIGGER_MODES:
+            raise ValueError(arg)
+        self.trig_mode = arg
+
+    def set_trigger_source(self, arg):
+        # "D<n>", "CH<n>" or "CHAN<n>" (logic_channel).
+        for prefix in ["CHAN", "CH", "D"]:
+            if arg.startswith(prefix):
+                break
+        else:
+            raise ValueError(arg)
+        n = arg[len(prefix):]
+        if not n.isdigit() or int(n) >= TRIGGER_CHANNELS:
+            raise ValueError(arg)
+        self.trig_source = int(n)
+
+    def set_trigger_level(self, arg):
+        self.trig_level = int(arg)
+
+    def set_trigger_slope(self, arg):
+        if arg not in TRIGGER_SLOPES:
+            raise ValueError(arg)
+        self.trig_slope = arg
+
+    def set_trigger_pattern(self, arg):
+        # One H/L/X character per channel, channel 0 first.
+        if len(arg) != TRIGGER_CHANNELS or set(arg) - set("HLX"):
+            raise ValueError(arg)
+        self.trig_patt = arg
+
+    def set_trigger_holdoff(self, arg):
+        self.trig_hold = int(arg, 0) & 0xffff_ffff
+
+    def start_upload(self, arg):
+        self.upload   = bytearray()
+        self.uploaded = 0
+
+    def upload_byte(self, c):
+        """Next byte of an upload, return the response bytes (as awg_upload)."""
+        self.upload.append(c)
+        if len(self.upload) < _FRAME_HEADER.size:
+            return b""
+        magic, offset, length, crc = _FRAME_HEADER.unpack_from(self.upload)
+        if (magic != UPLOAD_MAGIC or length > UPLOAD_BLOCK or offset > AWG_BUFFER_LENGTH or
+            length > AWG_BUFFER_LENGTH - offset):
+            self.upload = None
+            return b"ERR\n\r"
+        if length == 0:
+            self.upload = None
+            return f"END {self.uploaded}\n\r".encode()
+        if len(self.upload) < _FRAME_HEADER.size + length:
+            return b""
+        payload     = self.upload[_FRAME_HEADER.size:]
+        self.upload = bytearray()
+        if zlib.crc32(payload) != crc:
+            return f"NAK {offset}\n\r".encode()
+        if len(self.awg_buffer) < offset + length:
+            self.awg_buffer.extend(bytes(offset + length - len(self.awg_buffer)))
+        self.awg_buffer[offset:offset + length] = payload
+        self.uploaded += length
+        return f"ACK {offset}\n\r".encode()
+
+    def preamble(self, arg):
+        # Trigger record in the middle, as with the firmware pre/post split.
+        trigger = len(self.records)//2 if len(self.records) else -1
+        return f"0,2,{len(self.records)},1,{self.decimation/48e6:.12f},0,{trigger},1.0,0,0"
+
+    def data(self, arg):
+        payload = self.records.astype("<u4").tobytes()
+        length  = str(len(payload)).encode()
+        return b"#" + str(len(length)).encode() + length + payload + b"\n"
+
+    def execute(self, line):
+        """Run a command line, return the raw response bytes."""
+        header, _, arg = line.strip().partition(" ")
+        handler = self.commands.get(header.upper().replace("?", "Q"))
+        try:
+            if handler is None:
+                raise KeyError(header)
+            response = handler(arg.strip())
+        except (KeyError, ValueError):
+            return b"Error!\n\r"
+        if response is None:
+            return b""
+        if isinstance(response, bytes):
+            return response
+        return response.encode() + b"\n\r"
+
+    # Serial ---------------------------------------------------------------------------------------
+
+    def _write(self, data):
+        # Paced at the baudrate (10 bits per byte), in chunks of ~1ms.
+        chunk = max(1, self.baudrate//10000)
+        start = time.monotonic()
+        for pos in range(0, len(data), chunk):
+            os.write(self.master, data[pos:pos + chunk])
+            delay = start + (pos + chunk)*10/self.baudrate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def _serve(self):
+        line = bytearray()
+        while not self._closed:
+            if not select.select([self.master], [], [], 0.05)[0]:
+                continue
+            try:
+                received = os.read(self.master, 4096)
+            except OSError:
+                break
+            for c in received:
+                if self.upload is not None:
+                    self._write(self.upload_byte(c))
+                elif c in b"\r\n":
+                    self._write(b"\n\r")
+                    if self.latency:
+                        time.sleep(self.latency)
+                    self._write(self.execute(line.decode(errors="replace")))
+                    line.clear()
+                elif c in b"\x08\x7f":
+                    if line:
+                        line.pop()
+                        self._write(b"\x08 \x08")
+                elif len(line) < 63:
+                    line.append(c)
+                    self._write(bytes([c]))
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="LycheeMSO fake instrument on a pty.")
+    parser.add_argument("--baudrate",    default=115200, type=int,   help="Emulated baudrate.")
+    parser.add_argument("--latency",     default=0.0,    type=float, help="Command latency (s).")
+    parser.add_argument("--acquisition", default=0.0,    type=float, help="Acquisition time (s).")
+    parser.add_argument("--points",      default=1000,   type=int,   help="Records per capture.")
+    args = parser.parse_args()
+
+    fake = FakeInstrument(args.baudrate, args.latency, args.acquisition, args.points)
+    print(f"Fake instrument on {fake.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fake.close()
+
+if __name__ == "__main__":
+    main()
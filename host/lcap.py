@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Record, convert and inspect capture files (.lcap, host/logic/capfile.py).
+
+Each `record` acquisition (`WAV:DATA?` transition records, expanded to samples) is appended as a
+chunk, its index entry holding the acquisition time relative to the start of the recording and
+the trigger sample (from the `WAV:PRE?` xreference field, the trigger record index).
+
+    python3 -m host.lcap record capture.lcap --port /dev/ttyUSB1 --captures 10
+    python3 -m host.lcap convert capture.bin capture.lcap --csv analyzer.csv
+    python3 -m host.lcap info capture.lcap
+    python3 -m host.logic capture.lcap --uart D0:115200
+"""
+
+import json
+import time
+import argparse
+
+from host.logic.capture import Layout, Signal, Capture
+from host.logic.capfile import CaptureWriter, CaptureFile
+
+# Run ----------------------------------------------------------------------------------------------
+
+def record(args):
+    """Record `args.captures` acquisitions (WAV:DATA? transition records, expanded) to a file."""
+    from host.scpi import SCPISerial
+    from host.transitions import expand, timestamps
+    scpi     = SCPISerial(args.port, args.baudrate)
+    preamble = scpi.preamble()
+    layout   = Layout.from_csv(args.csv) if args.csv else Layout(16,
+        samplerate = 1/preamble[4],
+        signals    = [Signal(f"D{n}", n, 1) for n in range(16)],
+    )
+    start  = time.time()
+    if args.append:
+        capture = CaptureFile(args.output)
+        start   = capture.metadata.get("start", start)
+        capture.close()
+    writer = CaptureWriter(args.output, layout, {"start": start, "preamble": preamble},
+        append=args.append)
+    for n in range(args.captures):
+        scpi.write(":SING")
+        while scpi.query(":TRIG:STAT?") != "STOP":
+            time.sleep(0.01)
+        records = scpi.query_block()
+        times   = timestamps(records)
+        trigger = int(scpi.preamble()[6])
+        trigger = int(times[trigger]) if 0 <= trigger < len(times) else -1
+        writer.append(expand(records), time=time.time() - start, trigger=trigger)
+        print(f"Capture {n}: {writer.length} samples.")
+    writer.close()
+    scpi.close()
+
+def convert(args):
+    """Raw sample file (flat, `Layout.dtype`) to a capture file, chunk by chunk."""
+    layout  = Layout.from_csv(args.csv)
+    capture = Capture(args.input, layout)
+    with CaptureWriter(args.output, layout, {"trigger": args.trigger}) as writer:
+        for start, samples in capture.chunks(args.chunk):
+            # Index entries hold the trigger sample index within their chunk.
+            inside = start <= args.trigger < start + len(samples)
+            writer.append(samples, trigger=args.trigger - start if inside else -1)
+
+def info(args):
+    capture = CaptureFile(args.input)
+    layout  = capture.layout
+    print(f"{layout.data_width}-bit samples at {layout.samplerate} Hz, "
+          f"signals: {' '.join(signal.name for signal in layout.signals)}")
+    for key, value in capture.metadata.items():
+        if key not in ["data_width", "dtype", "depth", "samplerate", "signals"]:
+            print(f"{key}: {json.dumps(value)}")
+    print(f"{len(capture)} samples in {len(capture.index)} chunks:")
+    for n, chunk in enumerate(capture.index):
+        print(f"  {n}: samples {chunk['first']}+{chunk['length']}, time {chunk['time']:.9f}s, "
+              f"trigger {chunk['trigger']}")
+    capture.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="LycheeMSO capture files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    p = commands.add_parser("record", help="Record acquisitions from the instrument.")
+    p.add_argument("output",                                    help="Capture file.")
+    p.add_argument("--port",     default="/dev/ttyUSB1",        help="Serial port.")
+    p.add_argument("--baudrate", default=115200, type=int,      help="Serial baudrate.")
+    p.add_argument("--csv",      default=None,                  help="Capture layout (LiteScope analyzer.csv).")
+    p.add_argument("--captures", default=1,      type=int,      help="Acquisitions to record.")
+    p.add_argument("--append",   action="store_true",           help="Append to an existing file.")
+    p = commands.add_parser("convert", help="Convert a raw capture.")
+    p.add_argument("input",                                     help="Raw capture file.")
+    p.add_argument("output",                                    help="Capture file.")
+    p.add_argument("--csv",      default="analyzer.csv",        help="Capture layout (LiteScope analyzer.csv).")
+    p.add_argument("--trigger",  default=-1,     type=int,      help="Trigger sample index.")
+    p.add_argument("--chunk",    default=1 << 22, type=int,     help="Samples per chunk.")
+    p = commands.add_parser("info", help="Show a capture file metadata and index.")
+    p.add_argument("input",                                     help="Capture file.")
+    args = parser.parse_args()
+    {"record": record, "convert": convert, "info": info}[args.command](args)
+
+if __name__ == "__main__":
+    main()
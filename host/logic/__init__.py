@@ -0,0 +1,18 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Vectorized, streaming logic capture decoding.
+
+    from host.logic import Layout, Capture, UARTDecoder, decode
+    layout  = Layout.from_csv("analyzer.csv")
+    capture = Capture("capture.bin", layout)
+    events  = decode(capture, [UARTDecoder(layout.bit("D0"), layout.samplerate/115200)])
+"""
+
+from host.logic.capture import Layout, Capture, Edges, EdgeExtractor
+from host.logic.pyramid import Pyramid
+from host.logic.capfile import CaptureWriter, CaptureFile, is_capture_file
+from host.logic.decoders import UARTDecoder, SPIDecoder, I2CDecoder, iter_decode, decode
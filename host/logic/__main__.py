@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Decode a raw capture file (or a capture file, host/logic/capfile.py, which carries its layout):
+
+    python3 -m host.logic capture.bin --csv analyzer.csv --uart D0:115200 --i2c D6,D7
+    python3 -m host.logic capture.lcap --uart D0:115200
+"""
+
+import time
+import argparse
+
+from host.events import format_events
+from host.logic import Layout, Capture, CaptureFile, is_capture_file, UARTDecoder, SPIDecoder, I2CDecoder, iter_decode
+
+def main():
+    parser = argparse.ArgumentParser(description="LycheeMSO logic capture decoder.")
+    parser.add_argument("capture",                                  help="Raw capture or capture file.")
+    parser.add_argument("--csv",        default="analyzer.csv",     help="Capture layout (LiteScope analyzer.csv, raw captures).")
+    parser.add_argument("--samplerate", default=None, type=float,   help="Override the layout samplerate.")
+    parser.add_argument("--uart",       action="append", default=[], help="RX[:BAUD] (default 115200).")
+    parser.add_argument("--spi",        action="append", default=[], help="CLK,MOSI[,MISO[,CS]][:MODE].")
+    parser.add_argument("--i2c",        action="append", default=[], help="SCL,SDA.")
+    parser.add_argument("--chunk",      default=1 << 22, type=int,  help="Samples decoded at once.")
+    parser.add_argument("--quiet",      action="store_true",        help="Only print statistics.")
+    args = parser.parse_args()
+
+    if is_capture_file(args.capture):
+        capture = CaptureFile(args.capture).capture()
+    else:
+        capture = Capture(args.capture, Layout.from_csv(args.csv))
+    layout     = capture.layout
+    samplerate = args.samplerate or layout.samplerate
+
+    decoders, names = [], []
+    for n, spec in enumerate(args.uart):
+        rx, _, baud = spec.partition(":")
+        decoders.append(UARTDecoder(layout.bit(rx), samplerate/float(baud or 115200), decoder=len(decoders)))
+        names.append(f"UART{n}")
+    for n, spec in enumerate(args.spi):
+        pins, _, mode = spec.partition(":")
+        pins = [layout.bit(pin) for pin in pins.split(",")]
+        decoders.append(SPIDecoder(*pins, mode=int(mode or 0), decoder=len(decoders)))
+        names.append(f"SPI{n}")
+    for n, spec in enumerate(args.i2c):
+        scl, sda = spec.split(",")
+        decoders.append(I2CDecoder(layout.bit(scl), layout.bit(sda), decoder=len(decoders)))
+        names.append(f"IIC{n}")
+
+    start   = time.perf_counter()
+    nevents = 0
+    for events in iter_decode(capture, decoders, args.chunk):
+        nevents += len(events)
+        if not args.quiet and len(events):
+            print(format_events(events, names, samplerate))
+    duration = time.perf_counter() - start
+    print(f"Decoded {len(capture)} samples ({nevents} events) in {duration:.3f}s "
+          f"({len(capture)/duration/1e6:.1f} Msamples/s).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Capture files (.lcap): packed samples, metadata and a chunk index, memory-mapped.
+
+Layout (little-endian):
+
+    0       "LYCHCAP\\0", version (u32), header length (u32), data offset (u64)
+    24      header: JSON metadata (layout, samplerate, trigger, WAV:PRE? preamble...)
+    data    samples, contiguous, in the smallest 8/16/32/64-bit word (`Layout.dtype`)
+    index   "LYCHIDX\\0", chunk count (u64), then per chunk: first sample (i64), samples (i64),
+            start time (f64, s), trigger (i64, sample index in the chunk or -1)
+    end     index offset (u64), "LYCHEND\\0"
+
+Chunks are appended as they arrive (each `CaptureWriter.append`), the index is written on
+close. All the samples form one flat array, so any range of samples is a zero-copy `np.memmap`
+view; the index gives the start time of each chunk (chunks are separate acquisitions, ex.
+segments). A file left without index (recording interrupted) reads as a single chunk.
+
+The writer also builds the level-of-detail pyramid of the samples (host/logic/pyramid.py), saved
+next to the file (`<filename>.lod.npz`) on close.
+
+    with CaptureWriter("capture.lcap", Layout.from_csv("analyzer.csv")) as f:
+        f.append(samples)
+    capture = CaptureFile("capture.lcap")
+    samples = capture.samples[capture.time_range(1e-3, 2e-3)]
+
+Recording, conversion and inspection from the command line: host/lcap.py.
+"""
+
+import os
+import json
+import struct
+
+import numpy as np
+
+from host.logic.capture import Layout, Signal, Capture
+from host.logic.pyramid import Pyramid
+
+MAGIC         = b"LYCHCAP\0"
+INDEX_MAGIC   = b"LYCHIDX\0"
+END_MAGIC     = b"LYCHEND\0"
+VERSION       = 1
+DATA_ALIGN    = 4096
+_PREFIX       = struct.Struct("<8sIIQ")
+_INDEX_HEADER = struct.Struct("<8sQ")
+_END          = struct.Struct("<Q8s")
+index_dtype   = np.dtype([
+    ("first",   "<i8"),
+    ("length",  "<i8"),
+    ("time",    "<f8"),
+    ("trigger", "<i8"),
+])
+
+def pyramid_filename(filename):
+    return f"{filename}.lod.npz"
+
+def is_capture_file(filename):
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+# Writer -------------------------------------------------------------------------------------------
+
+class CaptureWriter:
+    """Streams chunks of samples to a capture file, only the current chunk is held in memory.
+
+    `metadata` (JSON serializable dict) is stored along the layout, ex. the `WAV:PRE?` preamble or
+    the global `trigger` sample index. `append=True` adds chunks to an existing file.
+    `pyramid=False` skips the level-of-detail pyramid.
+    """
+    def __init__(self, filename, layout=None, metadata={}, append=False, pyramid=True):
+        self.filename = filename
+        self.pyramid  = None
+        if append:
+            self.f = open(filename, "r+b")
+            existing = CaptureFile(filename)
+            self.layout = existing.layout
+            self.index  = [tuple(chunk) for chunk in existing.index]
+            self.data_offset = existing.data_offset
+            self.length      = len(existing)
+            if pyramid:
+                self.pyramid = existing.pyramid(save=False)
+            existing.close()
+            self.f.seek(self.data_offset + self.length*self.layout.dtype.itemsize)
+            self.f.truncate()
+            return
+        self.layout = layout
+        self.index  = []
+        self.length = 0
+        if pyramid:
+            self.pyramid = Pyramid(layout.dtype)
+        header = json.dumps({
+            "data_width" : layout.data_width,
+            "dtype"      : layout.dtype.str,
+            "depth"      : layout.depth,
+            "samplerate" : layout.samplerate,
+            "signals"    : [list(signal) for signal in layout.signals],
+            **metadata,
+        }).encode()
+        self.data_offset = -(-(_PREFIX.size + len(header))//DATA_ALIGN)*DATA_ALIGN
+        self.f = open(filename, "wb")
+        self.f.write(_PREFIX.pack(MAGIC, VERSION, len(header), self.data_offset) + header)
+        self.f.write(bytes(self.data_offset - self.f.tell()))
+
+    def append(self, samples, time=None, trigger=-1):
+        """Append a chunk of samples starting at `time` (s, default: right after the previous
+        chunk), `trigger` is the sample index of its trigger (-1: none)."""
+        samples = np.asarray(samples).astype(self.layout.dtype, copy=False)
+        if time is None:
+            time = 0.0
+            if self.index:
+                last = self.index[-1]
+                time = last[2] + last[1]/(self.layout.samplerate or 1)
+        self.f.write(samples.tobytes())
+        if self.pyramid is not None:
+            self.pyramid.feed(samples)
+        self.index.append((self.length, len(samples), time, trigger))
+        self.length += len(samples)
+
+    def close(self):
+        index = np.array(self.index, dtype=index_dtype)
+        index_offset = self.f.tell()
+        self.f.write(_INDEX_HEADER.pack(INDEX_MAGIC, len(index)) + index.tobytes())
+        self.f.write(_END.pack(index_offset, END_MAGIC))
+        self.f.close()
+        if self.pyramid is not None:
+            self.pyramid.save(pyramid_filename(self.filename))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+# Reader -------------------------------------------------------------------------------------------
+
+class CaptureFile:
+    """Memory-mapped capture file: `samples` (flat array), `index` (chunks), `metadata`."""
+    def __init__(self, filename):
+        self.filename = filename
+        self.f = open(filename, "rb")
+        magic, version, header_length, self.data_offset = _PREFIX.unpack(self.f.read(_PREFIX.size))
+        if magic != MAGIC or version > VERSION:
+            raise ValueError(f"{filename}: not a (supported) capture file.")
+        self.metadata = json.loads(self.f.read(header_length))
+        self.layout   = Layout(
+            data_width = self.metadata["data_width"],
+            depth      = self.metadata.get("depth"),
+            samplerate = self.metadata.get("samplerate"),
+            signals    = [Signal(*signal) for signal in self.metadata["signals"]],
+        )
+        dtype = np.dtype(self.metadata["dtype"])
+
+        # Index (or a single chunk up to the end of the file when the writer did not close it).
+        size = os.fstat(self.f.fileno()).st_size
+        data_end = size
+        self.index = None
+        if size >= self.data_offset + _END.size:
+            self.f.seek(size - _END.size)
+            index_offset, end = _END.unpack(self.f.read(_END.size))
+            if end == END_MAGIC:
+                self.f.seek(index_offset)
+                magic, count = _INDEX_HEADER.unpack(self.f.read(_INDEX_HEADER.size))
+                if magic == INDEX_MAGIC:
+                    self.index = np.frombuffer(self.f.read(count*index_dtype.itemsize), index_dtype)
+                    data_end   = index_offset
+        length = (data_end - self.data_offset)//dtype.itemsize
+        if self.index is None:
+            self.index = np.array([(0, length, 0.0, -1)], dtype=index_dtype)
+        self.samples = np.memmap(self.f, dtype=dtype, mode="r", offset=self.data_offset,
+            shape=(length,)) if length else np.zeros(0, dtype)
+
+    def close(self):
+        self.samples = None
+        self.f.close()
+
+    def __len__(self):
+        return len(self.samples)
+
+    def capture(self):
+        """`Capture` view of the samples (for `host.logic` decoders)."""
+        return Capture(self.samples, self.layout)
+
+    def pyramid(self, save=True):
+        """Level-of-detail pyramid of the samples, loaded, or built (and saved) when missing or
+        out of date (file recorded without pyramid, interrupted)."""
+        filename = pyramid_filename(self.filename)
+        if os.path.exists(filename):
+            pyramid = Pyramid.load(filename)
+            if pyramid.length == len(self):
+                return pyramid
+        pyramid = Pyramid(self.samples.dtype)
+        for start in range(0, len(self), 1 << 22):
+            pyramid.feed(self.samples[start:start + (1 << 22)])
+        if save:
+            pyramid.save(filename)
+        return pyramid
+
+    def chunk(self, n):
+        """Samples of chunk `n` (zero-copy)."""
+        first, length = int(self.index[n]["first"]), int(self.index[n]["length"])
+        return self.samples[first:first + length]
+
+    def time_range(self, start, stop):
+        """`slice` of the samples between times `start` and `stop` (s), within the chunk holding
+        `start`."""
+        n     = max(0, int(np.searchsorted(self.index["time"], start, side="right")) - 1)
+        chunk = self.index[n]
+        rate  = self.layout.samplerate
+        first = int(chunk["first"])
+        begin = first + int(np.clip(round((start - chunk["time"])*rate), 0, chunk["length"]))
+        end   = first + int(np.clip(round((stop  - chunk["time"])*rate), 0, chunk["length"]))
+        return slice(begin, max(begin, end))
@@ -0,0 +1,133 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Captures described by a LiteScope analyzer.csv, read in chunks.
+
+A capture is a flat array of samples (`data_width` bits each, stored little-endian in the
+smallest 8/16/32/64-bit word) either in memory or in a raw file (memory-mapped, so only the chunk
+being processed is paged in).
+"""
+
+import csv
+import collections
+
+import numpy as np
+
+# Layout -------------------------------------------------------------------------------------------
+
+Signal = collections.namedtuple("Signal", "name offset width")
+
+class Layout:
+    """Capture layout from a LiteScope analyzer.csv (`config` and `signal` rows)."""
+    def __init__(self, data_width, depth=None, samplerate=None, signals=()):
+        self.data_width = data_width
+        self.depth      = depth
+        self.samplerate = samplerate
+        self.signals    = list(signals)
+
+    @classmethod
+    def from_csv(cls, filename, group=0):
+        config, signals, offset = {}, [], 0
+        with open(filename) as f:
+            for row in csv.reader(l for l in f if l.strip() and not l.startswith("#")):
+                if row[0] == "config":
+                    config[row[2]] = int(row[3])
+                elif row[0] == "signal" and int(row[1]) == group:
+                    signals.append(Signal(row[2], offset, int(row[3])))
+                    offset += int(row[3])
+        return cls(
+            data_width = config.get("data_width", offset),
+            depth      = config.get("depth"),
+            samplerate = config.get("samplerate"),
+            signals    = signals,
+        )
+
+    @property
+    def dtype(self):
+        for bits, dtype in [(8, "<u1"), (16, "<u2"), (32, "<u4"), (64, "<u8")]:
+            if self.data_width <= bits:
+                return np.dtype(dtype)
+        raise ValueError(f"Unsupported data width ({self.data_width}).")
+
+    def bit(self, name):
+        """Bit index of a signal (or of bit `n` of a bus given as "name[n]") or of "D<n>"."""
+        base, _, index = name.partition("[")
+        index = int(index.rstrip("]")) if index else 0
+        for signal in self.signals:
+            if signal.name == base and index < signal.width:
+                return signal.offset + index
+        if base.startswith("D") and base[1:].isdigit() and int(base[1:]) < self.data_width:
+            return int(base[1:])
+        raise KeyError(f"No signal {name}.")
+
+# Capture ------------------------------------------------------------------------------------------
+
+class Capture:
+    def __init__(self, data, layout):
+        self.layout = layout
+        if isinstance(data, (str, bytes)) or hasattr(data, "__fspath__"):
+            data = np.memmap(data, dtype=layout.dtype, mode="r")
+        self.samples = np.asarray(data).astype(layout.dtype, copy=False)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def chunks(self, size=1 << 22):
+        """Yield `(start, samples)` chunks of at most `size` samples."""
+        for start in range(0, len(self.samples), size):
+            yield start, np.asarray(self.samples[start:start + size])
+
+    def packed(self, name, chunk=1 << 22):
+        """1 bit per sample array of a signal bit (LSB first, as `np.unpackbits(bitorder="little")`)."""
+        bit = self.layout.bit(name)
+        out = np.empty((len(self) + 7)//8, dtype=np.uint8)
+        chunk -= chunk % 8
+        for start, samples in self.chunks(chunk):
+            bits = ((samples >> samples.dtype.type(bit)) & 1).astype(np.uint8)
+            out[start//8:(start + len(bits) + 7)//8] = np.packbits(bits, bitorder="little")
+        return out
+
+# Edges --------------------------------------------------------------------------------------------
+
+class Edges:
+    """Transitions of a chunk: `edges[bit]` = `(indexes, levels)` (absolute sample index of each
+    transition and level after it), `initial[bit]` = level before the first transition of the
+    capture and `end` = index of the first sample after the chunk."""
+    def __init__(self, edges, initial, end):
+        self.edges   = edges
+        self.initial = initial
+        self.end     = end
+
+class EdgeExtractor:
+    """Streaming edge extraction of the selected bits of consecutive chunks."""
+    def __init__(self, bits):
+        self.bits    = sorted(set(bits))
+        self.last    = None
+        self.initial = {}
+
+    def feed(self, start, samples):
+        end = start + len(samples)
+        if not len(samples):
+            empty = (np.zeros(0, np.int64), np.zeros(0, np.uint8))
+            return Edges({bit: empty for bit in self.bits}, self.initial, end)
+        shift = samples.dtype.type
+        if self.last is None:
+            self.last    = samples[0]
+            self.initial = {bit: int(self.last >> shift(bit)) & 1 for bit in self.bits}
+        previous     = np.empty_like(samples)
+        previous[0]  = self.last
+        previous[1:] = samples[:-1]
+        self.last    = samples[-1]
+        # Only rows with a change are examined per bit (transitions are sparse).
+        changes = samples ^ previous
+        rows    = np.flatnonzero(changes)
+        values  = samples[rows]
+        changes = changes[rows]
+        edges   = {}
+        for bit in self.bits:
+            sel = ((changes >> shift(bit)) & 1).astype(bool)
+            edges[bit] = (rows[sel] + start, ((values[sel] >> shift(bit)) & 1).astype(np.uint8))
+        return Edges(edges, self.initial, end)
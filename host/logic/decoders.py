@@ -0,0 +1,271 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Streaming UART/SPI/I2C decoders.
+
+Decoders only work on the transitions of their lines (see `EdgeExtractor`): sample values are
+looked up in the transition arrays and bits are grouped in bytes with sorted searches, so the cost
+per chunk is a few NumPy passes over the (sparse) transitions and nothing is done per sample in
+Python.
+State (unfinished frames/bytes) is carried between chunks so any chunk size gives the same result.
+
+Events use the `host.events` format (same as the gateware decoders), with timestamps in samples.
+"""
+
+import numpy as np
+
+from host.events import event_dtype, EVENT_DATA, EVENT_START, EVENT_STOP, EVENT_ADDRESS
+from host.logic.capture import EdgeExtractor
+
+# Helpers ------------------------------------------------------------------------------------------
+
+def _events(timestamps, data, kind, error=False, decoder=0):
+    events = np.empty(len(timestamps), dtype=event_dtype)
+    events["timestamp"] = timestamps
+    events["data"]      = data
+    events["kind"]      = kind
+    events["error"]     = error
+    events["decoder"]   = decoder
+    return events
+
+class _Line:
+    """Transitions of a line seen so far (trimmed as decoders move forward)."""
+    def __init__(self, bit):
+        self.bit     = bit
+        self.indexes = np.zeros(0, np.int64)
+        self.levels  = np.zeros(0, np.uint8)
+        self.initial = None
+
+    def append(self, chunk):
+        if self.initial is None:
+            self.initial = chunk.initial.get(self.bit, 1)
+        indexes, levels = chunk.edges[self.bit]
+        self.indexes = np.concatenate((self.indexes, indexes))
+        self.levels  = np.concatenate((self.levels, levels))
+        return indexes, levels
+
+    def level_at(self, positions):
+        """Level at (after any transition on) each sample index of `positions`."""
+        k = np.searchsorted(self.indexes, positions, side="right") - 1
+        return np.where(k >= 0, self.levels[np.maximum(k, 0)] if len(self.levels) else 0,
+            self.initial).astype(np.uint8)
+
+    def trim(self, before):
+        """Forget transitions before sample `before` (keeping the level there)."""
+        k = np.searchsorted(self.indexes, before)
+        if k:
+            self.initial = int(self.levels[k - 1])
+            self.indexes = self.indexes[k:]
+            self.levels  = self.levels[k:]
+
+def _group(frames):
+    """Position of each bit in its frame, from sorted frame ids (bits are in time order)."""
+    first = np.searchsorted(frames, frames, side="left")
+    return np.arange(len(frames)) - first
+
+# UART ---------------------------------------------------------------------------------------------
+
+class UARTDecoder:
+    """8N1 (or `bits`N1) UART receiver on bit `rx`, `period` samples per bit."""
+    def __init__(self, rx, period, bits=8, decoder=0):
+        self.rx      = _Line(rx)
+        self.period  = float(period)
+        self.nbits   = bits
+        self.decoder = decoder
+        self.next    = 0 # First sample where a start bit may begin.
+
+    @property
+    def bits(self):
+        return [self.rx.bit]
+
+    def feed(self, chunk):
+        line = self.rx
+        line.append(chunk)
+        period = self.period
+        last   = (self.nbits + 1.5)*period # Middle of the stop bit.
+
+        # Start bit candidates: falling edges still low at the middle of the bit.
+        falling = line.indexes[line.levels == 0]
+        falling = falling[falling >= self.next]
+        falling = falling[line.level_at((falling + 0.5*period).astype(np.int64)) == 0]
+        # Frames must fit in what has been seen so far.
+        falling = falling[falling + last < chunk.end]
+
+        # Chain frames: a frame starts at the first candidate after the previous stop bit. Only
+        # this walk is sequential and it is per frame.
+        following = np.searchsorted(falling, falling + last).tolist()
+        starts, i = [], 0
+        while i < len(falling):
+            starts.append(i)
+            i = following[i]
+        starts = falling[starts]
+
+        # Sample data/stop bits at their middle.
+        offsets = ((np.arange(1, self.nbits + 2) + 0.5)*period)
+        levels  = line.level_at((starts[:, None] + offsets).astype(np.int64))
+        weights = 1 << np.arange(self.nbits)
+        data    = (levels[:, :self.nbits].astype(np.int64)*weights).sum(axis=1)
+        error   = levels[:, -1] == 0
+
+        # Frames starting before end - last have all been decoded.
+        if len(starts):
+            self.next = int(starts[-1] + last)
+        line.trim(max(self.next, int(chunk.end - last)) - 1)
+        return _events(starts, data, EVENT_DATA, error, self.decoder)
+
+    def flush(self):
+        return _events([], [], EVENT_DATA)
+
+# SPI ----------------------------------------------------------------------------------------------
+
+class SPIDecoder:
+    """SPI sniffer: MOSI (LSBs) / MISO (MSBs) bytes while CS (active low) is asserted."""
+    def __init__(self, clk, mosi, miso=None, cs=None, mode=0, lsb_first=False, decoder=0):
+        self.clk       = _Line(clk)
+        self.mosi      = _Line(mosi)
+        self.miso      = _Line(miso) if miso is not None else None
+        self.cs        = _Line(cs) if cs is not None else None
+        self.cpol      = mode >> 1
+        self.cpha      = mode & 1
+        self.lsb_first = lsb_first
+        self.decoder   = decoder
+        # Bits of the unfinished byte: (timestamps, mosi, miso).
+        self.pending   = (np.zeros(0, np.int64), np.zeros(0, np.uint8), np.zeros(0, np.uint8))
+
+    @property
+    def bits(self):
+        return [line.bit for line in (self.clk, self.mosi, self.miso, self.cs) if line is not None]
+
+    def feed(self, chunk):
+        clk_idx, clk_lev = self.clk.append(chunk)
+        for line in (self.mosi, self.miso, self.cs):
+            if line is not None:
+                line.append(chunk)
+
+        # Sampling edges: rising for modes 0/3, falling for modes 1/2.
+        sample = clk_idx[clk_lev == int(self.cpol == self.cpha)]
+        events = []
+        if self.cs is not None:
+            cs_idx, cs_lev = chunk.edges[self.cs.bit]
+            sample = sample[self.cs.level_at(sample) == 0]
+            starts = cs_idx[cs_lev == 0]
+            events.append(_events(starts, 0, EVENT_START, False, self.decoder))
+            events.append(_events(cs_idx[cs_lev == 1], 0, EVENT_STOP, False, self.decoder))
+        else:
+            starts = np.zeros(0, np.int64)
+
+        # Bit stream (pending bits of the previous chunk first), frames restart on CS assertion.
+        times = np.concatenate((self.pending[0], sample))
+        mosi  = np.concatenate((self.pending[1], self.mosi.level_at(sample)))
+        miso  = np.concatenate((self.pending[2],
+            self.miso.level_at(sample) if self.miso is not None else np.zeros(len(sample), np.uint8)))
+        frames   = np.searchsorted(starts, times, side="right")
+        position = _group(frames)
+
+        # Complete bytes end on their 8th bit.
+        ends    = np.flatnonzero(position % 8 == 7)
+        index   = ends[:, None] - 7 + np.arange(8)
+        shifts  = np.arange(8) if self.lsb_first else np.arange(7, -1, -1)
+        mosi_b  = (mosi[index].astype(np.int64) << shifts).sum(axis=1)
+        miso_b  = (miso[index].astype(np.int64) << shifts).sum(axis=1)
+        events.append(_events(times[ends], mosi_b | (miso_b << 8), EVENT_DATA, False, self.decoder))
+
+        # Keep the bits of the unfinished byte of the last frame.
+        keep = np.zeros(len(times), dtype=bool)
+        if len(times):
+            last = (frames == frames[-1]) & (position >= (position[-1] - position[-1] % 8))
+            keep = last & (position[-1] % 8 != 7)
+        self.pending = (times[keep], mosi[keep], miso[keep])
+
+        for line in (self.clk, self.mosi, self.miso, self.cs):
+            if line is not None:
+                line.trim(chunk.end - 1)
+        return np.concatenate(events)
+
+    def flush(self):
+        return _events([], [], EVENT_DATA)
+
+# I2C ----------------------------------------------------------------------------------------------
+
+class I2CDecoder:
+    """I2C sniffer: start/stop conditions and address/data bytes (NACK flagged as error)."""
+    def __init__(self, scl, sda, decoder=0):
+        self.scl     = _Line(scl)
+        self.sda     = _Line(sda)
+        self.decoder = decoder
+        self.active  = False # Between a start and a stop condition.
+        self.address = True  # Next byte is an address.
+        self.pending = (np.zeros(0, np.int64), np.zeros(0, np.uint8))
+
+    @property
+    def bits(self):
+        return [self.scl.bit, self.sda.bit]
+
+    def feed(self, chunk):
+        scl_idx, scl_lev = self.scl.append(chunk)
+        sda_idx, sda_lev = self.sda.append(chunk)
+
+        # SDA changing while SCL is high: start (falling) / stop (rising) conditions.
+        high    = self.scl.level_at(sda_idx) == 1
+        markers = sda_idx[high]
+        start   = sda_lev[high] == 0
+        events  = [
+            _events(markers[start],  0, EVENT_START, False, self.decoder),
+            _events(markers[~start], 0, EVENT_STOP,  False, self.decoder),
+        ]
+
+        # Bits on SCL rising edges, grouped by 9 (8 bits + ACK) from the last start condition.
+        rising = scl_idx[scl_lev == 1]
+        times  = np.concatenate((self.pending[0], rising))
+        sda    = np.concatenate((self.pending[1], self.sda.level_at(rising)))
+        frames = np.searchsorted(markers, times, side="right")
+        active = np.concatenate(([self.active], start))[frames]
+        times, sda, frames = times[active], sda[active], frames[active]
+        position = _group(frames)
+
+        ends    = np.flatnonzero(position % 9 == 8)
+        index   = ends[:, None] - 8 + np.arange(8)
+        data    = (sda[index].astype(np.int64) << np.arange(7, -1, -1)).sum(axis=1)
+        nack    = sda[ends] == 1
+        # First byte of a frame is the address (for the carried frame, unless already decoded).
+        first   = position[ends] == 8
+        address = first & ((frames[ends] != 0) | self.address)
+        kind    = np.where(address, EVENT_ADDRESS, EVENT_DATA)
+        events.append(_events(times[ends], data, kind, nack, self.decoder))
+
+        # State of the last frame: activity, address phase, unfinished byte.
+        if len(markers):
+            self.active  = bool(start[-1])
+            self.address = True
+        last = frames == len(markers)
+        if np.any(last[ends]):
+            self.address = False
+        keep = np.zeros(len(times), dtype=bool)
+        if len(times) and last[-1] and position[-1] % 9 != 8:
+            keep = last & (position >= position[-1] - position[-1] % 9)
+        self.pending = (times[keep], sda[keep])
+
+        self.scl.trim(chunk.end - 1)
+        self.sda.trim(chunk.end - 1)
+        return np.concatenate(events)
+
+    def flush(self):
+        return _events([], [], EVENT_DATA)
+
+# Driver -------------------------------------------------------------------------------------------
+
+def iter_decode(capture, decoders, chunk=1 << 22):
+    """Run `decoders` over `capture` chunk by chunk, yielding the events of each chunk (in time
+    order). Memory use only depends on `chunk`."""
+    extractor = EdgeExtractor([bit for decoder in decoders for bit in decoder.bits])
+    for start, samples in capture.chunks(chunk):
+        edges  = extractor.feed(start, samples)
+        events = np.concatenate([decoder.feed(edges) for decoder in decoders])
+        yield np.sort(events, order="timestamp", kind="stable")
+    yield np.concatenate([decoder.flush() for decoder in decoders])
+
+def decode(capture, decoders, chunk=1 << 22):
+    return np.concatenate(list(iter_decode(capture, decoders, chunk)))
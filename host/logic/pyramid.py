@@ -0,0 +1,198 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Level-of-detail pyramid of a capture: per-block min/max/transitions at power-of-two block sizes.
+
+Level `k` has one row per block of `base << k` samples:
+
+- `min`, `max`: bitwise AND and OR of the block samples, so a bit of `min` is set if the signal is
+  high over the whole block and a bit of `max` if it is high anywhere (a bit differing between
+  the two toggles in the block).
+- `transitions`: samples differing from the sample before them (the first sample of a block is
+  compared to the last one of the previous block), so counts add up over consecutive blocks.
+
+The pyramid is built incrementally (`feed`, as chunks stream in) and adds about 2*(2*itemsize +
+8)/base bytes per sample. A window query (`query`) reads at most ~2 rows per pixel, from the
+level whose blocks are no larger than a pixel, or the samples themselves when zoomed in below
+`base` samples per pixel: its cost depends on the number of pixels, not of samples.
+
+    pyramid = Pyramid(layout.dtype)
+    for start, samples in capture.chunks():
+        pyramid.feed(samples)
+    pixels  = pyramid.query(start, stop, 1920, capture.samples)
+"""
+
+import numpy as np
+
+# Pyramid ------------------------------------------------------------------------------------------
+
+def _blocks_dtype(dtype):
+    return np.dtype([("min", dtype), ("max", dtype), ("transitions", "<i8")])
+
+def _merge(rows):
+    """Pairs of consecutive rows -> rows of the next level (`len(rows)` even)."""
+    merged = np.empty(len(rows)//2, rows.dtype)
+    merged["min"]         = rows["min"][0::2] & rows["min"][1::2]
+    merged["max"]         = rows["max"][0::2] | rows["max"][1::2]
+    merged["transitions"] = rows["transitions"][0::2] + rows["transitions"][1::2]
+    return merged
+
+def _reduce(rows, edges):
+    """Rows between consecutive `edges` reduced to one (`edges` increasing, within `rows`)."""
+    reduced = np.zeros(len(edges) - 1, rows.dtype)
+    valid   = edges[1:] > edges[:-1]
+    starts  = edges[:-1][valid]
+    if len(starts):
+        reduced["min"][valid]         = np.bitwise_and.reduceat(rows["min"], starts)
+        reduced["max"][valid]         = np.bitwise_or.reduceat(rows["max"], starts)
+        reduced["transitions"][valid] = np.add.reduceat(rows["transitions"], starts)
+    return reduced
+
+class Pyramid:
+    """Incrementally built level-of-detail pyramid of a capture of `dtype` samples."""
+    def __init__(self, dtype, base=64):
+        assert base & (base - 1) == 0
+        self.dtype  = np.dtype(dtype)
+        self.base   = base
+        self.length = 0
+        self.blocks = _blocks_dtype(self.dtype)
+        self.carry  = np.zeros(0, self.dtype) # Samples of the incomplete level 0 block.
+        self.last   = None                    # Sample before `carry`.
+        self.levels = []                      # Per level: list of row arrays.
+        self.tails  = []                      # Per level: row not merged yet (odd count).
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.levels)
+
+    def level(self, k):
+        """Rows of level `k` (blocks of `base << k` samples)."""
+        if k not in self._cache:
+            self._cache[k] = np.concatenate(self.levels[k]) if self.levels[k] else \
+                np.zeros(0, self.blocks)
+            self.levels[k] = [self._cache[k]]
+        return self._cache[k]
+
+    def _extend(self, k, rows):
+        if k == len(self.levels):
+            self.levels.append([])
+            self.tails.append(None)
+        self.levels[k].append(rows)
+        self._cache.pop(k, None)
+        if self.tails[k] is not None:
+            rows = np.concatenate([self.tails[k], rows])
+        self.tails[k] = rows[len(rows) - len(rows) % 2:]
+        if not len(self.tails[k]):
+            self.tails[k] = None
+        if len(rows) >= 2:
+            self._extend(k + 1, _merge(rows[:len(rows) - len(rows) % 2]))
+
+    def feed(self, samples):
+        """Add the next samples of the capture."""
+        samples = np.asarray(samples).astype(self.dtype, copy=False)
+        if not len(samples):
+            return
+        data = np.concatenate([self.carry, samples]) if len(self.carry) else samples
+        if self.last is None:
+            self.last = data[0]
+        n = len(data) - len(data) % self.base
+        if n:
+            previous     = np.empty(n, self.dtype)
+            previous[0]  = self.last
+            previous[1:] = data[:n - 1]
+            blocks = data[:n].reshape(-1, self.base)
+            rows   = np.empty(len(blocks), self.blocks)
+            rows["min"]         = np.bitwise_and.reduce(blocks, axis=1)
+            rows["max"]         = np.bitwise_or.reduce(blocks, axis=1)
+            rows["transitions"] = (data[:n] != previous).reshape(-1, self.base).sum(axis=1)
+            self._extend(0, rows)
+            self.last = data[n - 1]
+        self.carry   = data[n:].copy()
+        self.length += len(samples)
+
+    def _samples(self, samples, start, stop, edges):
+        """Rows between `edges` (sample indexes) computed from the samples."""
+        data = np.asarray(samples[start:stop]).astype(self.dtype, copy=False)
+        rows = np.empty(len(data), self.blocks)
+        rows["min"] = rows["max"] = data
+        rows["transitions"][1:] = data[1:] != data[:-1]
+        if len(data):
+            rows["transitions"][0] = start > 0 and samples[start - 1] != data[0]
+        return _reduce(rows, np.asarray(edges) - start)
+
+    def query(self, start, stop, pixels, samples=None):
+        """`min`, `max` and `transitions` of `pixels` equal bins of samples `start` to `stop`.
+
+        Bins are rounded to the blocks of the level read, so are exact within one block, empty
+        bins (past the data) are all zeros. Below `base` samples per bin the samples are read,
+        from `samples` (the capture array), or the result is rounded to the level 0 blocks.
+        """
+        stop  = min(stop, self.length)
+        bin   = max(stop - start, 0)/pixels
+        edges = start + np.round(np.arange(pixels + 1)*bin).astype(np.int64)
+        if bin < self.base and samples is not None:
+            return self._samples(samples, start, stop, edges)
+        k     = max(0, min(int(np.log2(max(bin, 1)/self.base)), len(self) - 1))
+        rows  = self.level(k) if len(self) else np.zeros(0, self.blocks)
+        edges = np.minimum(edges >> int(np.log2(self.base << k)), len(rows))
+        return _reduce(rows[edges[0]:edges[-1]], edges - edges[0])
+
+    def summary(self, start, stop, samples):
+        """Exact `min`, `max` and `transitions` of samples `start` to `stop`: the largest aligned
+        blocks of the range are read from the pyramid, the ends from `samples`."""
+        stop = min(stop, self.length)
+        if stop - start < 2*self.base:
+            return self._samples(samples, start, stop, [start, stop])[0]
+        first = -(-start//self.base)
+        last  = stop//self.base
+        parts = [
+            self._samples(samples, start, first*self.base, [start, first*self.base]),
+            self._samples(samples, last*self.base, stop,   [last*self.base, stop]),
+        ]
+        parts = [part for part, size in zip(parts, [first*self.base - start, stop - last*self.base])
+            if size]
+        for k in range(len(self)):
+            rows = self.level(k)
+            if k == len(self) - 1:
+                parts.append(rows[first:last])
+                break
+            if first & 1:
+                parts.append(rows[first:first + 1])
+                first += 1
+            if last & 1:
+                last -= 1
+                parts.append(rows[last:last + 1])
+            if first >= last:
+                break
+            first, last = first//2, last//2
+        rows = np.concatenate(parts)
+        return _reduce(rows, np.array([0, len(rows)]))[0]
+
+    # Persistence ----------------------------------------------------------------------------------
+
+    def save(self, filename):
+        arrays = {f"level{k}": self.level(k) for k in range(len(self))}
+        for k, tail in enumerate(self.tails):
+            if tail is not None:
+                arrays[f"tail{k}"] = tail
+        last = self.last if self.last is not None else self.dtype.type(0)
+        np.savez(filename, carry=self.carry, last=np.array([last], self.dtype),
+            state=np.array([self.base, self.length, self.last is not None], np.int64), **arrays)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as f:
+            base, length, has_last = (int(v) for v in f["state"])
+            pyramid        = cls(f["carry"].dtype, base)
+            pyramid.length = length
+            pyramid.carry  = f["carry"]
+            pyramid.last   = f["last"][0] if has_last else None
+            k = 0
+            while f"level{k}" in f:
+                pyramid.levels.append([f[f"level{k}"]])
+                pyramid.tails.append(f[f"tail{k}"] if f"tail{k}" in f else None)
+                k += 1
+        return pyramid
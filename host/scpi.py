@@ -0,0 +1,81 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""SCPI client for the firmware console (firmware/main.c).
+
+The console echoes every received character and ends its lines with "\\n\\r"; binary waveforms are
+sent as IEEE-488.2 definite length blocks (`#<n><len><bytes>\\n`).
+"""
+
+import numpy as np
+
+# Block helpers ------------------------------------------------------------------------------------
+
+def _read_exactly(stream, n):
+    buf  = bytearray(n)
+    view = memoryview(buf)
+    pos  = 0
+    while pos < n:
+        got = stream.readinto(view[pos:])
+        if not got:
+            raise TimeoutError(f"Block truncated ({pos}/{n} bytes).")
+        pos += got
+    return buf
+
+def read_block(stream):
+    """Read an IEEE-488.2 definite length block from `stream` and return its payload."""
+    # Skip echo/line endings up to the block header.
+    while True:
+        c = stream.read(1)
+        if not c:
+            raise TimeoutError("No block header.")
+        if c == b"#":
+            break
+    ndigits = int(_read_exactly(stream, 1))
+    if ndigits == 0:
+        raise ValueError("Indefinite length blocks are not supported.")
+    length = int(_read_exactly(stream, ndigits))
+    data   = _read_exactly(stream, length)
+    stream.read(1) # Terminator.
+    return data
+
+def block_to_array(data, dtype="<u4"):
+    """Zero-copy view of a block payload as a NumPy array."""
+    return np.frombuffer(data, dtype=dtype)
+
+# SCPI over Serial ---------------------------------------------------------------------------------
+
+class SCPISerial:
+    def __init__(self, port="/dev/ttyUSB1", baudrate=115200, timeout=5.0, echo=True):
+        import serial
+        self.port = serial.Serial(port, baudrate, timeout=timeout)
+        self.echo = echo
+
+    def close(self):
+        self.port.close()
+
+    def readline(self):
+        line = self.port.readline()
+        if not line.endswith(b"\n"):
+            raise TimeoutError("No response.")
+        return line.decode().strip("\r\n")
+
+    def write(self, cmd):
+        self.port.write(cmd.encode() + b"\n")
+        if self.echo:
+            self.readline()
+
+    def query(self, cmd):
+        self.write(cmd)
+        return self.readline()
+
+    def query_block(self, cmd="WAV:DATAQ", dtype="<u4"):
+        self.write(cmd)
+        return block_to_array(read_block(self.port), dtype)
+
+    def preamble(self):
+        fields = self.query("WAV:PREQ").split(",")
+        return [float(f) for f in fields]
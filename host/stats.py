@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Snapshot of the gateware performance counters (gateware/perf.py, `:SYST:STAT?`).
+
+Counters are printed with their rate (per second of `cycles`), high-water marks (`*_hwm`) as is.
+With `--interval` snapshots are repeated and rates computed over the interval.
+
+    python3 -m host.stats --port /dev/ttyUSB1 --interval 1
+"""
+
+import time
+import argparse
+
+# Snapshots ----------------------------------------------------------------------------------------
+
+def snapshot(scpi, names=None):
+    """Counters as a dict of name -> value."""
+    names  = names or scpi.query(":SYST:STAT:NAM?").split(",")
+    values = [int(v) for v in scpi.query(":SYST:STAT?").split(",")]
+    if len(values) != len(names):
+        raise ValueError(f"{len(values)} values for {len(names)} counters.")
+    return dict(zip(names, values))
+
+def format_snapshot(stats, previous=None, sys_clk_freq=48e6):
+    """Table of `stats`, with rates over the time since `previous` (or since clear)."""
+    base     = previous or dict.fromkeys(stats, 0)
+    duration = (stats["cycles"] - base["cycles"])/sys_clk_freq
+    lines    = [f"{'counter':<20}{'value':>16}{'rate (/s)':>16}"]
+    for name, value in stats.items():
+        if name == "cycles" or name.endswith("_hwm"):
+            lines.append(f"{name:<20}{value:>16}")
+        else:
+            rate = (value - base[name])/duration if duration else 0.0
+            lines.append(f"{name:<20}{value:>16}{rate:>16.6g}")
+    return "\n".join(lines)
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="LycheeMSO performance counters snapshot.")
+    parser.add_argument("--port",         default="/dev/ttyUSB1",     help="Serial port.")
+    parser.add_argument("--baudrate",     default=115200, type=int,   help="Serial baudrate.")
+    parser.add_argument("--sys-clk-freq", default=48e6,   type=float, help="System clock frequency.")
+    parser.add_argument("--clear",        action="store_true",        help="Clear the counters first.")
+    parser.add_argument("--interval",     default=None,   type=float, help="Repeat every interval (s).")
+    args = parser.parse_args()
+
+    from host.scpi import SCPISerial
+    scpi = SCPISerial(args.port, args.baudrate)
+    if args.clear:
+        scpi.write(":SYST:STAT:CLE")
+    names    = scpi.query(":SYST:STAT:NAM?").split(",")
+    previous = None
+    try:
+        while True:
+            stats = snapshot(scpi, names)
+            print(format_snapshot(stats, previous, args.sys_clk_freq))
+            if args.interval is None:
+                break
+            previous = stats
+            time.sleep(args.interval)
+            print()
+    except KeyboardInterrupt:
+        pass
+    scpi.close()
+
+if __name__ == "__main__":
+    main()
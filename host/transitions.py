@@ -0,0 +1,65 @@
+#
+# This file is part of LycheeMSO.
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Host side of the gateware TransitionEncoder (gateware/compress.py).
+
+Captures are stored as 32-bit `(delta, state)` records: `state` (16 LSBs) is the value of the
+logic channels and `delta` (16 MSBs) the number of samples since the previous record. Records
+with `delta` = 0 only pad the last DRAM word of a capture.
+"""
+
+import numpy as np
+
+STATE_BITS = 16
+DELTA_BITS = 16
+
+# Records ------------------------------------------------------------------------------------------
+
+def split(records):
+    """Split raw records into `(deltas, states)` arrays (dropping capture padding records)."""
+    records = np.asarray(records, dtype=np.uint32)
+    records = records[(records >> STATE_BITS) != 0]
+    states  = (records & (2**STATE_BITS - 1)).astype(np.uint16)
+    deltas  = (records >> STATE_BITS).astype(np.int64)
+    return deltas, states
+
+def timestamps(records):
+    """Sample index of each record, relative to the first record of `records`."""
+    deltas, _ = split(records)
+    times     = np.cumsum(deltas)
+    return times - times[0] if len(times) else times
+
+def expand(records, length=None):
+    """Rebuild the dense sample array from `records`.
+
+    Each record's state is held until the next record. The last state is held for one sample,
+    or until `length` samples when given (ex. the number of samples captured after the last
+    transition).
+    """
+    deltas, states = split(records)
+    if not len(states):
+        return np.zeros(0, dtype=np.uint16)
+    durations      = np.empty(len(states), dtype=np.int64)
+    durations[:-1] = deltas[1:]
+    durations[-1]  = 1
+    if length is not None:
+        durations[-1] = max(1, length - int(durations[:-1].sum()))
+    return np.repeat(states, durations)
+
+def compress(samples, max_delta=2**DELTA_BITS - 1):
+    """Encode dense `samples` the way the gateware does (mostly useful for tests/benchmarks)."""
+    samples = np.asarray(samples, dtype=np.uint16)
+    if not len(samples):
+        return np.zeros(0, dtype=np.uint32)
+    changes = np.flatnonzero(np.diff(samples)) + 1
+    starts  = np.concatenate(([0], changes))
+    # Insert keep-alive records where two transitions are further apart than max_delta.
+    gaps    = np.diff(np.concatenate((starts, [len(samples)])))
+    reps    = (gaps - 1)//max_delta + 1
+    within  = np.arange(reps.sum()) - np.repeat(np.cumsum(reps) - reps, reps)
+    starts  = np.repeat(starts, reps) + within*max_delta
+    deltas  = np.diff(np.concatenate(([starts[0] - 1], starts)))
+    return (deltas.astype(np.uint32) << STATE_BITS) | samples[starts]
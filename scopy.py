@@ -14,26 +14,70 @@ from litex.soc.doc import generate_docs, generate_svd
 from litedram.phy import GW2DDRPHY
 from litedram.modules import MT41K64M16
 
-from migen import Signal, ClockDomain
+from migen import Signal, ClockDomain, ClockDomainsRenamer
 from litex.gen import LiteXModule, Instance, If, Cat
 from liteeth.phy.rmii import LiteEthPHYRMII
 from litex.soc.integration.builder import Builder
 
 from litex.soc.cores.gpio import GPIOIn, GPIOOut
+from litex.soc.cores.uart import UART, UARTPHY, RS232PHYModel
+from litex.build.io import DDROutput
+from litex.soc.cores.video import VideoTimingGenerator, VideoHDMIPHY, VideoGenericPHY
+
+from buildcache import BitstreamCache
+from gateware.acqclock import SampleClock, EventSynchronizer
+from gateware.capture import LogicCapture
+from gateware.compress import TransitionEncoder, RecordSerializer
+from gateware.decimate import Decimator
+from gateware.awg import AWG
+from gateware.decode import ProtocolDecoders
+from gateware.measure import ReciprocalCounters
+from gateware.nco import FrequencyGenerator
+from gateware.oversample import IDESInput
+from gateware.perf import PerfCounters
+from gateware.raster import WaveformRasterizer
+from gateware.streamer import CaptureStreamer
+from gateware.trigger import LogicTrigger, TriggerMarker
 
 
 from litex.soc.cores.clock.gowin_gw2a import GW2APLL
 from migen.genlib.resetsync import AsyncResetSynchronizer
+from migen.genlib.cdc import MultiReg
+from litex.soc.interconnect import stream
+
+# Logic Analyzer channels present on the dock (pad index == sample bit).
+LOGIC_CHANNELS = [n for name, n, *_ in LycheeMSO_platform._dock_io if name == "logicAnalyzer"]
+# Function generator header pins present on the dock.
+FGEN_CHANNELS  = [n for name, n, *_ in LycheeMSO_platform._dock_io if name == "fGen"]
+
+# Display timings: HDMI monitor or the 800x480 RGB LCD.
+VIDEO_TIMINGS = {
+    "hdmi": "640x480@60Hz",
+    "lcd" : {
+        "pix_clk"       : 33.3e6,
+        "h_active"      : 800,
+        "h_blanking"    : 256,
+        "h_sync_offset" : 210,
+        "h_sync_width"  : 20,
+        "v_active"      : 480,
+        "v_blanking"    : 45,
+        "v_sync_offset" : 22,
+        "v_sync_width"  : 10,
+    },
+}
 
 
 class _CRG(LiteXModule):
-    def __init__(self, platform, sys_clk_freq, with_video_pll=False):
+    def __init__(self, platform, sys_clk_freq, with_video_pll=False, video_clk_freq=25e6,
+        with_video_5x=True, with_sys4x=False, acq_clk_freq=None):
         self.rst = Signal()
         self.cd_sys = ClockDomain()
         self.cd_por = ClockDomain()
         self.cd_init = ClockDomain()
         self.cd_sys2x = ClockDomain()
         self.cd_sys2x_i = ClockDomain()
+        if with_sys4x:
+            self.cd_sys4x = ClockDomain(reset_less=True)
 
         # # #
 
@@ -54,6 +98,10 @@ class _CRG(LiteXModule):
         self.pll = pll = GW2APLL(devicename=platform.devicename, device=platform.device)
         self.comb += pll.reset.eq(~por_done)
         pll.register_clkin(clk27, 27e6)
+        if with_sys4x:
+            # Fast clock of the 8x logic input deserializers (CLKOUT, sys2x then comes from
+            # CLKOUTD). Created first: the PLL config takes the first output as the fastest one.
+            pll.create_clkout(self.cd_sys4x, 4 * sys_clk_freq, with_reset=False)
         pll.create_clkout(self.cd_sys2x_i, 2 * sys_clk_freq)
         self.specials += [
             Instance(
@@ -77,8 +125,40 @@ class _CRG(LiteXModule):
         self.comb += self.cd_init.clk.eq(clk27)
         self.comb += self.cd_init.rst.eq(pll.reset)
 
+        # Video PLL (pixel clock, and 5x pixel clock for the HDMI serializers).
+        if with_video_pll:
+            self.video_pll = video_pll = GW2APLL(
+                devicename=platform.devicename, device=platform.device
+            )
+            self.comb += video_pll.reset.eq(~por_done)
+            video_pll.register_clkin(clk27, 27e6)
+            self.cd_video = ClockDomain()
+            if with_video_5x:
+                self.cd_video5x = ClockDomain()
+                video_pll.create_clkout(self.cd_video5x, 5 * video_clk_freq, margin=1e-2)
+                self.specials += Instance(
+                    "CLKDIV",
+                    p_DIV_MODE="5",
+                    i_RESETN=1,  # Disable reset signal.
+                    i_CALIB=0,  # No calibration.
+                    i_HCLKIN=self.cd_video5x.clk,
+                    o_CLKOUT=self.cd_video.clk,
+                )
+            else:
+                video_pll.create_clkout(self.cd_video, video_clk_freq, margin=1e-2)
+
+        # Acquisition PLL (logic sampling clock, independent of sys and so of the DDR3 rate).
+        if acq_clk_freq is not None:
+            self.acq_pll = acq_pll = GW2APLL(devicename=platform.devicename, device=platform.device)
+            self.comb += acq_pll.reset.eq(~por_done)
+            acq_pll.register_clkin(clk27, 27e6)
+            self.cd_acq = ClockDomain()
+            acq_pll.create_clkout(self.cd_acq, acq_clk_freq, margin=1e-2)
+
 
 class BaseSoC(SoCCore):
+    uart_shared = False  # UART TX left unconnected by add_uart.
+
     def __init__(
         self,
         sys_clk_freq=48e6,
@@ -86,16 +166,27 @@ class BaseSoC(SoCCore):
         # with_buttons=True,
         # with_video_terminal=False,
         # with_ethernet=False,
-        # with_etherbone=False,
+        with_etherbone=False,
         eth_ip="192.168.1.50",
         # eth_dynamic_ip=False,
         dock="standard",
+        capture_base=0x0100_0000,
+        capture_length=0x0400_0000,
+        events_base=0x0500_0000,
+        events_length=0x0100_0000,
+        awg_base=0x0600_0000,
+        awg_length=0x0200_0000,
+        with_video=None,
+        logic_oversampling=1,
+        acq_clk_freq=None,
         **kwargs,
     ):
-        platform = LycheeMSO_platform.Platform(dock, toolchain="gowin")
+        platform = self.create_platform(dock)
+        self.logic_oversampling = logic_oversampling
+        self.acq_clk_freq       = acq_clk_freq
 
         # CRG --------------------------------------------------------------------------------------
-        self.crg = _CRG(platform, sys_clk_freq)
+        self.add_crg(platform, sys_clk_freq, with_video)
 
         # SoCCore ----------------------------------------------------------------------------------
         SoCCore.__init__(
@@ -106,18 +197,7 @@ class BaseSoC(SoCCore):
             **kwargs,
         )
         # DDR3 SDRAM -------------------------------------------------------------------------------
-        self.ddrphy = GW2DDRPHY(
-            pads=platform.request("ddram"), sys_clk_freq=sys_clk_freq
-        )
-        self.ddrphy.settings.rtt_nom = "disabled"
-        self.comb += self.crg.stop.eq(self.ddrphy.init.stop)
-        self.comb += self.crg.reset.eq(self.ddrphy.init.reset)
-        self.add_sdram(
-            "sdram",
-            phy=self.ddrphy,
-            module=MT41K64M16(sys_clk_freq, "1:2"),
-            l2_cache_size=kwargs.get("l2_size", 8192),
-        )
+        self.add_ddram(sys_clk_freq, l2_cache_size=kwargs.get("l2_size", 8192))
         # SPI Flash --------------------------------------------------------------------------------
         # from litespi.modules import W25Q32JV as SpiFlashModule
         # from litespi.opcodes import SpiNorFlashOpCodes as Codes
@@ -125,18 +205,20 @@ class BaseSoC(SoCCore):
         # self.add_spi_flash(mode="1x", module=SpiFlashModule(Codes.READ_1_1_1))
 
         # Ethernet / Etherbone ---------------------------------------------------------------------
-        # self.ethphy = LiteEthPHYRMII(
-        #     clock_pads=self.platform.request("eth_clocks"),
-        #     pads=self.platform.request("eth"),
-        #     refclk_cd=None,
-        # )
-        # self.add_etherbone(
-        # phy         = self.ethphy,
-        # ip_address  = "192.168.1.50",
-        # mac_address = 0x10e2d5000001)
-        # self.add_csr("ethphy")
-        # self.add_ethernet(phy=self.ethphy, dynamic_ip=False, with_timing_constraints=False)
-        # self.add_etherbone(phy=self.ethphy, ip_address=eth_ip, with_timing_constraints=False)
+        # Etherbone gives the host direct access to the bus (and so to the DDR3 capture buffer) for
+        # bulk readout, see host/etherbone.py. Full 255-word Etherbone bursts are buffered.
+        if with_etherbone:
+            self.ethphy = LiteEthPHYRMII(
+                clock_pads = self.platform.request("eth_clocks"),
+                pads       = self.platform.request("eth"),
+                refclk_cd  = None,
+            )
+            self.add_etherbone(
+                phy                     = self.ethphy,
+                ip_address              = eth_ip,
+                buffer_depth            = 256,
+                with_timing_constraints = False,
+            )
 
         # LiteScope ---------- ---------------------------------------------------------------------
         from litescope import LiteScopeAnalyzer
@@ -148,47 +230,301 @@ class BaseSoC(SoCCore):
             csr_csv      = "analyzer.csv"
         )
 
-        # UART -------------------------------------------------------------------------------------
-        # Already built by SoCCore...
-
-        # Buttons ----------------------------------------------------------------------------------
+        # Logic Capture ----------------------------------------------------------------------------
+        # Dock inputs are resynchronized to sys, decimated (for long timebases), run-length encoded
+        # into (delta, state) records and streamed into a circular buffer in DDR3, capture depth is
+        # only bounded by the buffer size set through CSRs. The trigger runs on undecimated
+        # samples. In segmented mode the buffer is split in segments each filled by one
+        # trigger, the capture re-arms on the next segment in hardware.
+        # With oversampling the inputs are deserialized (4 or 8 samples per cycle, see
+        # add_logic_input), decimation/encoding/trigger handle all the samples of a cycle and the
+        # records (up to one per sample) are queued and stored at one per cycle. The protocol
+        # decoders take the last sample of each cycle.
+        # Sampling, decimation, encoding and trigger run in the acquisition domain: sys, or with
+        # acq_clk_freq the acq domain of a dedicated PLL, the records then cross to sys through an
+        # async FIFO (absorbing bursts, the sustained record rate must stay below the sys clock,
+        # records lost when it is full are counted by acq_cdc_dropped). Their CSRs stay on the bus
+        # (sys) and are static during a capture. The sample clock divides the acquisition clock at
+        # runtime (:ACQ:CLKD).
+        # The trigger strobe flags the record of its sample (decimator + encoder latency matches the
+        # trigger latency) and travels with it through the FIFOs, it is presented to the capture
+        # when that record is stored so trigger_index is the index of the trigger record.
+        assert acq_clk_freq is None or logic_oversampling == 1
+        acq          = "sys" if acq_clk_freq is None else "acq"
+        lanes        = logic_oversampling
+        logic_input  = self.add_logic_input(platform, lanes, cd=acq)
+        logic_sample = logic_input[-16:]
+        if acq != "sys":
+            logic_sample = Signal(16)
+            self.specials += MultiReg(logic_input, logic_sample)
+        self.sample_clock = SampleClock(data_width=len(logic_input), cd=acq)
+        self.decimator    = ClockDomainsRenamer(acq)(Decimator(data_width=16, lanes=lanes))
+        self.encoder      = ClockDomainsRenamer(acq)(TransitionEncoder(data_width=16, lanes=lanes))
+        self.trigger      = ClockDomainsRenamer(acq)(LogicTrigger(data_width=16, lanes=lanes))
+        self.capture = LogicCapture(
+            port           = self.sdram.crossbar.get_port(mode="write"),
+            data_width     = len(self.encoder.source.data)//lanes,
+            default_base   = capture_base,
+            default_length = capture_length,
+        )
+        self.decoders = ProtocolDecoders(logic_sample)
         self.comb += [
-            # WARN  (CT1122) : 'fGen0' will be placed to RECONFIGN pin according to constraint, and then the signal may lead to gwCONFIG programming directly
-            # self.platform.request("fGen", 0).eq(0),
-            # self.platform.request("fGen", 1).eq(1),
-            # self.platform.request("fGen", 2).eq(0),
-            # self.platform.request("fGen", 3).eq(0),
-            # self.platform.request("fGen", 4).eq(0),
-            self.platform.request("fGen", 5).eq(0),
-            self.platform.request("fGen", 6).eq(0),
-            self.platform.request("fGen", 7).eq(1),
-            self.platform.request("fGen", 8).eq(0),
-            self.platform.request("fGen", 9).eq(0),
-            self.platform.request("fGen", 10).eq(0),
-
-
-            self.platform.request("logicAnalyzer",2).eq(1), # T7 should be off. It was ON
-            self.platform.request("logicAnalyzer",3).eq(0),
-            self.platform.request("logicAnalyzer",4).eq(0),
-            self.platform.request("logicAnalyzer",5).eq(0),
-            self.platform.request("logicAnalyzer",6).eq(0),
-            self.platform.request("logicAnalyzer",7).eq(0),
-            # self.platform.request("logicAnalyzer",8).eq(0),
-            self.platform.request("logicAnalyzer",9).eq(0),
-            self.platform.request("logicAnalyzer",10).eq(0),
-            self.platform.request("logicAnalyzer",11).eq(0),
-            self.platform.request("logicAnalyzer",12).eq(0),
-            self.platform.request("logicAnalyzer",13).eq(0),
-            self.platform.request("logicAnalyzer",14).eq(0),
-            self.platform.request("logicAnalyzer",15).eq(0),
+            self.sample_clock.data.eq(logic_input),
+            self.sample_clock.source.connect(self.decimator.sink),
+            self.decimator.source.connect(self.encoder.sink),
+            self.trigger.data.eq(self.sample_clock.source.data),
         ]
+        assert self.decimator.latency + self.encoder.latency == self.trigger.latency
+        self.trigger_marker = ClockDomainsRenamer(acq)(TriggerMarker(self.encoder.source.description))
+        self.comb += [
+            self.encoder.source.connect(self.trigger_marker.sink),
+            self.trigger_marker.trigger.eq(self.trigger.trigger),
+        ]
+        records = self.trigger_marker.source
+        if acq != "sys":
+            self.acq_cdc = stream.ClockDomainCrossing(records.description,
+                cd_from = acq,
+                cd_to   = "sys",
+                depth   = 128,
+            )
+            self.acq_cdc_dropped = EventSynchronizer(cd_from=acq)
+            self.comb += [
+                records.connect(self.acq_cdc.sink),
+                self.acq_cdc_dropped.i.eq(self.acq_cdc.sink.valid & ~self.acq_cdc.sink.ready),
+            ]
+            records = self.acq_cdc.source
+        if lanes > 1:
+            self.serializer = RecordSerializer(len(self.capture.sink.data), lanes)
+            self.comb += records.connect(self.serializer.sink)
+            records = self.serializer.source
+        self.comb += [
+            records.connect(self.capture.sink, omit={"trigger"}),
+            self.capture.trigger.eq((records.valid & records.ready & records.trigger) | self.decoders.trigger),
+        ]
+        self.add_constant("LOGIC_SAMPLES_PER_CYCLE", lanes)
+        self.add_constant("ACQ_CLOCK_FREQUENCY", int(acq_clk_freq or sys_clk_freq))
+        self.add_constant("CAPTURE_BUFFER_BASE",   capture_base)
+        self.add_constant("CAPTURE_BUFFER_LENGTH", capture_length)
+        self.add_constant("CAPTURE_SAMPLE_WIDTH",  len(self.capture.sink.data))
+        self.add_constant("CAPTURE_WORD_BYTES",    self.capture.dma.port.data_width//8)
+        self.add_constant("CAPTURE_MAX_SEGMENTS",  self.capture.max_segments)
+
+        # Protocol Decoders ------------------------------------------------------------------------
+        # UART/SPI/I2C decoders attachable to any logic channel, their (timestamp, kind, data)
+        # events are stored in their own DDR3 ring (using the capture core without trigger) and
+        # can trigger the logic capture on a decoded value.
+        self.events = LogicCapture(
+            port           = self.sdram.crossbar.get_port(mode="write"),
+            data_width     = len(self.decoders.source.data),
+            fifo_depth     = 64,
+            default_base   = events_base,
+            default_length = events_length,
+            max_segments   = 1,
+        )
+        self.comb += [
+            self.decoders.source.connect(self.events.sink),
+            self.decoders.clear.eq(self.events._control.fields.arm),
+        ]
+        self.add_constant("EVENTS_BUFFER_BASE",   events_base)
+        self.add_constant("EVENTS_BUFFER_LENGTH", events_length)
+        self.add_constant("EVENTS_RECORD_WIDTH",  len(self.events.sink.data))
+        self.add_constant("DECODER_UARTS",        self.decoders.uarts)
+        self.add_constant("DECODER_SPIS",         self.decoders.spis)
+        self.add_constant("DECODER_I2CS",         self.decoders.i2cs)
+
+        # AWG --------------------------------------------------------------------------------------
+        # The DAC gets a sample each cycle, either from a waveform uploaded in DDR3 (played with
+        # loop/repeat) or from the DDS. The DAC clock is forwarded inverted so it samples the data
+        # in the middle of the cycle.
+        if dock == "standard":
+            awg_pads = platform.request("AWG")
+            self.awg = AWG(port=self.sdram.crossbar.get_port(mode="read"))
+            self.comb += [getattr(awg_pads, f"data_{n}").eq(self.awg.data[n])
+                for n in range(len(self.awg.data))]
+            self.specials += DDROutput(i1=0, i2=1, o=awg_pads.clk)
+            self.add_constant("AWG_BUFFER_BASE",   awg_base)
+            self.add_constant("AWG_BUFFER_LENGTH", awg_length)
+            self.add_constant("AWG_WORD_BYTES",    self.awg.dma.port.data_width//8)
+
+        # Video ------------------------------------------------------------------------------------
+        # Live persistence display of the logic channels on HDMI or the LCD (they share pins): the
+        # rasterizer taps the decimated samples, sweeps a screen width per trigger and accumulates
+        # them in on-chip memory scanned out in the video domain.
+        if with_video is not None:
+            vtg = VideoTimingGenerator(default_video_timings=VIDEO_TIMINGS[with_video])
+            self.video_vtg = ClockDomainsRenamer("video")(vtg)
+            self.raster = WaveformRasterizer(LOGIC_CHANNELS,
+                columns = vtg.video_timings["h_active"],
+                vres    = vtg.video_timings["v_active"],
+            )
+            if with_video == "hdmi":
+                video_pads = platform.request("hdmi")
+                self.comb += video_pads.hdp.eq(1)
+                self.videophy = VideoHDMIPHY(video_pads, clock_domain="video")
+            else:
+                video_pads = platform.request("lcd")
+                self.comb += [video_pads.rst.eq(1), video_pads.bl.eq(1)]
+                self.videophy = VideoGenericPHY(video_pads, clock_domain="video")
+            decimated = self.decimator.source
+            if acq != "sys":
+                # Decimated samples crossed to sys (display only: dropped when the FIFO is full).
+                self.raster_cdc = stream.ClockDomainCrossing(decimated.description,
+                    cd_from = acq,
+                    cd_to   = "sys",
+                    depth   = 16,
+                )
+                self.comb += [
+                    self.raster_cdc.sink.valid.eq(decimated.valid & decimated.ready),
+                    self.raster_cdc.sink.data.eq(decimated.data),
+                    self.raster_cdc.source.ready.eq(1),
+                ]
+                decimated = self.raster_cdc.source
+            self.comb += [
+                self.raster.sink.valid.eq(decimated.valid & decimated.ready),
+                self.raster.sink.data.eq(decimated.data[:16]),
+                self.raster.trigger.eq(self.capture.trigger),
+                self.video_vtg.source.connect(self.raster.vtg_sink),
+                self.raster.source.connect(self.videophy.sink),
+            ]
+            self.add_constant("RASTER_INTENSITY_BITS", self.raster.intensity_bits)
 
-
-
+        # UART -------------------------------------------------------------------------------------
+        # Built by SoCCore (see add_uart). Capture/events blocks are streamed from DDR3 to the UART
+        # TX by a DMA instead of the CPU: the firmware sends the block header, starts the streamer
+        # and gets an IRQ when the last byte has been sent. The streamer owns the PHY while busy.
+        if self.uart_shared:
+            self.streamer = CaptureStreamer(port=self.sdram.crossbar.get_port(mode="read"))
+            self.comb += If(self.streamer.busy,
+                self.streamer.source.connect(self.uart_phy.sink)
+            ).Else(
+                self.uart.source.connect(self.uart_phy.sink)
+            )
+            self.irq.add("streamer", use_loc_if_exists=True)
+
+        # Frequency Generator ----------------------------------------------------------------------
+        # An NCO/PWM per function generator pin (frequency, duty and phase through CSRs), started
+        # in phase. Pins 0, 1 and 4 are FPGA configuration pins and are left unused.
+        if dock == "standard":
+            self.fgen = FrequencyGenerator(FGEN_CHANNELS)
+            for n in FGEN_CHANNELS:
+                self.comb += platform.request("fGen", n).eq(self.fgen.output[n])
+
+        # Measurements -----------------------------------------------------------------------------
+        # Free-running reciprocal frequency/period/duty counters on every logic channel (bits 0-15,
+        # resynchronized to sys) and function generator output (bits 16+pin), results of the last
+        # gate (100 ms by default) read through CSRs by :MEAS:FREQ? and co without any capture.
+        meas_data     = Cat(logic_sample, Signal(16))
+        meas_channels = list(LOGIC_CHANNELS)
+        if hasattr(self, "fgen"):
+            meas_data     = Cat(logic_sample, self.fgen.output, Signal(16 - len(self.fgen.output)))
+            meas_channels += [16 + n for n in FGEN_CHANNELS]
+        self.meas = ReciprocalCounters(meas_data, meas_channels,
+            default_gate = int(sys_clk_freq//10),
+        )
+        self.add_constant("MEAS_FGEN_CHANNEL", 16)
+
+        # Performance Counters ---------------------------------------------------------------------
+        # Capture/events health (samples stored/dropped, trigger count, re-arm dead time, FIFO
+        # high-water marks) and DDR3 beats/command stalls of each crossbar port, read by
+        # :SYST:STAT? (names in PERF_COUNTER_NAMES, port0 is the CPU bus through the L2 cache).
+        ports = {
+            self.capture.dma.port : "capture",
+            self.events.dma.port  : "events",
+        }
+        if hasattr(self, "awg"):
+            ports[self.awg.dma.port] = "awg"
+        if hasattr(self, "streamer"):
+            ports[self.streamer.dma.port] = "streamer"
+        counters = {
+            "capture_stored"   : self.capture.stored,
+            "capture_dropped"  : self.capture.dropped,
+            "capture_triggers" : self.capture.trigger_accepted,
+            "capture_dead"     : self.capture.dead,
+            "events_stored"    : self.events.stored,
+            "events_dropped"   : self.events.dropped,
+        }
+        for port in self.sdram.crossbar.masters:
+            name = ports.get(port, f"port{port.id}")
+            counters[f"{name}_beats"] = (
+                (port.wdata.valid & port.wdata.ready) | (port.rdata.valid & port.rdata.ready))
+            counters[f"{name}_stalls"] = port.cmd.valid & ~port.cmd.ready
+        if hasattr(self, "serializer"):
+            counters["serializer_dropped"] = self.serializer.dropped
+        if hasattr(self, "acq_cdc_dropped"):
+            counters["acq_cdc_dropped"] = self.acq_cdc_dropped.o
+        self.perf = PerfCounters(counters, levels={
+            "capture_fifo_hwm" : self.capture.fifo.level,
+            "events_fifo_hwm"  : self.events.fifo.level,
+        })
+        self.add_constant("PERF_COUNTERS",      len(self.perf.names))
+        self.add_constant("PERF_COUNTER_NAMES", " ".join(self.perf.names))
 
         # self.submodules.leds = GPIOOut(Cat(*[platform.request("fGen", i) for i in range(11)]))
         # self.add_csr("leds")
 
+    # Board ----------------------------------------------------------------------------------------
+    # Platform, clocking and DDR3 PHY, overridden by the simulation target (scopy_sim.py) which
+    # keeps everything else.
+
+    def create_platform(self, dock):
+        return LycheeMSO_platform.Platform(dock, toolchain="gowin")
+
+    def add_crg(self, platform, sys_clk_freq, with_video):
+        self.crg = _CRG(platform, sys_clk_freq,
+            with_video_pll = with_video is not None,
+            video_clk_freq = 25e6 if with_video == "hdmi" else 33.3e6,
+            with_video_5x  = with_video == "hdmi",
+            with_sys4x     = self.logic_oversampling == 8,
+            acq_clk_freq   = self.acq_clk_freq,
+        )
+
+    def add_logic_input(self, platform, oversampling, cd="sys"):
+        """Logic Analyzer pads (bit n == channel n), `oversampling` samples per cycle (oldest in
+        the LSBs): resynchronized to `cd` (1) or deserialized by the IDES4 on sys2x (4) / IDES8 on
+        sys4x (8)."""
+        pads = {n: platform.request("logicAnalyzer", n) for n in LOGIC_CHANNELS}
+        if oversampling > 1:
+            self.logic_input = IDESInput(pads, data_width=16, ratio=oversampling)
+            return self.logic_input.data
+        sample = Signal(16)
+        for n, pad in pads.items():
+            self.specials += MultiReg(pad, sample[n], odomain=cd)
+        return sample
+
+    def add_ddram(self, sys_clk_freq, l2_cache_size):
+        self.ddrphy = GW2DDRPHY(
+            pads=self.platform.request("ddram"), sys_clk_freq=sys_clk_freq
+        )
+        self.ddrphy.settings.rtt_nom = "disabled"
+        self.comb += self.crg.stop.eq(self.ddrphy.init.stop)
+        self.comb += self.crg.reset.eq(self.ddrphy.init.reset)
+        self.add_sdram(
+            "sdram",
+            phy=self.ddrphy,
+            module=MT41K64M16(sys_clk_freq, "1:2"),
+            l2_cache_size=l2_cache_size,
+        )
+
+    def add_uart(self, name="uart", uart_name="serial", uart_pads=None, baudrate=115200,
+        fifo_depth=16, with_dynamic_baudrate=False):
+        # Same as SoC.add_uart for a regular serial UART (or the simulated one), but with the UART
+        # TX left unconnected so the capture streamer can share the PHY.
+        if uart_name not in ["serial", "sim"] or not self.irq.enabled:
+            return SoCCore.add_uart(self, name, uart_name, uart_pads, baudrate, fifo_depth,
+                with_dynamic_baudrate)
+        if uart_name == "sim":
+            self.uart_phy = RS232PHYModel(uart_pads or self.platform.request("serial"))
+        else:
+            self.uart_phy = UARTPHY(uart_pads or self.platform.request("serial"),
+                clk_freq              = self.sys_clk_freq,
+                baudrate              = baudrate,
+                with_dynamic_baudrate = with_dynamic_baudrate,
+            )
+        self.uart = UART(tx_fifo_depth=fifo_depth, rx_fifo_depth=fifo_depth)
+        self.comb += self.uart_phy.source.connect(self.uart.sink)
+        self.irq.add(name, use_loc_if_exists=True)
+        self.uart_shared = True
+
 
 # Build --------------------------------------------------------------------------------------------
 def main():
@@ -206,6 +542,12 @@ def main():
     parser.add_target_argument("--with-spi-flash", action="store_true", help="Enable SPI Flash (MMAPed).")
     parser.add_argument("--with-etherbone", action="store_true", help="Add EtherBone.")
     parser.add_target_argument("--eth-ip", default="192.168.1.50", help="Etherbone IP address.")
+    parser.add_target_argument("--with-video", choices=["hdmi", "lcd"], help="Add the waveform display.")
+    parser.add_target_argument("--logic-oversampling", default=1, type=int, choices=[1, 4, 8], help="Logic samples per system clock cycle (IDES4/IDES8).")
+    parser.add_target_argument("--acq-clk-freq", default=None, type=float, help="Acquisition clock frequency (dedicated PLL, default: system clock).")
+    parser.add_target_argument("--cache-dir", default="~/.cache/lycheemso/bitstreams", help="Bitstream cache directory.")
+    parser.add_target_argument("--cache-size", default=2048, type=int, help="Bitstream cache size limit (MiB).")
+    parser.add_target_argument("--no-cache", action="store_true", help="Always run the toolchain.")
     parser.set_defaults(cpu_type="picorv32")
     parser.set_defaults(cpu_variant="minimal")
     # fmt: on
@@ -214,19 +556,38 @@ def main():
     if args.build_doc and not args.build:
         print("Use --build with --build-doc")
         exit(1)
-
+    # The dock RMII PHY pads are not described yet (LycheeMSO_platform.py).
+    platform = LycheeMSO_platform.Platform()
+    if args.with_etherbone and not (platform.has_resource("eth") and platform.has_resource("eth_clocks")):
+        parser.error("--with-etherbone: no RMII Ethernet pads (eth/eth_clocks) on this platform")
+
+    soc_argdict = parser.soc_argdict
+    if not args.no_cache:
+        soc_argdict["ident_version"] = False  # Build time would defeat the bitstream cache.
     soc = BaseSoC(
         sys_clk_freq=args.sys_clk_freq,
         with_spi_flash=args.with_spi_flash,
         with_etherbone=args.with_etherbone,
         eth_ip=args.eth_ip,
-        **parser.soc_argdict,
+        with_video=args.with_video,
+        logic_oversampling=args.logic_oversampling,
+        acq_clk_freq=args.acq_clk_freq,
+        **soc_argdict,
     )
     builder = Builder(soc, **parser.builder_argdict)
     vns = None
-    if args.build:
+    # Builds go through the bitstream cache, --load/--flash without --build use the cached
+    # bitstream of the current sources.
+    cache = None if args.no_cache else BitstreamCache(args.cache_dir, args.cache_size*1024**2)
+    if args.build or (cache is not None and (args.load or args.flash)):
         builder.csr_csv = "test/csr.csv"
-        vns = builder.build(**parser.toolchain_argdict)
+        if cache is None:
+            vns = builder.build(**parser.toolchain_argdict)
+        else:
+            vns, hit = cache.build(builder, run=args.build, **parser.toolchain_argdict)
+            if not (hit or args.build):
+                print("Bitstream not in cache, use --build")
+                exit(1)
 
     if args.build_doc and args.build:
         soc.do_exit(vns)
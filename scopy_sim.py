@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2024 Ammar Seliaman <me@ammar.engineer>
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Simulation of the scopy.py SoC with Verilator (LiteX sim flow): the Gowin PLL and DDR3 PHY are
+# replaced by simulation models, everything else (CSR map, constants) is kept so the same firmware
+# image runs. The dock inputs are driven from a stimulus file, the outputs are recorded.
+
+from migen import Signal
+
+from litex.build.generic_platform import Pins, Subsignal
+from litex.build.io import CRG
+from litex.build.sim import SimPlatform
+from litex.build.sim.config import SimConfig
+from litex.soc.integration.builder import Builder
+from litex.soc.integration.common import get_mem_data, get_boot_address
+from litex.soc.interconnect.csr import AutoCSR, CSR, CSRStorage, CSRStatus
+
+from litedram.common import PhySettings, get_default_cl, get_default_cwl
+from litedram.common import get_sys_latency, get_sys_phase
+from litedram.modules import MT41K64M16
+from litedram.phy.model import SDRAMPHYModel
+
+import LycheeMSO_platform
+from scopy import BaseSoC, LOGIC_CHANNELS, FGEN_CHANNELS
+from gateware.stimulus import read_stimulus, StimulusPlayer, SignalRecorder
+
+# IOs ----------------------------------------------------------------------------------------------
+
+# Dock IOs used by the SoC, with the same shape as on the board.
+_sim_dock_io = []
+for name, number, *constraints in LycheeMSO_platform._dock_io:
+    if name in ["logicAnalyzer", "fGen", "AWG", "btn_n"]:
+        _sim_dock_io.append((name, number, *[
+            Subsignal(c.name, Pins(len(c.constraints[0].identifiers))) if isinstance(c, Subsignal)
+            else Pins(len(c.identifiers))
+            for c in constraints if isinstance(c, (Pins, Subsignal))
+        ]))
+
+_io = [
+    # Clk / Rst.
+    ("sys_clk", 0, Pins(1)),
+    ("sys_rst", 0, Pins(1)),
+
+    # Serial.
+    ("serial", 0,
+        Subsignal("source_valid", Pins(1)),
+        Subsignal("source_ready", Pins(1)),
+        Subsignal("source_data",  Pins(8)),
+
+        Subsignal("sink_valid",   Pins(1)),
+        Subsignal("sink_ready",   Pins(1)),
+        Subsignal("sink_data",    Pins(8)),
+    ),
+]
+
+# Platform -----------------------------------------------------------------------------------------
+
+class Platform(SimPlatform):
+    def __init__(self):
+        SimPlatform.__init__(self, "SIM", _io + _sim_dock_io)
+
+# DDR3 PHY Model -----------------------------------------------------------------------------------
+
+class _SimDDRPHY(SDRAMPHYModel, AutoCSR):
+    """SDRAM model with the DFI (1:2 DDR3) and CSRs of GW2DDRPHY, so the SDRAM port widths and the
+    CSR map match the board. Read leveling is disabled, the CSRs are only placeholders."""
+    def __init__(self, module, sys_clk_freq, databits=16, init=[]):
+        tck             = 2/(2*2*sys_clk_freq)
+        cl              = get_default_cl("DDR3", tck)
+        cwl             = get_default_cwl("DDR3", tck)
+        cl_sys_latency  = get_sys_latency(2, cl)
+        cwl_sys_latency = get_sys_latency(2, cwl)
+        settings = PhySettings(
+            phytype       = "SDRAMPHYModel",
+            memtype       = "DDR3",
+            databits      = databits,
+            dfi_databits  = 4*databits,
+            nranks        = 1,
+            nphases       = 2,
+            rdphase       = get_sys_phase(2, cl_sys_latency, cl),
+            wrphase       = get_sys_phase(2, cwl_sys_latency, cwl),
+            cl            = cl,
+            cwl           = cwl,
+            read_latency  = cl_sys_latency + 9,
+            write_latency = cwl_sys_latency - 1,
+        )
+        SDRAMPHYModel.__init__(self, module, settings, clk_freq=sys_clk_freq, init=init)
+
+        self._dly_sel             = CSRStorage(databits//8)
+        self._rdly_dq_rst         = CSR()
+        self._rdly_dq_inc         = CSR()
+        self._rdly_dq_bitslip_rst = CSR()
+        self._rdly_dq_bitslip     = CSR()
+        self._burstdet_clr        = CSR()
+        self._burstdet_seen       = CSRStatus(databits//8)
+
+# Simulation SoC -----------------------------------------------------------------------------------
+
+class SimSoC(BaseSoC):
+    sim_buttons = [n for name, n, *_ in LycheeMSO_platform._dock_io if name == "btn_n"]
+
+    def __init__(self, stimulus=None, sdram_init=[], **kwargs):
+        self.sdram_init = sdram_init
+        BaseSoC.__init__(self, **kwargs)
+
+        # Stimulus ---------------------------------------------------------------------------------
+        # Logic Analyzer channels and buttons (both as on the pins: bit n == channel/button n) are
+        # driven by the stimulus player instead of the pads.
+        logic   = Signal(16)
+        buttons = Signal(len(self.sim_buttons))
+        for n in LOGIC_CHANNELS:
+            self.comb += self.platform.lookup_request("logicAnalyzer", n).eq(logic[n])
+        for n in self.sim_buttons:
+            pad = self.platform.lookup_request("btn_n", n, loose=True)
+            if pad is None:
+                pad = self.platform.request("btn_n", n)
+            self.comb += pad.eq(buttons[n])
+        self.stimulus = StimulusPlayer({"logicAnalyzer": logic, "btn_n": buttons},
+            records = stimulus or [(0, {"btn_n": 2**len(buttons) - 1}, False)],
+        )
+
+        # Recorder ---------------------------------------------------------------------------------
+        # AWG DAC code and fGen pins (bit n == pin n).
+        fgen = Signal(max(FGEN_CHANNELS) + 1)
+        for n in FGEN_CHANNELS:
+            self.comb += fgen[n].eq(self.platform.lookup_request("fGen", n))
+        self.recorder = SignalRecorder({"AWG": self.awg.data, "fGen": fgen})
+
+    # Board ----------------------------------------------------------------------------------------
+    def create_platform(self, dock):
+        assert dock == "standard"
+        return Platform()
+
+    def add_crg(self, platform, sys_clk_freq, with_video):
+        assert with_video is None
+        self.crg = CRG(platform.request("sys_clk"))
+
+    def add_logic_input(self, platform, oversampling, cd="sys"):
+        # No deserializer model nor acquisition PLL: the stimulus is applied on sys cycles.
+        assert oversampling == 1 and cd == "sys"
+        return BaseSoC.add_logic_input(self, platform, oversampling, cd)
+
+    def add_ddram(self, sys_clk_freq, l2_cache_size):
+        module = MT41K64M16(sys_clk_freq, "1:2")
+        self.ddrphy = _SimDDRPHY(module, sys_clk_freq, init=self.sdram_init)
+        self.add_sdram("sdram",
+            phy           = self.ddrphy,
+            module        = module,
+            l2_cache_size = l2_cache_size,
+        )
+        if self.sdram_init:
+            # Skip SDRAM test to avoid corrupting the preloaded firmware.
+            self.add_constant("SDRAM_TEST_DISABLE")
+
+    def add_uart(self, name="uart", uart_name="sim", *args, **kwargs):
+        # The simulated console replaces the serial UART.
+        return BaseSoC.add_uart(self, name, "sim" if uart_name == "serial" else uart_name,
+            *args, **kwargs)
+
+# Build --------------------------------------------------------------------------------------------
+def main():
+    from litex.build.parser import LiteXArgumentParser
+
+    parser = LiteXArgumentParser(
+        platform=Platform,
+        description="LycheeMSO + LiteX SoC simulation.",
+    )
+
+    # fmt: off
+    parser.add_target_argument("--sys-clk-freq", default=48e6, type=float, help="System clock frequency.")
+    parser.add_target_argument("--firmware", help="Firmware (.bin) preloaded in DDR3 and booted.")
+    parser.add_target_argument("--stimulus", help="Stimulus file driving the dock inputs (see gateware/stimulus.py).")
+    parser.add_target_argument("--tcp-port", type=int, help="Serve the console on this TCP port instead of stdin/stdout.")
+    parser.add_target_argument("--non-interactive", action="store_true", help="Run the simulation without user input.")
+    parser.set_defaults(cpu_type="picorv32")
+    parser.set_defaults(cpu_variant="minimal")
+    # fmt: on
+
+    args = parser.parse_args()
+
+    sim_config = SimConfig()
+    sim_config.add_clocker("sys_clk", freq_hz=args.sys_clk_freq)
+    if args.tcp_port is None:
+        sim_config.add_module("serial2console", "serial")
+    else:
+        sim_config.add_module("serial2tcp", "serial", args={"port": args.tcp_port})
+
+    soc_argdict = parser.soc_argdict
+    soc_argdict["ident_version"] = False  # Same identifier as cached bitstreams.
+    stimulus = None
+    if args.stimulus:
+        stimulus = read_stimulus(args.stimulus, args.sys_clk_freq, {
+            "logicAnalyzer" : (16, 0),
+            "btn_n"         : (len(SimSoC.sim_buttons), 2**len(SimSoC.sim_buttons) - 1),
+        })
+    sdram_init = []
+    if args.firmware:
+        sdram_init = get_mem_data(args.firmware,
+            data_width = 32,
+            endianness = "little",
+            offset     = BaseSoC.mem_map["main_ram"],
+        )
+    soc = SimSoC(
+        sys_clk_freq=args.sys_clk_freq,
+        stimulus=stimulus,
+        sdram_init=sdram_init,
+        **soc_argdict,
+    )
+    if args.firmware:
+        soc.add_constant("ROM_BOOT_ADDRESS", get_boot_address(args.firmware) or
+            soc.mem_map["main_ram"])
+
+    builder = Builder(soc, **parser.builder_argdict)
+    builder.build(
+        sim_config  = sim_config,
+        interactive = not args.non_interactive and args.tcp_port is None,
+        **parser.toolchain_argdict,
+    )
+
+
+if __name__ == "__main__":
+    main()